@@ -13,7 +13,7 @@ from sqlalchemy import pool
 from alembic import context
 
 from app.db.session import Base
-from app.models import organization, client, workflow, finance
+from app.models import organization, client, workflow, finance, auth, idempotency, exposure, ledger
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
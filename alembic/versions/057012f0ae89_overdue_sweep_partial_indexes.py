@@ -0,0 +1,45 @@
+"""Overdue sweep partial indexes
+
+Revision ID: 057012f0ae89
+Revises: 5fc44c62b009
+Create Date: 2026-10-18 09:17:50.274719
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '057012f0ae89'
+down_revision: Union[str, None] = '5fc44c62b009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Partial: only PENDING rows, which is all the sweep ever looks at.
+# Built CONCURRENTLY so payables and invoices stay writable meanwhile.
+_INDEXES = [
+    ('ix_payables_pending_due_date', 'payables'),
+    ('ix_invoices_pending_due_date', 'invoices'),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table in _INDEXES:
+            op.create_index(
+                name, table, ['due_date'],
+                unique=False, postgresql_concurrently=True, if_not_exists=True,
+                postgresql_where=sa.text("status = 'PENDING'"),
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table in reversed(_INDEXES):
+            op.drop_index(
+                name, table_name=table,
+                postgresql_concurrently=True, if_exists=True
+            )
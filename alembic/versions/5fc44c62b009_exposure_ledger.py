@@ -0,0 +1,72 @@
+"""Exposure ledger
+
+Revision ID: 5fc44c62b009
+Revises: 4b419a500088
+Create Date: 2026-10-18 09:13:33.022706
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5fc44c62b009'
+down_revision: Union[str, None] = '4b419a500088'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'organization_exposure',
+        sa.Column('organization_id', sa.Integer(), nullable=False),
+        sa.Column('approved_amount', sa.Numeric(precision=18, scale=2), server_default='0', nullable=False),
+        sa.Column('funded_amount', sa.Numeric(precision=18, scale=2), server_default='0', nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['organization_id'], ['organizations.id']),
+        sa.PrimaryKeyConstraint('organization_id'),
+    )
+    op.create_table(
+        'client_exposure',
+        sa.Column('client_id', sa.Integer(), nullable=False),
+        sa.Column('organization_id', sa.Integer(), nullable=False),
+        sa.Column('approved_amount', sa.Numeric(precision=18, scale=2), server_default='0', nullable=False),
+        sa.Column('funded_amount', sa.Numeric(precision=18, scale=2), server_default='0', nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['client_id'], ['clients.id']),
+        sa.ForeignKeyConstraint(['organization_id'], ['organizations.id']),
+        sa.PrimaryKeyConstraint('client_id'),
+    )
+    op.create_index(op.f('ix_client_exposure_organization_id'), 'client_exposure', ['organization_id'], unique=False)
+
+    # Backfill from existing financing requests
+    op.execute(
+        """
+        INSERT INTO client_exposure (client_id, organization_id, approved_amount, funded_amount, updated_at)
+        SELECT b.client_id, b.organization_id,
+               SUM(CASE WHEN fr.status = 'APPROVED' THEN fr.amount_requested::numeric(18, 2) ELSE 0 END),
+               SUM(CASE WHEN fr.status = 'FUNDED' THEN fr.amount_requested::numeric(18, 2) ELSE 0 END),
+               now() AT TIME ZONE 'utc'
+        FROM financing_requests fr
+        JOIN payables p ON p.id = fr.payable_id
+        JOIN bookings b ON b.id = p.booking_id
+        WHERE fr.status IN ('APPROVED', 'FUNDED')
+        GROUP BY b.client_id, b.organization_id
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO organization_exposure (organization_id, approved_amount, funded_amount, updated_at)
+        SELECT organization_id, SUM(approved_amount), SUM(funded_amount), now() AT TIME ZONE 'utc'
+        FROM client_exposure
+        GROUP BY organization_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_client_exposure_organization_id'), table_name='client_exposure')
+    op.drop_table('client_exposure')
+    op.drop_table('organization_exposure')
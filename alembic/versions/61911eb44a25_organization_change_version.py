@@ -0,0 +1,30 @@
+"""Organization change version
+
+Revision ID: 61911eb44a25
+Revises: c9572d14e0f3
+Create Date: 2026-10-18 09:05:04.109652
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '61911eb44a25'
+down_revision: Union[str, None] = 'c9572d14e0f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # server_default makes this a metadata-only change on Postgres 11+
+    op.add_column(
+        'organizations',
+        sa.Column('change_version', sa.BigInteger(), server_default='0', nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('organizations', 'change_version')
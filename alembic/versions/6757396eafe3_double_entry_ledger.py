@@ -0,0 +1,154 @@
+"""Double-entry ledger
+
+Revision ID: 6757396eafe3
+Revises: c2e88efa7aef
+Create Date: 2026-10-18 09:28:12.039801
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6757396eafe3'
+down_revision: Union[str, None] = 'c2e88efa7aef'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+account_code = postgresql.ENUM('CASH', 'FINANCING_RECEIVABLE', 'FEE_INCOME', name='ledgeraccountcode')
+entry_kind = postgresql.ENUM('FUNDING', 'FEE', 'REPAYMENT', name='journalentrykind')
+
+APPEND_ONLY_TABLES = ('journal_entries', 'ledger_postings')
+
+
+def upgrade() -> None:
+    op.create_table(
+        'ledger_accounts',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('organization_id', sa.Integer(), nullable=False),
+        sa.Column('code', account_code, nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['organization_id'], ['organizations.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('organization_id', 'code', name='uq_ledger_accounts_organization_id_code'),
+    )
+    op.create_table(
+        'journal_entries',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('organization_id', sa.Integer(), nullable=False),
+        sa.Column('financing_request_id', sa.Integer(), nullable=True),
+        sa.Column('kind', entry_kind, nullable=False),
+        sa.Column('posted_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['financing_request_id'], ['financing_requests.id']),
+        sa.ForeignKeyConstraint(['organization_id'], ['organizations.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_journal_entries_financing_request_id'), 'journal_entries', ['financing_request_id'], unique=False)
+    op.create_table(
+        'ledger_postings',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('journal_entry_id', sa.BigInteger(), nullable=False),
+        sa.Column('account_id', sa.Integer(), nullable=False),
+        sa.Column('amount_cents', sa.BigInteger(), nullable=False),
+        sa.Column('posted_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['account_id'], ['ledger_accounts.id']),
+        sa.ForeignKeyConstraint(['journal_entry_id'], ['journal_entries.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_ledger_postings_journal_entry_id'), 'ledger_postings', ['journal_entry_id'], unique=False)
+    op.create_index('ix_ledger_postings_account_id_posted_at', 'ledger_postings', ['account_id', 'posted_at'], unique=False)
+    op.create_index('ix_ledger_postings_posted_at', 'ledger_postings', ['posted_at'], unique=False)
+    op.create_table(
+        'ledger_balance_snapshots',
+        sa.Column('account_id', sa.Integer(), nullable=False),
+        sa.Column('cutoff', sa.DateTime(), nullable=False),
+        sa.Column('balance_cents', sa.BigInteger(), nullable=False),
+        sa.ForeignKeyConstraint(['account_id'], ['ledger_accounts.id']),
+        sa.PrimaryKeyConstraint('account_id', 'cutoff'),
+    )
+    op.create_index('ix_ledger_balance_snapshots_cutoff', 'ledger_balance_snapshots', ['cutoff'], unique=False)
+
+    # Backfill the money already moved by funded and repaid requests
+    op.execute(
+        """
+        INSERT INTO ledger_accounts (organization_id, code, created_at)
+        SELECT DISTINCT b.organization_id, c.code::ledgeraccountcode, now() AT TIME ZONE 'utc'
+        FROM financing_requests fr
+        JOIN payables p ON p.id = fr.payable_id
+        JOIN bookings b ON b.id = p.booking_id
+        CROSS JOIN (VALUES ('CASH'), ('FINANCING_RECEIVABLE'), ('FEE_INCOME')) AS c (code)
+        WHERE fr.status IN ('FUNDED', 'REPAID')
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO journal_entries (organization_id, financing_request_id, kind, posted_at)
+        SELECT b.organization_id, fr.id, k.kind::journalentrykind,
+               CASE WHEN k.kind = 'REPAYMENT' THEN coalesce(fr.repaid_at, fr.funded_at, fr.requested_at)
+                    ELSE coalesce(fr.funded_at, fr.requested_at) END
+        FROM financing_requests fr
+        JOIN payables p ON p.id = fr.payable_id
+        JOIN bookings b ON b.id = p.booking_id
+        CROSS JOIN (VALUES ('FUNDING'), ('FEE'), ('REPAYMENT')) AS k (kind)
+        WHERE fr.status = 'REPAID' OR (fr.status = 'FUNDED' AND k.kind <> 'REPAYMENT')
+        ORDER BY 4, fr.id
+        """
+    )
+    # Same lines as app.core.ledger.financing_journal_lines
+    op.execute(
+        """
+        INSERT INTO ledger_postings (journal_entry_id, account_id, amount_cents, posted_at)
+        SELECT je.id, a.id, l.amount_cents, je.posted_at
+        FROM journal_entries je
+        JOIN financing_requests fr ON fr.id = je.financing_request_id
+        CROSS JOIN LATERAL (
+            SELECT (fr.amount_requested::numeric(18, 2) * 100)::bigint AS amount,
+                   (fr.total_repayment::numeric(18, 2) * 100)::bigint AS repayment
+        ) AS c
+        CROSS JOIN LATERAL (VALUES
+            (CASE je.kind WHEN 'REPAYMENT' THEN 'CASH' ELSE 'FINANCING_RECEIVABLE' END,
+             CASE je.kind WHEN 'FUNDING' THEN c.amount WHEN 'FEE' THEN c.repayment - c.amount ELSE c.repayment END),
+            (CASE je.kind WHEN 'FUNDING' THEN 'CASH' WHEN 'FEE' THEN 'FEE_INCOME' ELSE 'FINANCING_RECEIVABLE' END,
+             -CASE je.kind WHEN 'FUNDING' THEN c.amount WHEN 'FEE' THEN c.repayment - c.amount ELSE c.repayment END)
+        ) AS l (code, amount_cents)
+        JOIN ledger_accounts a ON a.organization_id = je.organization_id AND a.code = l.code::ledgeraccountcode
+        ORDER BY je.id
+        """
+    )
+
+    # Corrections are new entries: history is never rewritten
+    op.execute(
+        """
+        CREATE FUNCTION ledger_append_only() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            RAISE EXCEPTION '% is append-only', TG_TABLE_NAME;
+        END
+        $$
+        """
+    )
+    for table in APPEND_ONLY_TABLES:
+        op.execute(
+            f"CREATE TRIGGER {table}_append_only BEFORE UPDATE OR DELETE ON {table} "
+            "FOR EACH ROW EXECUTE FUNCTION ledger_append_only()"
+        )
+
+
+def downgrade() -> None:
+    for table in APPEND_ONLY_TABLES:
+        op.execute(f"DROP TRIGGER {table}_append_only ON {table}")
+    op.execute("DROP FUNCTION ledger_append_only()")
+    op.drop_index('ix_ledger_balance_snapshots_cutoff', table_name='ledger_balance_snapshots')
+    op.drop_table('ledger_balance_snapshots')
+    op.drop_index('ix_ledger_postings_posted_at', table_name='ledger_postings')
+    op.drop_index('ix_ledger_postings_account_id_posted_at', table_name='ledger_postings')
+    op.drop_index(op.f('ix_ledger_postings_journal_entry_id'), table_name='ledger_postings')
+    op.drop_table('ledger_postings')
+    op.drop_index(op.f('ix_journal_entries_financing_request_id'), table_name='journal_entries')
+    op.drop_table('journal_entries')
+    op.drop_table('ledger_accounts')
+    entry_kind.drop(op.get_bind())
+    account_code.drop(op.get_bind())
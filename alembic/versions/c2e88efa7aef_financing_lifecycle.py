@@ -0,0 +1,57 @@
+"""Financing lifecycle
+
+Revision ID: c2e88efa7aef
+Revises: 057012f0ae89
+Create Date: 2026-10-18 09:24:04.444844
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2e88efa7aef'
+down_revision: Union[str, None] = '057012f0ae89'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# The enum type already exists (financing_requests.status)
+financing_status = postgresql.ENUM(
+    'PENDING', 'APPROVED', 'FUNDED', 'REPAID', 'REJECTED', name='financingstatus', create_type=False
+)
+
+
+def upgrade() -> None:
+    op.add_column('financing_requests', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('financing_requests', sa.Column('repaid_at', sa.DateTime(), nullable=True))
+    op.add_column('financing_requests', sa.Column('rejected_at', sa.DateTime(), nullable=True))
+    op.create_table(
+        'financing_events',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('financing_request_id', sa.Integer(), nullable=False),
+        sa.Column('organization_id', sa.Integer(), nullable=False),
+        sa.Column('from_status', financing_status, nullable=False),
+        sa.Column('to_status', financing_status, nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('actor_user_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['financing_request_id'], ['financing_requests.id']),
+        sa.ForeignKeyConstraint(['organization_id'], ['organizations.id']),
+        sa.ForeignKeyConstraint(['actor_user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_financing_events_request_id', 'financing_events', ['financing_request_id', 'id'], unique=False)
+    op.create_index('ix_financing_events_org_id', 'financing_events', ['organization_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_financing_events_org_id', table_name='financing_events')
+    op.drop_index('ix_financing_events_request_id', table_name='financing_events')
+    op.drop_table('financing_events')
+    op.drop_column('financing_requests', 'rejected_at')
+    op.drop_column('financing_requests', 'repaid_at')
+    op.drop_column('financing_requests', 'version')
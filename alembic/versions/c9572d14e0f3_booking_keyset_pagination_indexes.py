@@ -0,0 +1,50 @@
+"""Booking keyset pagination indexes
+
+Revision ID: c9572d14e0f3
+Revises: ad8d9fa5055a
+Create Date: 2026-10-18 08:56:52.823475
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9572d14e0f3'
+down_revision: Union[str, None] = 'ad8d9fa5055a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Built CONCURRENTLY so large bookings tables stay writable during the migration
+_INDEXES = [
+    ('ix_bookings_org_id', ['organization_id', 'id'], {}),
+    ('ix_bookings_org_status_id', ['organization_id', 'status', 'id'], {}),
+    ('ix_bookings_org_carrier_id', ['organization_id', 'carrier_name', 'id'], {}),
+    ('ix_bookings_org_client_id', ['organization_id', 'client_id', 'id'], {}),
+    (
+        'ix_bookings_org_reference_prefix',
+        ['organization_id', 'reference_number'],
+        {'postgresql_ops': {'reference_number': 'varchar_pattern_ops'}},
+    ),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, columns, kwargs in _INDEXES:
+            op.create_index(
+                name, 'bookings', columns,
+                unique=False, postgresql_concurrently=True, if_not_exists=True, **kwargs
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _, _ in reversed(_INDEXES):
+            op.drop_index(
+                name, table_name='bookings',
+                postgresql_concurrently=True, if_exists=True
+            )
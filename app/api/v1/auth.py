@@ -1,17 +1,29 @@
-from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.session import get_db
 from app.core.auth_service import (
     authenticate_user,
-    create_access_token,
-    get_password_hash,
-    ACCESS_TOKEN_EXPIRE_MINUTES,
+    create_user_access_token,
+    get_password_hash_async,
+    get_token_claims,
+    issue_refresh_token,
+    revoke_session,
+    rotate_refresh_token,
 )
 from app.models.organization import User, Organization
-from app.schemas.auth import Token, UserCreate, UserPublic, UserRegister
+from app.schemas.auth import (
+    LogoutRequest,
+    RefreshRequest,
+    Token,
+    TokenPayload,
+    UserCreate,
+    UserPublic,
+    UserRegister,
+)
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -41,7 +53,7 @@ async def register(
     await db.flush()  # Get the organization ID
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     new_user = User(
         email=user_data.email,
         hashed_password=hashed_password,
@@ -64,7 +76,7 @@ async def login(
     """
     Login endpoint (OAuth2 compatible).
     
-    Returns a JWT access token for authenticated users.
+    Returns a JWT access token and a refresh token for authenticated users.
     Uses OAuth2PasswordRequestForm with username/password fields.
     The username field should contain the email address.
     """
@@ -76,10 +88,50 @@ async def login(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email},
-        expires_delta=access_token_expires
-    )
+    access_token = create_user_access_token(user)
+    refresh_token, _ = issue_refresh_token(db, user)
+    await db.commit()
+    
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "refresh_token": refresh_token,
+    }
+
+
+@router.post("/refresh", response_model=Token)
+async def refresh(
+    refresh_in: RefreshRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Exchange a refresh token for a new access token.
     
-    return {"access_token": access_token, "token_type": "bearer"}
+    The refresh token is single use: the response carries its replacement.
+    No password check, so this is far cheaper than logging in again.
+    """
+    user, refresh_token = await rotate_refresh_token(db, refresh_in.refresh_token)
+    access_token = create_user_access_token(user)
+    
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "refresh_token": refresh_token,
+    }
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    logout_in: Optional[LogoutRequest] = None,
+    claims: TokenPayload = Depends(get_token_claims),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Revoke the access token used for this request and the refresh tokens
+    that could replace it.
+    
+    Send {"refresh_token": ...} to end only this session; without it every
+    refresh token of the user is revoked (logged out everywhere).
+    """
+    await revoke_session(db, claims, logout_in.refresh_token if logout_in else None)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
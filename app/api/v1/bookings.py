@@ -1,60 +1,204 @@
 # /app/api/v1/bookings.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status as http_status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import List
+from typing import List, Optional
 
-from app.db.session import get_db
-from app.models.organization import Organization
-from app.core.auth_service import get_current_organization
-from app.schemas.booking import BookingCreate, BookingPublic
+from app.db.session import get_db, get_read_db
+from app.db.instrumentation import query_budget
+from app.core.tenant import TenantContext, get_tenant_context, client_belongs_to_tenant, load_tenant_context
+from app.core.booking_import import UnsupportedImportFormat, content_charset, import_format, iter_import_rows
+from app.core.booking_export import EXPORT_FORMATS, stream_bookings_export
+from app.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, encode_cursor
+from app.core.change_version import etag_matches, representation_key, tenant_etag
+from app.core.idempotency import run_idempotent
+from app.models.workflow import BookingStatus
+from app.schemas.booking import BookingCreate, BookingDetail, BookingPublic, BookingImportResult
 from app.core.booking_service import BookingService
 
 router = APIRouter()
 
+# Query budgets: see app.db.instrumentation.query_budget
+
 # Dependency to get the service
-def get_booking_service(db: AsyncSession = Depends(get_db)) -> BookingService:
-    return BookingService(db)
+def get_booking_service(
+    db: AsyncSession = Depends(get_db),
+    read_db: AsyncSession = Depends(get_read_db)
+) -> BookingService:
+    return BookingService(db, read_db)
+
+async def not_modified(
+    request: Request, response: Response, service: BookingService, tenant: TenantContext
+) -> Optional[Response]:
+    """
+    Conditional GET for list endpoints. Returns a 304 when the client's
+    If-None-Match still matches the organization's change version and the
+    same path and query (no booking tables touched); otherwise sets the
+    ETag and returns None.
+    """
+    etag = tenant_etag(
+        tenant.id,
+        await service.get_change_version(tenant),
+        representation_key(request.url.path, request.query_params),
+    )
+    # no-cache: clients may keep the body but must revalidate every time
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=http_status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
 
-@router.post("/", response_model=BookingPublic)
+@router.post("/", response_model=BookingPublic, dependencies=[Depends(query_budget(8))])
 async def create_booking(
+    request: Request,
     booking_in: BookingCreate,
-    organization_id: int = Depends(get_current_organization),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    tenant: TenantContext = Depends(get_tenant_context),
     service: BookingService = Depends(get_booking_service),
     db: AsyncSession = Depends(get_db)
 ):
     """
     Create a new Booking, its Payable, and its Invoice.
-    """
-    # Get the organization object
-    result = await db.execute(
-        select(Organization).where(Organization.id == organization_id)
-    )
-    org = result.scalar_one_or_none()
-    if not org:
-        raise HTTPException(status_code=404, detail="Organization not found")
     
-    # TODO: Validate that booking_in.client_id belongs to this org
-    
-    booking = await service.create_booking(booking_data=booking_in, org=org)
-    return booking
+    Send an Idempotency-Key header to make retries safe: a repeated key
+    replays the first response instead of creating the booking again.
+    """
+    async def create():
+        if not await client_belongs_to_tenant(db, tenant, booking_in.client_id):
+            raise HTTPException(status_code=404, detail="Client not found")
+        
+        return await service.create_booking(booking_data=booking_in, org=tenant)
+
+    return await run_idempotent(request, tenant.id, idempotency_key, create, BookingPublic, service.db)
 
-@router.get("/", response_model=List[BookingPublic])
+@router.get("/", response_model=List[BookingPublic], dependencies=[Depends(query_budget(5))])
 async def list_bookings(
-    organization_id: int = Depends(get_current_organization),
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status: Optional[BookingStatus] = None,
+    carrier_name: Optional[str] = None,
+    client_id: Optional[int] = None,
+    reference_prefix: Optional[str] = Query(None, min_length=1),
+    tenant: TenantContext = Depends(get_tenant_context),
+    service: BookingService = Depends(get_booking_service)
+):
+    """
+    List bookings for the user's organization, newest first.
+    
+    Cursor-paginated: when more rows exist, the X-Next-Cursor response
+    header holds the `cursor` value for the next page. Supports ETag /
+    If-None-Match: unchanged data is answered with 304 Not Modified.
+    """
+    cached = await not_modified(request, response, service, tenant)
+    if cached is not None:
+        return cached
+    bookings, next_id = await service.get_bookings(
+        org=tenant,
+        limit=limit,
+        before_id=decode_cursor(cursor),
+        status=status,
+        carrier_name=carrier_name,
+        client_id=client_id,
+        reference_prefix=reference_prefix,
+    )
+    if next_id is not None:
+        response.headers["X-Next-Cursor"] = encode_cursor(next_id)
+    return bookings
+
+@router.post("/import", response_model=BookingImportResult)
+async def import_bookings(
+    request: Request,
+    tenant: TenantContext = Depends(get_tenant_context),
     service: BookingService = Depends(get_booking_service),
     db: AsyncSession = Depends(get_db)
 ):
     """
-    List all bookings for the user's organization.
+    Bulk-import bookings (with their Payables and Invoices) from a CSV
+    (text/csv, header row required) or NDJSON (application/x-ndjson) body,
+    UTF-8 unless the Content-Type names a charset.
+    
+    Each row has the same fields as a single booking. The body is streamed
+    and inserted in chunks; the response reports every rejected row.
     """
-    # Get the organization object
-    result = await db.execute(
-        select(Organization).where(Organization.id == organization_id)
-    )
-    org = result.scalar_one_or_none()
-    if not org:
-        raise HTTPException(status_code=404, detail="Organization not found")
+    try:
+        fmt = import_format(request.headers.get("content-type"))
+        encoding = content_charset(request.headers.get("content-type"))
+    except UnsupportedImportFormat as exc:
+        raise HTTPException(status_code=http_status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=str(exc))
     
-    bookings = await service.get_bookings(org=org)
+    # Check clients against a fresh list, not a possibly stale cache entry
+    tenant = await load_tenant_context(db, tenant.id) or tenant
+    rows = iter_import_rows(request.stream(), fmt, encoding)
+    return await service.import_bookings(rows, org=tenant)
+
+@router.get("/export")
+async def export_bookings(
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    gzip: bool = False,
+    tenant: TenantContext = Depends(get_tenant_context)
+):
+    """
+    Export every booking with its payable, invoice and financing request,
+    streamed as NDJSON or CSV (optionally gzip-compressed).
+    
+    Rows are read through a server-side cursor and sent in fixed-size
+    chunks, so memory use does not grow with the size of the export.
+    """
+    headers = {"Content-Disposition": f'attachment; filename="bookings.{fmt}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        stream_bookings_export(tenant.id, fmt, gzip=gzip),
+        media_type=EXPORT_FORMATS[fmt],
+        headers=headers,
+    )
+
+@router.get("/details", response_model=List[BookingDetail], dependencies=[Depends(query_budget(5))])
+async def list_booking_details(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status: Optional[BookingStatus] = None,
+    carrier_name: Optional[str] = None,
+    client_id: Optional[int] = None,
+    reference_prefix: Optional[str] = Query(None, min_length=1),
+    tenant: TenantContext = Depends(get_tenant_context),
+    service: BookingService = Depends(get_booking_service)
+):
+    """
+    Same as the bookings list, but each booking includes its payable (with
+    financing request) and invoice. The whole page is loaded in one query.
+    """
+    cached = await not_modified(request, response, service, tenant)
+    if cached is not None:
+        return cached
+    bookings, next_id = await service.get_bookings(
+        org=tenant,
+        limit=limit,
+        before_id=decode_cursor(cursor),
+        status=status,
+        carrier_name=carrier_name,
+        client_id=client_id,
+        reference_prefix=reference_prefix,
+        with_financials=True,
+    )
+    if next_id is not None:
+        response.headers["X-Next-Cursor"] = encode_cursor(next_id)
     return bookings
+
+@router.get("/{booking_id}", response_model=BookingDetail, dependencies=[Depends(query_budget(4))])
+async def get_booking(
+    booking_id: int,
+    tenant: TenantContext = Depends(get_tenant_context),
+    service: BookingService = Depends(get_booking_service)
+):
+    """
+    Get a single booking with its payable, financing request and invoice.
+    """
+    booking = await service.get_booking(booking_id=booking_id, org=tenant)
+    if not booking:
+        raise HTTPException(status_code=http_status.HTTP_404_NOT_FOUND, detail="Booking not found")
+    return booking
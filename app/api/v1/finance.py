@@ -1,53 +1,348 @@
 # /app/api/v1/finance.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import List
+from decimal import Decimal
+from datetime import datetime
+from xml.etree.ElementTree import ParseError
+from typing import List, Optional
 
-from app.db.session import get_db
-from app.models.organization import Organization
-from app.core.auth_service import get_current_organization
-from app.schemas.finance import FinancingRequestPublic
-from app.core.finance_service import FinanceService
+from app.db.session import get_db, get_read_db
+from app.db.instrumentation import query_budget
+from app.core.tenant import TenantContext, get_tenant_context
+from app.core.idempotency import run_idempotent
+from app.schemas.finance import (
+    AgingGroupBy, AgingPublic, BatchFinancingCreate, BatchFinancingTransition,
+    BatchFinancingTransitionResult, CashFlowForecast, FinancingEventPublic, FinancingTransition,
+    FinancingTransitionCreate, FinancingTransitionOutcome, ForecastGranularity,
+    BatchFinancingResult, ExposurePublic, FinancingQuoteCreate,
+    FinancingQuoteResult, FinancingRequestPublic, LedgerBalancesPublic, PayablePublic,
+    BankReconciliationResult,
+)
+from app.core.auth_service import get_token_claims, is_operator, require_operator
+from app.core.finance_service import (
+    FinanceService, FinancingAlreadyRequested, PayableNotEligible, StatementTooLarge, TransitionRefused,
+    UnderwritingDeclined,
+)
+from app.core.booking_import import UnsupportedImportFormat, content_charset
+from app.core.reconciliation import UnsupportedStatementFormat, iter_statement_lines, statement_format
+from app.schemas.auth import TokenPayload
+from app.core.forecast import MAX_HORIZON_DAYS
 
 router = APIRouter()
 
+# Query budgets: see app.db.instrumentation.query_budget
+
 # Dependency to get the service
-def get_finance_service(db: AsyncSession = Depends(get_db)) -> FinanceService:
-    return FinanceService(db)
+def get_finance_service(
+    db: AsyncSession = Depends(get_db),
+    read_db: AsyncSession = Depends(get_read_db)
+) -> FinanceService:
+    return FinanceService(db, read_db)
+
+@router.get(
+    "/payables/{payable_id}",
+    response_model=PayablePublic,
+    dependencies=[Depends(query_budget(4))]
+)
+async def get_payable(
+    payable_id: int,
+    tenant: TenantContext = Depends(get_tenant_context),
+    service: FinanceService = Depends(get_finance_service)
+):
+    """
+    Get a single Payable belonging to the user's organization.
+    """
+    payable = await service.get_payable(payable_id=payable_id, org=tenant)
+    if not payable:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, 
+            detail="Payable not found"
+        )
+    return payable
 
 @router.post(
     "/payables/{payable_id}/request_financing", 
-    response_model=FinancingRequestPublic
+    response_model=FinancingRequestPublic,
+    dependencies=[Depends(query_budget(16))]
 )
 async def request_financing(
+    request: Request,
     payable_id: int,
-    organization_id: int = Depends(get_current_organization),
-    service: FinanceService = Depends(get_finance_service),
-    db: AsyncSession = Depends(get_db)
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    tenant: TenantContext = Depends(get_tenant_context),
+    service: FinanceService = Depends(get_finance_service)
 ):
     """
     This is the "FINANCE THIS" button.
     Creates a new FinancingRequest for a specific Payable.
+    
+    The request is created APPROVED or, if underwriting wants a manual
+    review, PENDING. Declines return 422 with the failed rules, as does a
+    payable that is already paid or financed; a payable that already has
+    a financing request is a 409.
+    
+    Send an Idempotency-Key header to make retries safe: a repeated key
+    replays the first response instead of creating another request.
+    """
+    async def finance():
+        # 1. Get the payable and ensure it belongs to this org
+        payable = await service.get_payable(payable_id=payable_id, org=tenant, for_write=True)
+        if not payable:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, 
+                detail="Payable not found"
+            )
+        
+        # 2. Call the service logic to create the request
+        try:
+            return await service.request_financing(payable=payable, org=tenant)
+        except FinancingAlreadyRequested as exc:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc))
+        except PayableNotEligible as exc:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exc))
+        except UnderwritingDeclined as exc:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail={"message": str(exc), "reasons": list(exc.reasons)},
+            )
+
+    return await run_idempotent(request, tenant.id, idempotency_key, finance, FinancingRequestPublic, service.db)
+
+
+@router.post(
+    "/financing_requests/batch",
+    response_model=BatchFinancingResult,
+    dependencies=[Depends(query_budget(15))]
+)
+async def request_financing_batch(
+    request: Request,
+    batch_in: BatchFinancingCreate,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    tenant: TenantContext = Depends(get_tenant_context),
+    service: FinanceService = Depends(get_finance_service)
+):
+    """
+    "Finance all of these": request financing for a list of payable IDs,
+    or for every eligible payable matching a due-date/payee filter.
+    
+    Every eligible payable is underwritten. Returns one result per payable:
+    CREATED (with the new request), ALREADY_REQUESTED, NOT_ELIGIBLE,
+    DECLINED or NOT_FOUND, with the underwriting reasons if any.
+    """
+    async def finance_batch():
+        return await service.request_financing_batch(batch=batch_in, org=tenant)
+
+    return await run_idempotent(
+        request, tenant.id, idempotency_key, finance_batch, BatchFinancingResult, service.db
+    )
+
+
+@router.post(
+    "/financing_requests/transitions",
+    response_model=BatchFinancingTransitionResult,
+    dependencies=[Depends(require_operator), Depends(query_budget(10))],
+    include_in_schema=False,
+)
+async def transition_financing_batch(
+    batch_in: BatchFinancingTransition,
+    claims: TokenPayload = Depends(get_token_claims),
+    tenant: TenantContext = Depends(get_tenant_context),
+    service: FinanceService = Depends(get_finance_service)
+):
     """
-    # Get the organization object
-    result = await db.execute(
-        select(Organization).where(Organization.id == organization_id)
+    Apply one transition (approve, fund, repay or reject) to many financing
+    requests, each optionally guarded by its expected version. Returns one
+    result per request: TRANSITIONED, VERSION_CONFLICT, INVALID_TRANSITION
+    or NOT_FOUND, with its current status and version.
+    """
+    result, _ = await service.transition_financing(
+        batch_in.transition,
+        [(target.id, target.version) for target in batch_in.requests],
+        org=tenant,
+        actor_user_id=claims.user_id,
     )
-    org = result.scalar_one_or_none()
-    if not org:
-        raise HTTPException(status_code=404, detail="Organization not found")
+    return result
+
+
+@router.post(
+    "/financing_requests/{request_id}/{transition}",
+    response_model=FinancingRequestPublic,
+    dependencies=[Depends(require_operator), Depends(query_budget(10))],
+    include_in_schema=False,
+)
+async def transition_financing_request(
+    request_id: int,
+    transition: FinancingTransition,
+    transition_in: Optional[FinancingTransitionCreate] = None,
+    claims: TokenPayload = Depends(get_token_claims),
+    tenant: TenantContext = Depends(get_tenant_context),
+    service: FinanceService = Depends(get_finance_service)
+):
+    """
+    Move a financing request through its lifecycle:
+    approve (PENDING -> APPROVED), fund (APPROVED -> FUNDED),
+    repay (FUNDED -> REPAID) or reject (PENDING/APPROVED -> REJECTED).
     
-    # 1. Get the payable and ensure it belongs to this org
-    payable = await service.get_payable(payable_id=payable_id, org=org)
-    if not payable:
+    Send {"version": n} to apply it only if the request is still at that
+    version (409 otherwise). A transition not allowed from the current
+    status is also a 409.
+    """
+    try:
+        return await service.transition_financing_request(
+            request_id,
+            transition,
+            transition_in.version if transition_in else None,
+            org=tenant,
+            actor_user_id=claims.user_id,
+        )
+    except TransitionRefused as exc:
+        if exc.item.outcome == FinancingTransitionOutcome.NOT_FOUND:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Financing request not found")
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, 
-            detail="Payable not found"
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": str(exc), **exc.item.model_dump(mode="json")},
         )
+
+
+@router.get(
+    "/financing_requests/{request_id}/events",
+    response_model=List[FinancingEventPublic],
+    dependencies=[Depends(query_budget(5))]
+)
+async def get_financing_events(
+    request_id: int,
+    tenant: TenantContext = Depends(get_tenant_context),
+    service: FinanceService = Depends(get_finance_service)
+):
+    """A financing request's status transitions, oldest first."""
+    events = await service.get_financing_events(request_id, org=tenant)
+    if events is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Financing request not found")
+    return events
+
+
+@router.post("/quotes", response_model=FinancingQuoteResult, dependencies=[Depends(query_budget(5))])
+async def quote_financing(
+    quote_in: FinancingQuoteCreate,
+    tenant: TenantContext = Depends(get_tenant_context),
+    service: FinanceService = Depends(get_finance_service)
+):
+    """
+    What would it cost to finance these? Prices payables selected like a
+    batch financing call (IDs or a due-date/payee filter) from their
+    invoices and tenor. Creates nothing, so it is safe to call freely.
+    """
+    return await service.quote_financing(selection=quote_in, org=tenant)
+
+
+@router.get("/exposure", response_model=ExposurePublic, dependencies=[Depends(query_budget(5))])
+async def get_exposure(
+    tenant: TenantContext = Depends(get_tenant_context),
+    service: FinanceService = Depends(get_finance_service)
+):
+    """
+    Outstanding financed amounts (approved + funded) for the organization
+    and per client, read from the exposure ledger.
+    """
+    return await service.get_exposure(org=tenant)
+
+
+@router.get("/aging", response_model=AgingPublic, dependencies=[Depends(query_budget(5))])
+async def get_aging(
+    group_by: Optional[AgingGroupBy] = Query(None),
+    tenant: TenantContext = Depends(get_tenant_context),
+    service: FinanceService = Depends(get_finance_service)
+):
+    """
+    Receivables (open invoices) and payables (open carrier bills) by days
+    past due: current, 1-30, 31-60, 61-90 and over 90. Pass group_by=client
+    or group_by=carrier for a breakdown.
+    """
+    return await service.get_aging(org=tenant, group_by=group_by)
+
+
+@router.post(
+    "/reconciliation/bank_statement",
+    response_model=BankReconciliationResult,
+    dependencies=[Depends(query_budget(12))]
+)
+async def reconcile_bank_statement(
+    request: Request,
+    dry_run: bool = False,
+    operator: bool = Depends(is_operator),
+    claims: TokenPayload = Depends(get_token_claims),
+    tenant: TenantContext = Depends(get_tenant_context),
+    service: FinanceService = Depends(get_finance_service)
+):
+    """
+    Reconcile a bank statement: a CSV (text/csv; columns amount, reference
+    and optionally date; UTF-8 unless the Content-Type names a charset) or
+    CAMT.053-style XML (application/xml) body.
     
-    # 2. Call the service logic to create the request
-    # TODO: Add check to prevent duplicate requests
-    
-    financing_request = await service.request_financing(payable=payable)
-    return financing_request
+    Credit lines are matched to open invoices by booking reference: exact
+    reference and amount first, then the reference with a small amount
+    tolerance, then a similar reference. Matched invoices become PAID;
+    with dry_run=true nothing is changed. Unmatched lines are reported
+    with why.
+
+    Repayment is Leva's decision (see require_operator): only with
+    X-Operator-Token are funded financing requests matched too, and
+    marked REPAID. A user's own statement can't settle their financing.
+    """
+    content_type = request.headers.get("content-type")
+    try:
+        fmt = statement_format(content_type)
+        encoding = content_charset(content_type)
+    except (UnsupportedStatementFormat, UnsupportedImportFormat) as exc:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=str(exc))
+    try:
+        return await service.reconcile_bank_statement(
+            iter_statement_lines(request.stream(), fmt, encoding),
+            org=tenant,
+            actor_user_id=claims.user_id,
+            dry_run=dry_run,
+            settle_financing=operator,
+        )
+    except StatementTooLarge as exc:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(exc))
+    except ParseError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Malformed XML: {exc}")
+    except UnicodeDecodeError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Not valid {encoding} text ({exc.reason}); "
+                   "name the file's encoding in the Content-Type charset",
+        )
+
+
+@router.get("/ledger/balances", response_model=LedgerBalancesPublic, dependencies=[Depends(query_budget(4))])
+async def get_ledger_balances(
+    as_of: Optional[datetime] = Query(None),
+    tenant: TenantContext = Depends(get_tenant_context),
+    service: FinanceService = Depends(get_finance_service)
+):
+    """
+    Balances of the organization's ledger accounts (cash, financing
+    receivable, fee income) as of `as_of` (UTC, default now). Debits are
+    positive and credits negative.
+    """
+    return await service.get_ledger_balances(org=tenant, as_of=as_of)
+
+
+@router.get("/forecast", response_model=CashFlowForecast, dependencies=[Depends(query_budget(5))])
+async def get_cash_flow_forecast(
+    horizon_days: int = Query(90, ge=1, le=MAX_HORIZON_DAYS),
+    granularity: ForecastGranularity = Query(ForecastGranularity.DAY),
+    opening_balance: Decimal = Query(Decimal("0.00"), max_digits=18, decimal_places=2),
+    tenant: TenantContext = Depends(get_tenant_context),
+    service: FinanceService = Depends(get_finance_service)
+):
+    """
+    The cash-flow gap: projected cash position per day or week, starting
+    from `opening_balance`. Client invoices come in on their due dates;
+    carrier payables go out on theirs unless Leva funded them, in which
+    case the repayment goes out when the client's invoice is due.
+    """
+    return await service.get_cash_flow_forecast(
+        org=tenant, horizon_days=horizon_days, granularity=granularity, opening_balance=opening_balance
+    )
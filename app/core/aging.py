@@ -0,0 +1,141 @@
+# /app/core/aging.py
+from datetime import date
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import Date, Numeric, case, cast, func, literal, null, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache
+from app.core.metrics import register_metrics_source
+from app.models.finance import Invoice, Payable, PaymentStatus
+from app.models.workflow import Booking
+from app.schemas.finance import AgingBuckets, AgingGroup, AgingGroupBy, AgingPublic, AgingReport
+
+# Invoices and payables still waiting to be paid
+OPEN_STATUSES = (PaymentStatus.PENDING, PaymentStatus.OVERDUE)
+
+# (upper bound in days past due, AgingBuckets field); the last is open-ended
+BUCKETS = (
+    (0, "current"),
+    (30, "days_1_30"),
+    (60, "days_31_60"),
+    (90, "days_61_90"),
+    (None, "days_over_90"),
+)
+
+# Keyed by (organization, change version, as-of date, grouping): any booking
+# or finance write bumps the version, so entries for older versions are
+# never read again (and are dropped when the new version is cached). The
+# TTL only bounds memory for tenants that go quiet.
+AGING_CACHE_TTL_SECONDS = 300
+AGING_CACHE_MAX_SIZE = 2_000
+
+aging_cache: TTLCache[tuple, AgingPublic] = TTLCache(
+    max_size=AGING_CACHE_MAX_SIZE, ttl_seconds=AGING_CACHE_TTL_SECONDS
+)
+register_metrics_source("aging_cache", aging_cache.stats)
+
+
+def _group_column(group_by: Optional[AgingGroupBy]):
+    if group_by == AgingGroupBy.CLIENT:
+        return Booking.client_id
+    if group_by == AgingGroupBy.CARRIER:
+        return Booking.carrier_name
+    return null()
+
+
+def aging_query(organization_id: int, as_of: date, group_by: Optional[AgingGroupBy] = None):
+    """
+    Open receivables and payables summed per (ledger, group, bucket) in one
+    grouped statement. Amounts are cast to Numeric before summing, so the
+    totals are exact.
+    """
+    group = _group_column(group_by)
+    items = union_all(
+        select(
+            literal("receivables").label("ledger"),
+            group.label("group_key"),
+            Invoice.amount.label("amount"),
+            Invoice.due_date.label("due_date"),
+        )
+        .join(Booking, Booking.id == Invoice.booking_id)
+        .where(Booking.organization_id == organization_id, Invoice.status.in_(OPEN_STATUSES)),
+        select(
+            literal("payables"),
+            group,
+            Payable.amount,
+            Payable.due_date,
+        )
+        .join(Booking, Booking.id == Payable.booking_id)
+        .where(Booking.organization_id == organization_id, Payable.status.in_(OPEN_STATUSES)),
+    ).subquery("open_items")
+
+    # date - date is an integer number of days in Postgres
+    days_past_due = literal(as_of, Date) - cast(items.c.due_date, Date)
+    bucket = case(
+        *[(days_past_due <= bound, i) for i, (bound, _) in enumerate(BUCKETS) if bound is not None],
+        else_=len(BUCKETS) - 1,
+    ).label("bucket")
+    return (
+        select(
+            items.c.ledger,
+            items.c.group_key,
+            bucket,
+            func.sum(cast(items.c.amount, Numeric(18, 2))),
+            func.count(),
+        )
+        .group_by(items.c.ledger, items.c.group_key, bucket)
+    )
+
+
+def _report(rows, group_by: Optional[AgingGroupBy]) -> AgingReport:
+    totals = AgingBuckets()
+    groups: dict = {}
+    for group_key, bucket, amount, count in rows:
+        targets = [totals]
+        if group_by is not None:
+            if group_key not in groups:
+                field = "client_id" if group_by == AgingGroupBy.CLIENT else "carrier_name"
+                groups[group_key] = AgingGroup(**{field: group_key})
+            targets.append(groups[group_key])
+        field = BUCKETS[bucket][1]
+        for target in targets:
+            setattr(target, field, getattr(target, field) + amount)
+            target.total += amount
+            target.count += count
+    return AgingReport(
+        totals=totals,
+        groups=sorted(groups.values(), key=lambda group: group.total, reverse=True),
+    )
+
+
+async def compute_aging(
+    db: AsyncSession, organization_id: int, as_of: date, group_by: Optional[AgingGroupBy] = None
+) -> AgingPublic:
+    result = await db.execute(aging_query(organization_id, as_of, group_by))
+    by_ledger: dict[str, list] = {"receivables": [], "payables": []}
+    for ledger, group_key, bucket, amount, count in result.all():
+        by_ledger[ledger].append((group_key, bucket, Decimal(amount), count))
+    return AgingPublic(
+        as_of=as_of,
+        group_by=group_by,
+        receivables=_report(by_ledger["receivables"], group_by),
+        payables=_report(by_ledger["payables"], group_by),
+    )
+
+
+async def get_aging(
+    db: AsyncSession, organization_id: int, version: int, as_of: date,
+    group_by: Optional[AgingGroupBy] = None,
+) -> AgingPublic:
+    """The aging report for the organization at `version`, cached."""
+    key = (organization_id, version, as_of, group_by)
+    report = aging_cache.get(key)
+    if report is None:
+        report = await compute_aging(db, organization_id, as_of, group_by)
+        aging_cache.invalidate_where(
+            lambda cached, _: cached[0] == organization_id and (cached[1] < version or cached[2] < as_of)
+        )
+        aging_cache.set(key, report)
+    return report
@@ -1,24 +1,98 @@
+import base64
+import hashlib
+import hmac
+import secrets
+import time
+import uuid
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlalchemy import select
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi import Depends, HTTPException, status
+from sqlalchemy.orm import Session, object_session
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 
+from app.models.auth import RefreshToken, RevokedToken
 from app.models.organization import User
 from app.db.session import get_db
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from app.core.hashing import run_hash_operation
+from app.core.metrics import register_metrics_source
+from app.core.token_denylist import TokenDenylist
+from app.schemas.auth import TokenPayload
 
 # Configuration
 SECRET_KEY = "your-secret-key-change-this-in-production"  # TODO: Move to .env
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+REFRESH_TOKEN_EXPIRE_DAYS = 30
+
+# Authenticated principals are cached per token subject so protected
+# requests don't need a SELECT on users. Kept short so a missed
+# invalidation heals itself quickly.
+PRINCIPAL_CACHE_TTL_SECONDS = 60
+PRINCIPAL_CACHE_MAX_SIZE = 10_000
+
+# How often each worker reloads revoked tokens / deactivated users
+TOKEN_DENYLIST_REFRESH_SECONDS = 30
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/token")
 
 
+@dataclass(frozen=True)
+class Principal:
+    """
+    Immutable snapshot of an authenticated user.
+    Safe to share across requests, unlike a session-bound User row.
+    """
+    id: int
+    email: str
+    full_name: str
+    organization_id: int
+    is_active: bool
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            full_name=user.full_name,
+            organization_id=user.organization_id,
+            is_active=user.is_active,
+        )
+
+
+principal_cache: TTLCache[str, Principal] = TTLCache(
+    max_size=PRINCIPAL_CACHE_MAX_SIZE, ttl_seconds=PRINCIPAL_CACHE_TTL_SECONDS
+)
+register_metrics_source("principal_cache", principal_cache.stats)
+
+
+token_denylist = TokenDenylist(
+    refresh_interval_seconds=TOKEN_DENYLIST_REFRESH_SECONDS,
+    max_token_age=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
+)
+register_metrics_source("token_denylist", token_denylist.stats)
+
+
+def invalidate_principal(email: str) -> None:
+    """Drop the cached principal for a token subject."""
+    principal_cache.invalidate(email)
+
+
+def invalidate_organization_principals(organization_id: int) -> int:
+    """Drop every cached principal belonging to an organization."""
+    return principal_cache.invalidate_where(
+        lambda _, principal: principal.organization_id == organization_id
+    )
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a plain password against a hashed password."""
     return pwd_context.verify(plain_password, hashed_password)
@@ -29,18 +103,176 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the bounded hashing pool, off the event loop."""
+    return await run_hash_operation(pwd_context.verify, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password on the bounded hashing pool, off the event loop."""
+    return await run_hash_operation(pwd_context.hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
-    """Create a JWT access token."""
+    """
+    Create a JWT access token.
+    Every token gets a unique `jti` (so it can be revoked) and an `iat`.
+    `iat` keeps its fraction of a second: a token issued just after a
+    revocation cutoff in the same second must not be caught by it.
+    """
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": time.time(), "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
+def create_user_access_token(user: User | Principal) -> str:
+    """
+    Create an access token carrying the signed tenant claims, so
+    tenant-scoped endpoints can resolve the organization without the DB.
+    """
+    return create_access_token(
+        data={
+            "sub": user.email,
+            "user_id": user.id,
+            "organization_id": user.organization_id,
+        },
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
+    )
+
+
+async def revoke_session(
+    db: AsyncSession, claims: TokenPayload, raw_refresh_token: Optional[str] = None
+) -> None:
+    """
+    Log out: revoke the access token until it expires, and in the same
+    transaction the refresh tokens that could mint new ones. With the
+    session's refresh token only its family is revoked; without it (or if
+    it isn't one of the user's) every active refresh token of the user is.
+    Revoking again, here or in another worker, is a no-op.
+    """
+    if claims.jti is None or claims.user_id is None:
+        return
+    now = datetime.utcnow()
+    expires_at = datetime.utcfromtimestamp(claims.exp)
+    await db.execute(
+        pg_insert(RevokedToken)
+        .values(jti=claims.jti, user_id=claims.user_id, expires_at=expires_at, revoked_at=now)
+        .on_conflict_do_nothing(index_elements=["jti"])
+    )
+
+    user_tokens = (RefreshToken.user_id == claims.user_id, RefreshToken.revoked_at.is_(None))
+    family_id = None
+    if raw_refresh_token:
+        secret, _, signature = raw_refresh_token.partition(".")
+        if secret and hmac.compare_digest(signature, _sign_refresh_secret(secret)):
+            family_id = (await db.execute(
+                select(RefreshToken.family_id).where(
+                    RefreshToken.token_hash == _hash_refresh_secret(secret),
+                    RefreshToken.user_id == claims.user_id,
+                )
+            )).scalar_one_or_none()
+    if family_id is not None:
+        user_tokens += (RefreshToken.family_id == family_id,)
+    await db.execute(update(RefreshToken).where(*user_tokens).values(revoked_at=now))
+    await db.commit()
+    token_denylist.revoke_token(claims.jti, expires_at)
+
+
+# --- Refresh tokens ---
+# A refresh token is "<secret>.<signature>", where the signature is an HMAC
+# of the secret under SECRET_KEY. Forged tokens are rejected before touching
+# the DB; genuine ones cost one indexed lookup on the secret's SHA-256.
+# No bcrypt involved.
+
+def _sign_refresh_secret(secret: str) -> str:
+    digest = hmac.new(SECRET_KEY.encode(), secret.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+def _hash_refresh_secret(secret: str) -> str:
+    return hashlib.sha256(secret.encode()).hexdigest()
+
+
+def issue_refresh_token(
+    db: AsyncSession, user: User, family_id: Optional[str] = None
+) -> tuple[str, RefreshToken]:
+    """
+    Create a refresh token for a user and add it to the session.
+    The caller commits. Returns the raw token (shown to the client once).
+    """
+    secret = secrets.token_urlsafe(32)
+    now = datetime.utcnow()
+    record = RefreshToken(
+        user_id=user.id,
+        token_hash=_hash_refresh_secret(secret),
+        family_id=family_id or uuid.uuid4().hex,
+        created_at=now,
+        expires_at=now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    )
+    db.add(record)
+    return f"{secret}.{_sign_refresh_secret(secret)}", record
+
+
+async def rotate_refresh_token(db: AsyncSession, raw_token: str) -> tuple[User, str]:
+    """
+    Exchange a refresh token for a new one in the same family.
+    Presenting a token that was already rotated means it leaked: the whole
+    family is revoked and the caller must log in again.
+    """
+    secret, _, signature = raw_token.partition(".")
+    if not secret or not hmac.compare_digest(signature, _sign_refresh_secret(secret)):
+        raise _credentials_exception()
+
+    result = await db.execute(
+        select(RefreshToken, User)
+        .join(User, User.id == RefreshToken.user_id)
+        .where(RefreshToken.token_hash == _hash_refresh_secret(secret))
+    )
+    row = result.first()
+    if row is None:
+        raise _credentials_exception()
+    record, user = row
+
+    now = datetime.utcnow()
+    if (
+        record.expires_at <= now
+        or not user.is_active
+        or (user.tokens_valid_after is not None and record.created_at <= user.tokens_valid_after)
+    ):
+        raise _credentials_exception()
+
+    # Conditional update so two concurrent refreshes can't both rotate
+    claimed = await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.id == record.id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=now)
+        .returning(RefreshToken.id)
+    )
+    if claimed.first() is None:
+        await db.execute(
+            update(RefreshToken)
+            .where(RefreshToken.family_id == record.family_id, RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=now)
+        )
+        await db.commit()
+        raise _credentials_exception()
+
+    new_token, new_record = issue_refresh_token(db, user, family_id=record.family_id)
+    await db.flush()
+    await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.id == record.id)
+        .values(replaced_by_id=new_record.id)
+    )
+    await db.commit()
+    return user, new_token
+
+
 async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
     """Get a user by email."""
     result = await db.execute(select(User).where(User.email == email))
@@ -52,35 +284,156 @@ async def authenticate_user(db: AsyncSession, email: str, password: str) -> Opti
     user = await get_user_by_email(db, email)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
         return None
     return user
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: AsyncSession = Depends(get_db)
-) -> User:
-    """Get the current authenticated user from JWT token."""
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+async def get_token_claims(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db)
+) -> TokenPayload:
+    """
+    Decode and validate the JWT, then check it against the denylist.
+    Touches the DB only when the denylist is due for a refresh.
+    """
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    
-    user = await get_user_by_email(db, email)
-    if user is None:
-        raise credentials_exception
-    return user
+        claims = TokenPayload(**payload)
+    except (JWTError, ValueError):
+        raise _credentials_exception()
+
+    await token_denylist.ensure_fresh(db)
+    if token_denylist.is_revoked(claims.jti, claims.user_id, claims.iat):
+        raise _credentials_exception()
+    return claims
+
+
+def require_operator(x_operator_token: Optional[str] = Header(None)) -> None:
+    """
+    Approving, funding, repaying and rejecting financing are Leva's own
+    decisions, not the forwarder's: users have no role for them, so the
+    caller must also present OPERATOR_TOKEN (the back office's shared
+    secret). Without one configured the endpoints don't exist.
+    """
+    if not get_settings().operator_token:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not is_operator(x_operator_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Operator token required")
+
+
+def is_operator(x_operator_token: Optional[str] = Header(None)) -> bool:
+    """
+    Whether the caller presented OPERATOR_TOKEN, for endpoints that serve
+    both users and the back office but let only the latter act for Leva.
+    """
+    token = get_settings().operator_token
+    return bool(token) and x_operator_token is not None and hmac.compare_digest(
+        x_operator_token.encode(), token.encode()
+    )
+
+
+async def get_current_user(
+    claims: TokenPayload = Depends(get_token_claims),
+    db: AsyncSession = Depends(get_db)
+) -> Principal:
+    """
+    Get the current authenticated user from JWT token.
+    Served from the principal cache when possible; falls back to the DB.
+    """
+    email = claims.sub
+    principal = principal_cache.get(email)
+    if principal is None:
+        user = await get_user_by_email(db, email)
+        if user is None:
+            raise _credentials_exception()
+        principal = Principal.from_user(user)
+        principal_cache.set(email, principal)
+    if not principal.is_active:
+        raise _credentials_exception()
+    return principal
+
+
+async def get_current_organization(
+    claims: TokenPayload = Depends(get_token_claims),
+    db: AsyncSession = Depends(get_db)
+) -> int:
+    """
+    Get the current user's organization ID for multi-tenant filtering.
+    Read straight from the signed token claims, no DB access.
+    """
+    if claims.organization_id is not None:
+        return claims.organization_id
+    # Tokens issued before tenant claims existed: fall back to the principal
+    principal = await get_current_user(claims, db)
+    return principal.organization_id
+
+
+# --- Principal cache and token invalidation ---
+# Changes to a user's identity, status or tenant are picked up at flush time
+# and invalidated again once the transaction commits, so a request that read
+# the old row mid-transaction can't leave a stale principal behind.
+# Deactivation or an org move also cuts off tokens issued before the change,
+# since those carry the old organization_id claim.
+
+_PRINCIPAL_FIELDS = ("email", "full_name", "is_active", "organization_id")
+_TOKEN_FIELDS = ("is_active", "organization_id")
+_PENDING_INVALIDATIONS = "pending_principal_invalidations"
+_PENDING_TOKEN_CUTOFFS = "pending_token_cutoffs"
+
+
+def _queue_invalidation(target: User, emails: set[str]) -> None:
+    for email in emails:
+        principal_cache.invalidate(email)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_PENDING_INVALIDATIONS, set()).update(emails)
+
+
+@event.listens_for(User, "before_update")
+def _cut_off_user_tokens(mapper, connection, target: User) -> None:
+    state = inspect(target)
+    if not any(state.attrs[f].history.has_changes() for f in _TOKEN_FIELDS):
+        return
+    target.tokens_valid_after = datetime.utcnow()
+    session = object_session(target)
+    if session is not None:
+        cutoff = float("inf") if not target.is_active else time.time()
+        session.info.setdefault(_PENDING_TOKEN_CUTOFFS, {})[target.id] = cutoff
+
+
+@event.listens_for(User, "after_update")
+def _user_updated(mapper, connection, target: User) -> None:
+    state = inspect(target)
+    if not any(state.attrs[f].history.has_changes() for f in _PRINCIPAL_FIELDS):
+        return
+    emails = {target.email}
+    emails.update(e for e in state.attrs.email.history.deleted if e)
+    _queue_invalidation(target, emails)
+
+
+@event.listens_for(User, "after_delete")
+def _user_deleted(mapper, connection, target: User) -> None:
+    _queue_invalidation(target, {target.email})
+
+
+@event.listens_for(Session, "after_commit")
+def _flush_principal_invalidations(session: Session) -> None:
+    for email in session.info.pop(_PENDING_INVALIDATIONS, ()):
+        principal_cache.invalidate(email)
+    for user_id, cutoff in session.info.pop(_PENDING_TOKEN_CUTOFFS, {}).items():
+        token_denylist.revoke_user_tokens(user_id, cutoff)
 
 
-async def get_current_organization(current_user: User = Depends(get_current_user)) -> int:
-    """Get the current user's organization ID for multi-tenant filtering."""
-    return current_user.organization_id
+@event.listens_for(Session, "after_rollback")
+def _discard_principal_invalidations(session: Session) -> None:
+    session.info.pop(_PENDING_INVALIDATIONS, None)
+    session.info.pop(_PENDING_TOKEN_CUTOFFS, None)
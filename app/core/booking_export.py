@@ -0,0 +1,116 @@
+# /app/core/booking_export.py
+import csv
+import enum
+import io
+import json
+import zlib
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Sequence
+
+from sqlalchemy import Select, select
+
+from app.db.session import async_read_session, async_session, must_read_primary
+from app.models.finance import FinancingRequest, Invoice, Payable
+from app.models.workflow import Booking
+
+# Rows fetched per server-side cursor round trip and written per chunk.
+# Memory stays bounded by this, not by the size of the export.
+EXPORT_CHUNK_ROWS = 2000
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+# Output column name -> selected column, one row per booking
+_EXPORT_COLUMNS = [
+    ("booking_id", Booking.id),
+    ("reference_number", Booking.reference_number),
+    ("booking_status", Booking.status),
+    ("carrier_name", Booking.carrier_name),
+    ("client_id", Booking.client_id),
+    ("payable_id", Payable.id),
+    ("payable_amount", Payable.amount),
+    ("payable_due_date", Payable.due_date),
+    ("payable_status", Payable.status),
+    ("invoice_id", Invoice.id),
+    ("invoice_amount", Invoice.amount),
+    ("invoice_due_date", Invoice.due_date),
+    ("invoice_status", Invoice.status),
+    ("financing_request_id", FinancingRequest.id),
+    ("financing_status", FinancingRequest.status),
+    ("financing_fee_amount", FinancingRequest.fee_amount),
+    ("financing_total_repayment", FinancingRequest.total_repayment),
+]
+EXPORT_FIELDS = [name for name, _ in _EXPORT_COLUMNS]
+
+
+def export_query(organization_id: int) -> Select:
+    """Bookings joined with their payable, invoice and financing request."""
+    return (
+        select(*(column for _, column in _EXPORT_COLUMNS))
+        .select_from(Booking)
+        .outerjoin(Payable, Payable.booking_id == Booking.id)
+        .outerjoin(Invoice, Invoice.booking_id == Booking.id)
+        .outerjoin(FinancingRequest, FinancingRequest.payable_id == Payable.id)
+        .where(Booking.organization_id == organization_id)
+        .order_by(Booking.id)
+    )
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _encode_ndjson(rows: Sequence[Sequence[Any]]) -> bytes:
+    lines = (
+        json.dumps(dict(zip(EXPORT_FIELDS, map(_plain, row))), separators=(",", ":"))
+        for row in rows
+    )
+    return ("\n".join(lines) + "\n").encode()
+
+
+def _encode_csv(rows: Sequence[Sequence[Any]], header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_FIELDS)
+    writer.writerows([_plain(v) for v in row] for row in rows)
+    return buffer.getvalue().encode()
+
+
+async def stream_bookings_export(
+    organization_id: int, fmt: str, gzip: bool = False
+) -> AsyncIterator[bytes]:
+    """
+    Stream an organization's bookings and financials as NDJSON or CSV.
+
+    Uses a server-side cursor and encodes EXPORT_CHUNK_ROWS rows at a time,
+    so no more than one chunk is ever held in memory. Opens its own session
+    because it outlives the request's dependencies.
+    """
+    compressor = zlib.compressobj(wbits=31) if gzip else None  # 31 = gzip container
+
+    def emit(data: bytes) -> bytes:
+        return compressor.compress(data) if compressor else data
+
+    if fmt == "csv":
+        yield emit(_encode_csv([], header=True))
+
+    open_session = async_session if must_read_primary(organization_id) else async_read_session
+    async with open_session() as session:
+        result = await session.stream(
+            export_query(organization_id).execution_options(yield_per=EXPORT_CHUNK_ROWS)
+        )
+        async for rows in result.partitions():
+            chunk = _encode_ndjson(rows) if fmt == "ndjson" else _encode_csv(rows)
+            data = emit(chunk)
+            if data:
+                yield data
+
+    if compressor:
+        yield compressor.flush()
@@ -0,0 +1,115 @@
+# /app/core/booking_import.py
+import codecs
+import csv
+import json
+from typing import Any, AsyncIterator
+
+# Accepted request Content-Types for a bulk import
+CSV_CONTENT_TYPES = {"text/csv", "application/csv"}
+NDJSON_CONTENT_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl"}
+
+
+class UnsupportedImportFormat(ValueError):
+    pass
+
+
+def import_format(content_type: str | None) -> str:
+    """Map a request Content-Type to 'csv' or 'ndjson'."""
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in CSV_CONTENT_TYPES:
+        return "csv"
+    if media_type in NDJSON_CONTENT_TYPES:
+        return "ndjson"
+    raise UnsupportedImportFormat(
+        "Use Content-Type text/csv or application/x-ndjson for booking imports"
+    )
+
+
+def content_charset(content_type: str | None) -> str:
+    """
+    The charset parameter of a Content-Type (bank and spreadsheet exports
+    are often windows-1252), defaulting to UTF-8. Unknown charsets raise
+    UnsupportedImportFormat.
+    """
+    for param in (content_type or "").split(";")[1:]:
+        name, _, value = param.partition("=")
+        if name.strip().lower() == "charset":
+            charset = value.strip().strip('"').lower()
+            try:
+                codecs.lookup(charset)
+            except LookupError:
+                raise UnsupportedImportFormat(f"Unknown charset: {charset!r}")
+            return charset
+    return "utf-8"
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], encoding: str = "utf-8") -> AsyncIterator[str]:
+    """
+    Split a streamed body into lines without buffering the whole body.
+    Bytes that aren't valid `encoding` raise UnicodeDecodeError.
+    """
+    if codecs.lookup(encoding).name == "utf-8":
+        encoding = "utf-8-sig"  # skip a byte order mark
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def iter_import_rows(
+    chunks: AsyncIterator[bytes], fmt: str, encoding: str = "utf-8"
+) -> AsyncIterator[tuple[int, dict[str, Any] | str]]:
+    """
+    Yield (row_number, row) for each non-blank data row, numbered from 1.
+    A row is a dict of raw field values, or an error message if the line
+    could not be parsed at all. CSV rows must fit on one line (the first
+    line is the header). Rows after text that isn't valid `encoding` can't
+    be read: that is reported as the last row's error.
+    """
+    row_number = 0
+    try:
+        async for row in _iter_import_rows(chunks, fmt, encoding):
+            row_number = row[0]
+            yield row
+    except UnicodeDecodeError as exc:
+        yield row_number + 1, (
+            f"Not valid {encoding} text ({exc.reason}); nothing after this row was read. "
+            "Send the file's encoding as the Content-Type charset"
+        )
+
+
+async def _iter_import_rows(
+    chunks: AsyncIterator[bytes], fmt: str, encoding: str
+) -> AsyncIterator[tuple[int, dict[str, Any] | str]]:
+    header = None
+    row_number = 0
+    async for line in iter_lines(chunks, encoding):
+        if not line.strip():
+            continue
+        if fmt == "csv":
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            row_number += 1
+            if len(values) != len(header):
+                yield row_number, f"Expected {len(header)} columns, got {len(values)}"
+                continue
+            yield row_number, dict(zip(header, values))
+        else:
+            row_number += 1
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as exc:
+                yield row_number, f"Invalid JSON: {exc.msg}"
+                continue
+            if not isinstance(row, dict):
+                yield row_number, "Each line must be a JSON object"
+                continue
+            yield row_number, row
@@ -1,61 +1,328 @@
 # /app/core/booking_service.py
+from typing import Any, AsyncIterator
+from pydantic import ValidationError
+from sqlalchemy import insert, literal
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from app.models.workflow import Booking
-from app.models.finance import Payable, Invoice
-from app.models.organization import Organization
-from app.schemas.booking import BookingCreate
+from sqlalchemy.orm import joinedload
+from app.db.session import must_read_primary, record_primary_write
+from app.models.workflow import Booking, BookingStatus
+from app.models.finance import Payable, Invoice, PaymentStatus
+from app.core.tenant import TenantContext
+from app.core.change_version import bump_change_version, bump_statement, get_change_version
+from app.core.forecast import booking_cash_flows, record_cash_flows
+from app.schemas.booking import BookingCreate, BookingImportError, BookingImportResult
+
+# Rows per INSERT statement / transaction in bulk imports. Keeps each
+# statement well under asyncpg's 32767 bind parameter limit.
+IMPORT_CHUNK_SIZE = 1000
+
+# Loads booking -> payable -> financing_request and booking -> invoice.
+# All one-to-one, so they're LEFT OUTER JOINed into the booking query itself:
+# a page of BookingDetail costs one statement however long it is.
+BOOKING_DETAIL_LOAD = (
+    joinedload(Booking.payable).joinedload(Payable.financing_request),
+    joinedload(Booking.invoice),
+)
 
 class BookingService:
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, read_db: AsyncSession | None = None):
         self.db = db
+        # Read-only queries go to the replica session when one is provided
+        self.read_db = read_db or db
+
+    def _reader(self, org: TenantContext) -> AsyncSession:
+        """The session for read-only queries, honouring read-your-writes."""
+        return self.db if must_read_primary(org.id) else self.read_db
 
     async def create_booking(
-        self, booking_data: BookingCreate, org: Organization
+        self, booking_data: BookingCreate, org: TenantContext
     ) -> Booking:
         """
         Core business logic: Create a Booking, its associated
         Payable, and its associated Invoice in a single transaction.
+
+        All three rows (and the change version bump) are written by one
+        statement (data-modifying CTEs), so
+        the insert costs a single round trip and the RETURNING clause gives
+        us everything BookingPublic needs without a refresh. A single
+        statement is atomic, so it's still all-or-nothing.
         """
-        # Create the main booking object
-        new_booking = Booking(
-            client_id=booking_data.client_id,
-            carrier_name=booking_data.carrier_name,
-            reference_number=booking_data.reference_number,
-            organization_id=org.id,
-            status="PENDING"
-        )
-        self.db.add(new_booking)
-        await self.db.flush() # Flush to get the new_booking.id
-
-        # Create the Payable (bill from carrier)
-        new_payable = Payable(
-            booking_id=new_booking.id,
-            amount=booking_data.payable_amount,
-            due_date=booking_data.payable_due_date,
-            payee_name=booking_data.carrier_name,
-            status="PENDING"
-        )
-        
+        bookings, payables, invoices = Booking.__table__, Payable.__table__, Invoice.__table__
+
+        # Create the main booking row
+        new_booking = (
+            insert(bookings)
+            .values(
+                client_id=booking_data.client_id,
+                carrier_name=booking_data.carrier_name,
+                reference_number=booking_data.reference_number,
+                organization_id=org.id,
+                status=BookingStatus.PENDING,
+            )
+            .returning(
+                bookings.c.id, bookings.c.organization_id, bookings.c.client_id,
+                bookings.c.reference_number, bookings.c.status, bookings.c.carrier_name,
+            )
+            .cte("new_booking")
+        )
+
+        # Create the Payable (bill from carrier), keyed off the new booking id
+        new_payable = (
+            insert(payables)
+            .from_select(
+                ["booking_id", "amount", "due_date", "payee_name", "status"],
+                select(
+                    new_booking.c.id,
+                    literal(booking_data.payable_amount, payables.c.amount.type),
+                    literal(booking_data.payable_due_date, payables.c.due_date.type),
+                    literal(booking_data.carrier_name, payables.c.payee_name.type),
+                    literal(PaymentStatus.PENDING, payables.c.status.type),
+                ),
+            )
+            .returning(payables.c.id, payables.c.booking_id)
+            .cte("new_payable")
+        )
+
         # Create the Invoice (bill to our client)
-        new_invoice = Invoice(
-            booking_id=new_booking.id,
-            client_id=booking_data.client_id,
-            amount=booking_data.invoice_amount,
-            due_date=booking_data.invoice_due_date,
-            status="PENDING"
-        )
-        
-        self.db.add_all([new_payable, new_invoice])
+        new_invoice = (
+            insert(invoices)
+            .from_select(
+                ["booking_id", "client_id", "amount", "due_date", "status"],
+                select(
+                    new_booking.c.id,
+                    new_booking.c.client_id,
+                    literal(booking_data.invoice_amount, invoices.c.amount.type),
+                    literal(booking_data.invoice_due_date, invoices.c.due_date.type),
+                    literal(PaymentStatus.PENDING, invoices.c.status.type),
+                ),
+            )
+            .returning(invoices.c.id, invoices.c.booking_id)
+            .cte("new_invoice")
+        )
+
+        # Bump the organization's change version in the same statement
+        bump_version = bump_statement(org.id).cte("bump_version")
+
+        result = await self.db.execute(
+            select(new_booking)
+            .add_columns(
+                new_payable.c.id.label("payable_id"),
+                new_invoice.c.id.label("invoice_id"),
+                select(bump_version.c.change_version).scalar_subquery().label("change_version"),
+            )
+            .join(new_payable, new_payable.c.booking_id == new_booking.c.id)
+            .join(new_invoice, new_invoice.c.booking_id == new_booking.c.id)
+        )
+        row = result.one()
         await self.db.commit()
-        await self.db.refresh(new_booking)
-        return new_booking
+        record_primary_write(org.id)
+        record_cash_flows(org.id, row.change_version, booking_cash_flows(
+            booking_data.payable_amount, booking_data.payable_due_date,
+            booking_data.invoice_amount, booking_data.invoice_due_date,
+        ))
 
-    async def get_bookings(self, org: Organization) -> list[Booking]:
+        return Booking(
+            id=row.id,
+            organization_id=row.organization_id,
+            client_id=row.client_id,
+            reference_number=row.reference_number,
+            status=row.status,
+            carrier_name=row.carrier_name,
+        )
+
+    async def get_change_version(self, org: TenantContext) -> int:
+        """
+        The organization's change version, read from the same session as
+        the bookings. Call it before the list query: a write landing in
+        between then only costs the client one extra refetch, whereas the
+        other order could pin stale rows to a newer version.
         """
-        Get all bookings for a given organization.
+        return await get_change_version(self._reader(org), org.id)
+
+    async def get_bookings(
+        self,
+        org: TenantContext,
+        limit: int,
+        before_id: int | None = None,
+        status: BookingStatus | None = None,
+        carrier_name: str | None = None,
+        client_id: int | None = None,
+        reference_prefix: str | None = None,
+        with_financials: bool = False,
+    ) -> tuple[list[Booking], int | None]:
         """
+        Get one page of an organization's bookings, newest first.
+
+        Keyset pagination on (organization_id, id): pass the last id of the
+        previous page as `before_id`. Returns the page and the id to continue
+        from, or None on the last page. `with_financials` eager-loads each
+        booking's payable, financing request and invoice.
+
+        Every page is an index range scan except with `reference_prefix`:
+        its index is ordered by reference, so a page reads and sorts all
+        bookings matching the prefix (cost grows with the matches, not
+        with depth).
+        """
+        query = select(Booking).where(Booking.organization_id == org.id)
+        if with_financials:
+            query = query.options(*BOOKING_DETAIL_LOAD)
+        if before_id is not None:
+            query = query.where(Booking.id < before_id)
+        if status is not None:
+            query = query.where(Booking.status == status)
+        if carrier_name is not None:
+            query = query.where(Booking.carrier_name == carrier_name)
+        if client_id is not None:
+            query = query.where(Booking.client_id == client_id)
+        if reference_prefix:
+            query = query.where(Booking.reference_number.startswith(reference_prefix, autoescape=True))
+
+        # Fetch one extra row to know whether there is a next page
+        result = await self._reader(org).execute(
+            query.order_by(Booking.id.desc()).limit(limit + 1)
+        )
+        bookings = list(result.scalars().all())
+        if len(bookings) > limit:
+            bookings = bookings[:limit]
+            return bookings, bookings[-1].id
+        return bookings, None
+
+    async def get_booking(self, booking_id: int, org: TenantContext) -> Booking | None:
+        """Get one booking with its financials, ensuring it belongs to the org."""
+        result = await self._reader(org).execute(
+            select(Booking)
+            .options(*BOOKING_DETAIL_LOAD)
+            .where(Booking.id == booking_id, Booking.organization_id == org.id)
+        )
+        return result.scalars().first()
+
+    async def import_bookings(
+        self,
+        rows: AsyncIterator[tuple[int, dict[str, Any] | str]],
+        org: TenantContext,
+    ) -> BookingImportResult:
+        """
+        Bulk-create Bookings with their Payables and Invoices.
+
+        Rows are validated against BookingCreate, then inserted in chunks of
+        IMPORT_CHUNK_SIZE: one multi-row INSERT per table, one transaction
+        per chunk. A failed row never blocks the others; every rejected row
+        is reported with its reasons.
+        """
+        errors: list[BookingImportError] = []
+        chunk: list[tuple[int, BookingCreate]] = []
+        seen_references: set[str] = set()
+        total = imported = 0
+
+        async for row_number, raw in rows:
+            total += 1
+            if isinstance(raw, str):
+                errors.append(BookingImportError(row=row_number, errors=[raw]))
+                continue
+            try:
+                booking = BookingCreate.model_validate(raw)
+            except ValidationError as exc:
+                reference_number = raw.get("reference_number")
+                errors.append(BookingImportError(
+                    row=row_number,
+                    # Echoed back as given, even if it isn't a string
+                    reference_number=str(reference_number) if reference_number is not None else None,
+                    errors=[f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in exc.errors()],
+                ))
+                continue
+            if booking.client_id not in org.client_ids:
+                errors.append(BookingImportError(
+                    row=row_number, reference_number=booking.reference_number,
+                    errors=["client_id: Client not found"],
+                ))
+                continue
+            if booking.reference_number in seen_references:
+                errors.append(BookingImportError(
+                    row=row_number, reference_number=booking.reference_number,
+                    errors=["reference_number: duplicated earlier in this file"],
+                ))
+                continue
+            seen_references.add(booking.reference_number)
+            chunk.append((row_number, booking))
+            if len(chunk) >= IMPORT_CHUNK_SIZE:
+                imported += await self._insert_import_chunk(chunk, org, errors)
+                chunk = []
+
+        if chunk:
+            imported += await self._insert_import_chunk(chunk, org, errors)
+        if imported:
+            record_primary_write(org.id)
+
+        errors.sort(key=lambda e: e.row)
+        return BookingImportResult(
+            total_rows=total, imported=imported, failed=total - imported, errors=errors
+        )
+
+    async def _insert_import_chunk(
+        self,
+        chunk: list[tuple[int, BookingCreate]],
+        org: TenantContext,
+        errors: list[BookingImportError],
+    ) -> int:
+        """Insert one chunk in a single transaction; returns rows inserted."""
+        # Parameter lists go through SQLAlchemy's "insertmanyvalues" batching:
+        # one cached multi-row INSERT ... VALUES statement per table.
+        # Reference numbers that already exist are skipped, not fatal.
         result = await self.db.execute(
-            select(Booking).where(Booking.organization_id == org.id)
+            pg_insert(Booking.__table__)
+            .on_conflict_do_nothing(index_elements=["reference_number"])
+            .returning(Booking.__table__.c.id, Booking.__table__.c.reference_number),
+            [
+                {
+                    "client_id": b.client_id,
+                    "carrier_name": b.carrier_name,
+                    "reference_number": b.reference_number,
+                    "organization_id": org.id,
+                    "status": BookingStatus.PENDING,
+                }
+                for _, b in chunk
+            ],
         )
-        return result.scalars().all()
+        booking_ids = {reference: booking_id for booking_id, reference in result.all()}
+
+        payables, invoices = [], []
+        for row_number, b in chunk:
+            booking_id = booking_ids.get(b.reference_number)
+            if booking_id is None:
+                errors.append(BookingImportError(
+                    row=row_number, reference_number=b.reference_number,
+                    errors=["reference_number: already exists"],
+                ))
+                continue
+            payables.append({
+                "booking_id": booking_id,
+                "amount": b.payable_amount,
+                "due_date": b.payable_due_date,
+                "payee_name": b.carrier_name,
+                "status": PaymentStatus.PENDING,
+            })
+            invoices.append({
+                "booking_id": booking_id,
+                "client_id": b.client_id,
+                "amount": b.invoice_amount,
+                "due_date": b.invoice_due_date,
+                "status": PaymentStatus.PENDING,
+            })
+
+        version = None
+        if payables:
+            await self.db.execute(insert(Payable.__table__), payables)
+            await self.db.execute(insert(Invoice.__table__), invoices)
+            version = await bump_change_version(self.db, org.id)
+        await self.db.commit()
+        if version is not None:
+            record_cash_flows(org.id, version, [
+                flow
+                for payable, invoice in zip(payables, invoices)
+                for flow in booking_cash_flows(
+                    payable["amount"], payable["due_date"], invoice["amount"], invoice["due_date"]
+                )
+            ])
+        return len(payables)
@@ -0,0 +1,313 @@
+# /app/core/exposure.py
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Iterable, Optional
+
+from sqlalchemy import Numeric, case, cast, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import async_session
+from app.models.exposure import ClientExposure, OrganizationExposure
+from app.models.finance import FinancingRequest, FinancingStatus, Payable
+from app.models.workflow import Booking
+
+logger = logging.getLogger(__name__)
+
+CENT = Decimal("0.01")
+ZERO = Decimal("0.00")
+
+# Which running total a request in each status counts towards
+EXPOSURE_COLUMNS = {
+    FinancingStatus.APPROVED: "approved_amount",
+    FinancingStatus.FUNDED: "funded_amount",
+}
+EXPOSURE_STATUSES = tuple(EXPOSURE_COLUMNS)
+
+# pg_try_advisory_xact_lock key, so one worker reconciles at a time
+_RECONCILE_LOCK_ID = 0x4C455641_0001
+
+
+def to_money(amount: float) -> Decimal:
+    """A float amount as exact cents, rounded the way Postgres casts it."""
+    return Decimal(str(amount)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+@dataclass(frozen=True)
+class ExposureChange:
+    """One financing request moving between statuses (old_status None: new)."""
+    organization_id: int
+    client_id: int
+    amount: float
+    old_status: Optional[FinancingStatus]
+    new_status: Optional[FinancingStatus]
+
+
+@dataclass(frozen=True)
+class Exposure:
+    approved_amount: Decimal = ZERO
+    funded_amount: Decimal = ZERO
+
+    @property
+    def outstanding(self) -> Decimal:
+        return self.approved_amount + self.funded_amount
+
+
+def _upsert(table, add: bool = True):
+    """INSERT the row, or add it to (add=True) or overwrite the existing totals."""
+    stmt = pg_insert(table)
+    if add:
+        values = {
+            "approved_amount": table.c.approved_amount + stmt.excluded.approved_amount,
+            "funded_amount": table.c.funded_amount + stmt.excluded.funded_amount,
+        }
+    else:
+        values = {
+            "approved_amount": stmt.excluded.approved_amount,
+            "funded_amount": stmt.excluded.funded_amount,
+        }
+    return stmt.on_conflict_do_update(
+        index_elements=list(table.primary_key.columns.keys()),
+        set_={**values, "updated_at": stmt.excluded.updated_at},
+    )
+
+
+async def apply_exposure_changes(db: AsyncSession, changes: Iterable[ExposureChange]) -> None:
+    """
+    Fold status changes into the exposure tables, inside the caller's
+    transaction (no commit). Deltas are summed per organization and per
+    client first, so a batch costs at most one upsert per table.
+    """
+    org_deltas: dict[int, dict[str, Decimal]] = defaultdict(lambda: defaultdict(Decimal))
+    client_deltas: dict[tuple[int, int], dict[str, Decimal]] = defaultdict(lambda: defaultdict(Decimal))
+    for change in changes:
+        amount = to_money(change.amount)
+        for status, sign in ((change.old_status, -1), (change.new_status, 1)):
+            column = EXPOSURE_COLUMNS.get(status)
+            if column is not None:
+                org_deltas[change.organization_id][column] += sign * amount
+                client_deltas[(change.client_id, change.organization_id)][column] += sign * amount
+
+    now = datetime.utcnow()
+
+    def rows(deltas, key_columns):
+        # Sorted so concurrent transactions lock rows in the same order (no deadlocks)
+        return [
+            {
+                **dict(zip(key_columns, key if isinstance(key, tuple) else (key,))),
+                "approved_amount": delta["approved_amount"],
+                "funded_amount": delta["funded_amount"],
+                "updated_at": now,
+            }
+            for key, delta in sorted(deltas.items())
+            if any(delta.values())
+        ]
+
+    org_rows = rows(org_deltas, ("organization_id",))
+    if org_rows:
+        await db.execute(_upsert(OrganizationExposure.__table__), org_rows)
+    client_rows = rows(client_deltas, ("client_id", "organization_id"))
+    if client_rows:
+        await db.execute(_upsert(ClientExposure.__table__), client_rows)
+
+
+async def lock_organization_exposure(db: AsyncSession, organization_id: int) -> None:
+    """
+    Lock the organization's exposure row (creating it at zero if need be)
+    until the caller's transaction ends. Underwriting takes it before
+    reading exposure, so concurrent requests decide one after another and
+    each sees the others' committed exposure: together they can't pass
+    the cap. Other exposure writers take this row first too.
+    """
+    await db.execute(
+        pg_insert(OrganizationExposure)
+        .values(organization_id=organization_id, updated_at=datetime.utcnow())
+        .on_conflict_do_nothing(index_elements=["organization_id"])
+    )
+    await db.execute(
+        select(OrganizationExposure.organization_id)
+        .where(OrganizationExposure.organization_id == organization_id)
+        .with_for_update()
+    )
+
+
+async def get_organization_exposure(db: AsyncSession, organization_id: int) -> Exposure:
+    result = await db.execute(
+        select(OrganizationExposure.approved_amount, OrganizationExposure.funded_amount)
+        .where(OrganizationExposure.organization_id == organization_id)
+    )
+    row = result.first()
+    return Exposure(*row) if row is not None else Exposure()
+
+
+async def get_client_exposures(db: AsyncSession, organization_id: int) -> dict[int, Exposure]:
+    result = await db.execute(
+        select(ClientExposure.client_id, ClientExposure.approved_amount, ClientExposure.funded_amount)
+        .where(ClientExposure.organization_id == organization_id)
+    )
+    return {client_id: Exposure(approved, funded) for client_id, approved, funded in result.all()}
+
+
+def _recompute_query(organization_ids: Optional[Iterable[int]] = None):
+    """Exposure per (organization, client) summed from financing_requests."""
+    money = cast(FinancingRequest.amount_requested, Numeric(18, 2))
+    query = (
+        select(
+            Booking.organization_id,
+            Booking.client_id,
+            func.sum(case((FinancingRequest.status == FinancingStatus.APPROVED, money), else_=0)),
+            func.sum(case((FinancingRequest.status == FinancingStatus.FUNDED, money), else_=0)),
+        )
+        .select_from(FinancingRequest)
+        .join(Payable, Payable.id == FinancingRequest.payable_id)
+        .join(Booking, Booking.id == Payable.booking_id)
+        .where(FinancingRequest.status.in_(EXPOSURE_STATUSES))
+        .group_by(Booking.organization_id, Booking.client_id)
+    )
+    if organization_ids is not None:
+        query = query.where(Booking.organization_id.in_(list(organization_ids)))
+    return query
+
+
+@dataclass
+class ReconciliationReport:
+    organizations_checked: int = 0
+    clients_checked: int = 0
+    organizations_corrected: list[int] = field(default_factory=list)
+    clients_corrected: list[int] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return {
+            "organizations_checked": self.organizations_checked,
+            "clients_checked": self.clients_checked,
+            "organizations_corrected": self.organizations_corrected,
+            "clients_corrected": self.clients_corrected,
+        }
+
+
+@dataclass
+class _ExposureSnapshot:
+    expected_orgs: dict[int, Exposure]
+    stored_orgs: dict[int, Exposure]
+    expected_clients: dict[int, Exposure]
+    stored_clients: dict[int, Exposure]
+    client_orgs: dict[int, int]
+
+    def drifted_orgs(self) -> list[int]:
+        return _drifted(self.expected_orgs, self.stored_orgs)
+
+    def drifted_clients(self) -> list[int]:
+        return _drifted(self.expected_clients, self.stored_clients)
+
+
+def _drifted(expected: dict[int, Exposure], stored: dict[int, Exposure]) -> list[int]:
+    return sorted(
+        key for key in expected.keys() | stored.keys()
+        if expected.get(key, Exposure()) != stored.get(key, Exposure())
+    )
+
+
+async def _snapshot(
+    db: AsyncSession, organization_ids: Optional[list[int]] = None, for_update: bool = False
+) -> _ExposureSnapshot:
+    # Plain columns, not entities: the identity map would hand back the
+    # first pass's values when re-reading under locks in the same session
+    org_query = select(
+        OrganizationExposure.organization_id,
+        OrganizationExposure.approved_amount,
+        OrganizationExposure.funded_amount,
+    )
+    client_query = select(
+        ClientExposure.client_id,
+        ClientExposure.organization_id,
+        ClientExposure.approved_amount,
+        ClientExposure.funded_amount,
+    )
+    if organization_ids is not None:
+        org_query = org_query.where(OrganizationExposure.organization_id.in_(organization_ids))
+        client_query = client_query.where(ClientExposure.organization_id.in_(organization_ids))
+    if for_update:
+        # Lock before recomputing: writers already holding these rows commit
+        # first (and are then included), later ones wait and add on top
+        org_query = org_query.order_by(OrganizationExposure.organization_id).with_for_update()
+        client_query = client_query.order_by(ClientExposure.client_id).with_for_update()
+
+    snapshot = _ExposureSnapshot({}, {}, {}, {}, {})
+    for org_id, approved, funded in (await db.execute(org_query)).all():
+        snapshot.stored_orgs[org_id] = Exposure(approved, funded)
+    for client_id, org_id, approved, funded in (await db.execute(client_query)).all():
+        snapshot.stored_clients[client_id] = Exposure(approved, funded)
+        snapshot.client_orgs[client_id] = org_id
+
+    for org_id, client_id, approved, funded in (await db.execute(_recompute_query(organization_ids))).all():
+        snapshot.expected_clients[client_id] = Exposure(approved, funded)
+        snapshot.client_orgs[client_id] = org_id
+        total = snapshot.expected_orgs.get(org_id, Exposure())
+        snapshot.expected_orgs[org_id] = Exposure(
+            total.approved_amount + approved, total.funded_amount + funded
+        )
+    return snapshot
+
+
+async def reconcile_exposure(db: AsyncSession) -> Optional[ReconciliationReport]:
+    """
+    Verify the exposure tables against a full recompute from
+    financing_requests and correct any drift. Returns None if another
+    worker is already reconciling.
+
+    The full pass takes no row locks. Only organizations that look wrong
+    are re-checked with their exposure rows locked (so in-flight writes
+    can't be mistaken for drift) and then overwritten.
+    """
+    acquired = (await db.execute(select(func.pg_try_advisory_xact_lock(_RECONCILE_LOCK_ID)))).scalar()
+    if not acquired:
+        await db.rollback()
+        return None
+
+    snapshot = await _snapshot(db)
+    report = ReconciliationReport(
+        organizations_checked=len(snapshot.expected_orgs.keys() | snapshot.stored_orgs.keys()),
+        clients_checked=len(snapshot.expected_clients.keys() | snapshot.stored_clients.keys()),
+    )
+    suspects = set(snapshot.drifted_orgs())
+    suspects.update(snapshot.client_orgs[c] for c in snapshot.drifted_clients())
+    if suspects:
+        snapshot = await _snapshot(db, sorted(suspects), for_update=True)
+        report.organizations_corrected = snapshot.drifted_orgs()
+        report.clients_corrected = snapshot.drifted_clients()
+        now = datetime.utcnow()
+        if report.organizations_corrected:
+            await db.execute(_upsert(OrganizationExposure.__table__, add=False), [
+                {
+                    "organization_id": org_id,
+                    "approved_amount": snapshot.expected_orgs.get(org_id, Exposure()).approved_amount,
+                    "funded_amount": snapshot.expected_orgs.get(org_id, Exposure()).funded_amount,
+                    "updated_at": now,
+                }
+                for org_id in report.organizations_corrected
+            ])
+        if report.clients_corrected:
+            await db.execute(_upsert(ClientExposure.__table__, add=False), [
+                {
+                    "client_id": client_id,
+                    "organization_id": snapshot.client_orgs[client_id],
+                    "approved_amount": snapshot.expected_clients.get(client_id, Exposure()).approved_amount,
+                    "funded_amount": snapshot.expected_clients.get(client_id, Exposure()).funded_amount,
+                    "updated_at": now,
+                }
+                for client_id in report.clients_corrected
+            ])
+        if report.organizations_corrected or report.clients_corrected:
+            logger.warning("Exposure drift corrected: %s", report.as_dict())
+    await db.commit()
+    return report
+
+
+async def run_exposure_reconciliation() -> Optional[dict]:
+    """Scheduler entry point: reconcile in its own session on the primary."""
+    async with async_session() as db:
+        report = await reconcile_exposure(db)
+    return report.as_dict() if report is not None else None
@@ -1,23 +1,100 @@
 # /app/core/finance_service.py
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import joinedload
-from app.models.finance import Payable, FinancingRequest, FinancingStatus
+from sqlalchemy.orm import contains_eager
+from app.db.session import must_read_primary, record_primary_write
+from app.models.finance import Payable, FinancingEvent, FinancingRequest, FinancingStatus, PaymentStatus
 from app.models.workflow import Booking
-from app.models.organization import Organization
+from app.core.tenant import TenantContext
+from app.core.change_version import bump_change_version, get_change_version
+from app.core.aging import get_aging
+from app.core.forecast import MAX_HORIZON_DAYS, get_forecast_state, project, record_cash_flows
+from app.core.underwriting import Decision, underwrite
+from app.core.financing_lifecycle import transition_requests
+from app.core.ledger import get_balances
+from app.core.reconciliation import (
+    MAX_STATEMENT_LINES, StatementLine, apply_matches, load_candidates, match_lines,
+)
+from app.core.pricing import Quote, money, quote_payables
+from app.core.exposure import (
+    ExposureChange, apply_exposure_changes, get_client_exposures, get_organization_exposure,
+    lock_organization_exposure,
+)
+from app.schemas.finance import (
+    MAX_BATCH_FINANCING, AgingGroupBy, AgingPublic, BatchFinancingCreate, BatchFinancingItem,
+    BatchFinancingOutcome, BatchFinancingResult, CashFlowForecast, ClientExposurePublic,
+    ExposureAmounts, ExposurePublic, FinancingQuote, FinancingQuoteCreate, FinancingQuoteResult,
+    FinancingRequestPublic, FinancingTransition, FinancingTransitionItem,
+    FinancingTransitionOutcome, ForecastGranularity, UnquotedPayable,
+    BatchFinancingTransitionResult, LedgerAccountBalance, LedgerBalancesPublic,
+    BankReconciliationResult, StatementLineMatch, UnmatchedReason, UnmatchedStatementLine,
+)
 import datetime
+from decimal import Decimal
+from typing import AsyncIterator, Sequence
+
+# Payables that can still be financed
+FINANCEABLE_STATUSES = (PaymentStatus.PENDING, PaymentStatus.OVERDUE)
+
+class UnderwritingDeclined(Exception):
+    def __init__(self, reasons: tuple[str, ...]):
+        super().__init__("Financing declined by underwriting")
+        self.reasons = reasons
+
+class FinancingAlreadyRequested(Exception):
+    pass
+
+class PayableNotEligible(Exception):
+    pass
+
+class StatementTooLarge(ValueError):
+    pass
+
+class TransitionRefused(Exception):
+    def __init__(self, item: FinancingTransitionItem):
+        super().__init__(f"Financing request transition refused: {item.outcome.value}")
+        self.item = item
+
+def _priced(quote: Quote) -> dict:
+    """FinancingRequest pricing columns from a quote (the columns are floats)."""
+    return {
+        "fee_percentage": float(quote.fee_percentage),
+        "fee_amount": float(quote.fee_amount),
+        "total_repayment": float(quote.total_repayment),
+    }
+
+def in_request_order(rows: Sequence, payable_ids: Sequence[int]) -> list:
+    """
+    Rows with a payable `id`, sorted by where that ID first appears in
+    `payable_ids`: an IN (...) list comes back in any order.
+    """
+    position = {payable_id: i for i, payable_id in enumerate(dict.fromkeys(payable_ids))}
+    return sorted(rows, key=lambda row: position[row.id])
+
 
 class FinanceService:
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, read_db: AsyncSession | None = None):
         self.db = db
+        # Read-only queries go to the replica session when one is provided
+        self.read_db = read_db or db
 
-    async def get_payable(self, payable_id: int, org: Organization) -> Payable | None:
+    def _reader(self, org: TenantContext) -> AsyncSession:
+        """The session for read-only queries, honouring read-your-writes."""
+        return self.db if must_read_primary(org.id) else self.read_db
+
+    async def get_payable(
+        self, payable_id: int, org: TenantContext, for_write: bool = False
+    ) -> Payable | None:
         """
         Get a single payable, ensuring it belongs to the org.
+        Served from the replica unless the caller is about to write.
         """
-        result = await self.db.execute(
+        session = self.db if for_write else self._reader(org)
+        result = await session.execute(
             select(Payable)
             .join(Payable.booking) # Join to check organization_id
+            .options(contains_eager(Payable.booking)) # ...and load the booking from it
             .where(
                 Payable.id == payable_id,
                 Booking.organization_id == org.id
@@ -25,33 +102,460 @@ class FinanceService:
         )
         return result.scalars().first()
 
-    async def request_financing(self, payable: Payable) -> FinancingRequest:
+    async def get_exposure(self, org: TenantContext) -> ExposurePublic:
+        """Outstanding financed amounts for the org and each client (ledger lookups)."""
+        session = self._reader(org)
+        organization = await get_organization_exposure(session, org.id)
+        clients = await get_client_exposures(session, org.id)
+        return ExposurePublic(
+            organization=ExposureAmounts.model_validate(organization),
+            clients=[
+                ClientExposurePublic(client_id=client_id, **ExposureAmounts.model_validate(exposure).model_dump())
+                for client_id, exposure in sorted(clients.items())
+            ],
+        )
+
+    async def get_aging(self, org: TenantContext, group_by: AgingGroupBy | None = None) -> AgingPublic:
+        """
+        AR/AP aging as of today, optionally per client or carrier. Served
+        from the cache while the organization's change version is unchanged
+        (one primary-key lookup), otherwise one grouped query.
+        """
+        session = self._reader(org)
+        version = await get_change_version(session, org.id)
+        return await get_aging(session, org.id, version, datetime.datetime.utcnow().date(), group_by)
+
+    async def get_ledger_balances(
+        self, org: TenantContext, as_of: datetime.datetime | None = None
+    ) -> LedgerBalancesPublic:
+        """
+        The organization's ledger account balances as of `as_of` (default
+        now): one statement reading each account's latest snapshot and the
+        postings since.
+        """
+        if as_of is None:
+            as_of = datetime.datetime.utcnow()
+        elif as_of.tzinfo is not None:
+            # Stored timestamps are naive UTC
+            as_of = as_of.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        balances = await get_balances(self._reader(org), org.id, as_of)
+        return LedgerBalancesPublic(
+            as_of=as_of,
+            balances=[
+                LedgerAccountBalance(account=code, balance=money(balance))
+                for code, balance in balances.items()
+            ],
+        )
+
+    async def get_cash_flow_forecast(
+        self,
+        org: TenantContext,
+        horizon_days: int = 90,
+        granularity: ForecastGranularity = ForecastGranularity.DAY,
+        opening_balance: Decimal = Decimal("0.00"),
+    ) -> CashFlowForecast:
+        """
+        Projected cash position over the next `horizon_days` (at most
+        MAX_HORIZON_DAYS). The per-day flows are kept per organization and
+        updated in place by this worker's writes; they are only rebuilt
+        (one grouped query) when another worker changed the organization.
+        """
+        session = self._reader(org)
+        version = await get_change_version(session, org.id)
+        state = await get_forecast_state(session, org.id, version)
+        return project(
+            state, min(horizon_days, MAX_HORIZON_DAYS), granularity,
+            int(opening_balance.quantize(Decimal("0.01")) * 100),
+        )
+
+    async def request_financing(self, payable: Payable, org: TenantContext) -> FinancingRequest:
         """
         Core business logic: Create a new FinancingRequest for a Payable.
+
+        A payable that already has a request raises FinancingAlreadyRequested,
+        one that is paid or financed PayableNotEligible (checked like a
+        batch). Underwriting decides the outcome: approved requests are
+        created APPROVED, those needing review PENDING, and a decline raises
+        UnderwritingDeclined without creating anything.
         """
-        # 1. TODO: Check for existing requests
-        # 2. TODO: Run basic underwriting rules (e.g., is amount > $1M?)
-
-        # Calculate fees (example: 2.5% fee)
-        fee_amount = payable.amount * 0.025
-        
-        # We collect the full invoice amount from the client
-        # We need to find the invoice associated with this payable's booking
-        # For simplicity, we'll assume invoice amount = payable + profit (hardcoded)
-        # In a real app, we'd fetch the linked Invoice.amount
-        total_repayment = payable.amount * 1.05 # Placeholder
-
-        new_request = FinancingRequest(
-            payable_id=payable.id,
-            amount_requested=payable.amount,
-            fee_percentage=2.5,
-            fee_amount=fee_amount,
-            total_repayment=total_repayment,
-            status=FinancingStatus.PENDING,
-            requested_at=datetime.datetime.utcnow()
-        )
-        
-        self.db.add(new_request)
+        candidate = (await self.db.execute(
+            self._candidate_query(BatchFinancingCreate(payable_ids=[payable.id]), org)
+        )).first()
+        if candidate.financing_request_id is not None:
+            raise FinancingAlreadyRequested("This payable already has a financing request")
+        if candidate.status not in FINANCEABLE_STATUSES:
+            raise PayableNotEligible(f"A {candidate.status.value} payable can't be financed")
+
+        # Held until commit: concurrent requests are underwritten one at a time
+        await lock_organization_exposure(self.db, org.id)
+        decision = (await underwrite(self.db, org.id, [payable.id]))[payable.id]
+        if decision.decision == Decision.DECLINE:
+            await self.db.rollback()
+            raise UnderwritingDeclined(decision.reasons)
+
+        # Price it from the linked invoice and tenor
+        quote = (await quote_payables(self.db, org.id, [payable.id]))[payable.id]
+
+        now = datetime.datetime.utcnow()
+        approved = decision.decision == Decision.APPROVE
+        # A concurrent request for the same payable wins the unique index
+        new_request = (await self.db.scalars(
+            pg_insert(FinancingRequest)
+            .values(
+                payable_id=payable.id,
+                amount_requested=payable.amount,
+                **_priced(quote),
+                status=FinancingStatus.APPROVED if approved else FinancingStatus.PENDING,
+                requested_at=now,
+                approved_at=now if approved else None,
+            )
+            .on_conflict_do_nothing(index_elements=["payable_id"])
+            .returning(FinancingRequest)
+        )).first()
+        if new_request is None:
+            await self.db.rollback()
+            raise FinancingAlreadyRequested("This payable already has a financing request")
+
+        await apply_exposure_changes(self.db, [ExposureChange(
+            org.id, payable.booking.client_id, payable.amount, None, new_request.status
+        )])
+        version = await bump_change_version(self.db, org.id)
         await self.db.commit()
-        await self.db.refresh(new_request)
+        record_primary_write(org.id)
+        record_cash_flows(org.id, version)  # not funded yet: no cash moves
         return new_request
+
+    def _candidate_query(self, selection: BatchFinancingCreate, org: TenantContext):
+        """
+        The payables a batch call selects, with their status, client and
+        any existing financing request. A filter only matches financeable
+        payables without a request, at most MAX_BATCH_FINANCING of them
+        (earliest due first).
+        """
+        query = (
+            select(
+                Payable.id, Payable.amount, Payable.status,
+                FinancingRequest.id.label("financing_request_id"),
+                Booking.client_id,
+            )
+            .join(Payable.booking)
+            .outerjoin(FinancingRequest, FinancingRequest.payable_id == Payable.id)
+            .where(Booking.organization_id == org.id)
+        )
+        if selection.payable_ids is not None:
+            return query.where(Payable.id.in_(selection.payable_ids))
+        query = query.where(
+            Payable.status.in_(FINANCEABLE_STATUSES),
+            FinancingRequest.id.is_(None),
+        )
+        if selection.due_from is not None:
+            query = query.where(Payable.due_date >= selection.due_from)
+        if selection.due_to is not None:
+            # due_date is a timestamp; include the whole last day
+            query = query.where(Payable.due_date < selection.due_to + datetime.timedelta(days=1))
+        if selection.payee_name is not None:
+            query = query.where(Payable.payee_name == selection.payee_name)
+        return query.order_by(Payable.due_date, Payable.id).limit(MAX_BATCH_FINANCING)
+
+    async def quote_financing(
+        self, selection: FinancingQuoteCreate, org: TenantContext
+    ) -> FinancingQuoteResult:
+        """
+        What financing these payables would cost, without creating anything.
+        Selection works like request_financing_batch; payables that could
+        not be financed are listed in not_quoted. Prices come from each
+        payable's invoice and tenor, in exact cents (see app.core.pricing).
+        """
+        session = self._reader(org)
+        candidates = (await session.execute(self._candidate_query(selection, org))).all()
+        not_quoted: dict[int, BatchFinancingOutcome] = {}
+        eligible = []
+        for payable_id, _, payable_status, existing_request_id, _ in candidates:
+            if existing_request_id is not None:
+                not_quoted[payable_id] = BatchFinancingOutcome.ALREADY_REQUESTED
+            elif payable_status not in FINANCEABLE_STATUSES:
+                not_quoted[payable_id] = BatchFinancingOutcome.NOT_ELIGIBLE
+            else:
+                eligible.append(payable_id)
+        quotes = await quote_payables(session, org.id, eligible)
+
+        requested_ids = selection.payable_ids if selection.payable_ids is not None else [c.id for c in candidates]
+        results, unquoted = [], []
+        for payable_id in dict.fromkeys(requested_ids):
+            if payable_id in quotes:
+                results.append(quotes[payable_id])
+            else:
+                unquoted.append(UnquotedPayable(
+                    payable_id=payable_id,
+                    outcome=not_quoted.get(payable_id, BatchFinancingOutcome.NOT_FOUND),
+                ))
+        return FinancingQuoteResult(
+            quotes=[FinancingQuote.model_validate(quote) for quote in results],
+            not_quoted=unquoted,
+            total_amount=money(sum(quote.amount_cents for quote in results)),
+            total_fees=money(sum(quote.fee_cents for quote in results)),
+            total_repayment=money(sum(quote.repayment_cents for quote in results)),
+        )
+
+    async def request_financing_batch(
+        self, batch: BatchFinancingCreate, org: TenantContext
+    ) -> BatchFinancingResult:
+        """
+        Create FinancingRequests for many payables at once.
+
+        Ownership, eligibility and existing requests are checked for the
+        whole set in one query, underwriting and pricing run once over the
+        batch (in the order the IDs were given, or earliest due first for a
+        filter: earlier payables take exposure first), and every new request
+        is written by one INSERT ... ON CONFLICT DO NOTHING, so a payable
+        financed concurrently is reported as already requested instead of
+        failing the batch.
+        A filter covers at most MAX_BATCH_FINANCING payables per call
+        (earliest due first); call again until nothing more is created.
+        """
+        candidates = (await self.db.execute(self._candidate_query(batch, org))).all()
+        if batch.payable_ids is not None:
+            # Earlier candidates take exposure first, so underwrite them in
+            # the order requested (a filter is already ordered by due date)
+            candidates = in_request_order(candidates, batch.payable_ids)
+
+        skipped: dict[int, BatchFinancingOutcome] = {}
+        eligible = []
+        client_ids = {}
+        for payable_id, amount, payable_status, existing_request_id, client_id in candidates:
+            client_ids[payable_id] = client_id
+            if existing_request_id is not None:
+                skipped[payable_id] = BatchFinancingOutcome.ALREADY_REQUESTED
+            elif payable_status not in FINANCEABLE_STATUSES:
+                skipped[payable_id] = BatchFinancingOutcome.NOT_ELIGIBLE
+            else:
+                eligible.append((payable_id, amount))
+
+        # Underwrite and price the whole batch at once, holding the
+        # organization's exposure until commit so batches decide in turn
+        eligible_ids = [payable_id for payable_id, _ in eligible]
+        decisions = {}
+        if eligible:
+            await lock_organization_exposure(self.db, org.id)
+            decisions = await underwrite(self.db, org.id, eligible_ids)
+        quotes = await quote_payables(self.db, org.id, eligible_ids)
+        new_requests = []
+        now = datetime.datetime.utcnow()
+        for payable_id, amount in eligible:
+            decision = decisions[payable_id]
+            if decision.decision == Decision.DECLINE:
+                skipped[payable_id] = BatchFinancingOutcome.DECLINED
+                continue
+            approved = decision.decision == Decision.APPROVE
+            new_requests.append({
+                "payable_id": payable_id,
+                "amount_requested": amount,
+                **_priced(quotes[payable_id]),
+                "status": FinancingStatus.APPROVED if approved else FinancingStatus.PENDING,
+                "requested_at": now,
+                "approved_at": now if approved else None,
+            })
+
+        created = {}
+        if new_requests:
+            table = FinancingRequest.__table__
+            result = await self.db.execute(
+                pg_insert(table)
+                .on_conflict_do_nothing(index_elements=["payable_id"])
+                .returning(*table.c),
+                new_requests,
+            )
+            created = {row.payable_id: row for row in result.all()}
+            if created:
+                await apply_exposure_changes(self.db, [
+                    ExposureChange(org.id, client_ids[row.payable_id], row.amount_requested, None, row.status)
+                    for row in created.values()
+                ])
+                version = await bump_change_version(self.db, org.id)
+            await self.db.commit()
+            if created:
+                record_primary_write(org.id)
+                record_cash_flows(org.id, version)
+        elif eligible:
+            await self.db.rollback()  # all declined: release the exposure lock
+
+        requested_ids = batch.payable_ids if batch.payable_ids is not None else [c.id for c in candidates]
+        found = {c.id for c in candidates}
+        results = []
+        for payable_id in dict.fromkeys(requested_ids):  # de-duplicated, in request order
+            reasons = list(decisions[payable_id].reasons) if payable_id in decisions else []
+            if payable_id in created:
+                results.append(BatchFinancingItem(
+                    payable_id=payable_id,
+                    outcome=BatchFinancingOutcome.CREATED,
+                    financing_request=FinancingRequestPublic.model_validate(created[payable_id]),
+                    reasons=reasons,
+                ))
+            elif payable_id in skipped:
+                results.append(BatchFinancingItem(
+                    payable_id=payable_id, outcome=skipped[payable_id], reasons=reasons
+                ))
+            elif payable_id in found:
+                # Lost a race with a concurrent request for the same payable
+                results.append(BatchFinancingItem(
+                    payable_id=payable_id, outcome=BatchFinancingOutcome.ALREADY_REQUESTED
+                ))
+            else:
+                results.append(BatchFinancingItem(
+                    payable_id=payable_id, outcome=BatchFinancingOutcome.NOT_FOUND
+                ))
+        return BatchFinancingResult(
+            created=len(created), skipped=len(results) - len(created), results=results
+        )
+
+    async def transition_financing(
+        self,
+        transition: FinancingTransition,
+        targets: list[tuple[int, int | None]],
+        org: TenantContext,
+        actor_user_id: int | None = None,
+    ) -> tuple[BatchFinancingTransitionResult, dict]:
+        """
+        Apply a lifecycle transition (approve, fund, repay, reject) to
+        financing requests, each optionally guarded by its expected version.
+        One conditional UPDATE moves the whole batch and logs its events;
+        requests that can't move are reported, not raised. Returns the
+        per-request results and the moved rows by ID.
+        """
+        result = await transition_requests(self.db, org.id, transition, targets, actor_user_id)
+        version = await bump_change_version(self.db, org.id) if result.moved else None
+        await self.db.commit()
+        if result.moved:
+            record_primary_write(org.id)
+            record_cash_flows(org.id, version, result.cash_flows)
+
+        items = []
+        for request_id in dict.fromkeys(request_id for request_id, _ in targets):
+            if request_id in result.moved:
+                row = result.moved[request_id]
+                items.append(FinancingTransitionItem(
+                    id=request_id, outcome=FinancingTransitionOutcome.TRANSITIONED,
+                    status=row.status, version=row.version,
+                ))
+            else:
+                outcome, status, current_version = result.skipped[request_id]
+                items.append(FinancingTransitionItem(
+                    id=request_id, outcome=outcome, status=status, version=current_version
+                ))
+        return BatchFinancingTransitionResult(
+            transitioned=len(result.moved), skipped=len(items) - len(result.moved), results=items
+        ), result.moved
+
+    async def transition_financing_request(
+        self,
+        request_id: int,
+        transition: FinancingTransition,
+        expected_version: int | None,
+        org: TenantContext,
+        actor_user_id: int | None = None,
+    ) -> FinancingRequestPublic:
+        """One request through transition_financing; raises TransitionRefused if it can't move."""
+        batch, moved = await self.transition_financing(
+            transition, [(request_id, expected_version)], org, actor_user_id
+        )
+        if request_id not in moved:
+            raise TransitionRefused(batch.results[0])
+        return FinancingRequestPublic.model_validate(moved[request_id])
+
+    async def get_financing_events(self, request_id: int, org: TenantContext) -> list[FinancingEvent] | None:
+        """A request's transition history, oldest first; None if the request isn't the org's."""
+        session = self._reader(org)
+        result = await session.execute(
+            select(FinancingEvent)
+            .where(
+                FinancingEvent.financing_request_id == request_id,
+                FinancingEvent.organization_id == org.id,
+            )
+            .order_by(FinancingEvent.id)
+        )
+        events = list(result.scalars().all())
+        if events:
+            return events
+        # No history yet: tell an untouched request from someone else's
+        exists = await session.execute(
+            select(FinancingRequest.id)
+            .join(Payable, Payable.id == FinancingRequest.payable_id)
+            .join(Booking, Booking.id == Payable.booking_id)
+            .where(FinancingRequest.id == request_id, Booking.organization_id == org.id)
+        )
+        return [] if exists.first() is not None else None
+
+    async def reconcile_bank_statement(
+        self,
+        lines: AsyncIterator[tuple[int, StatementLine | str]],
+        org: TenantContext,
+        actor_user_id: int | None = None,
+        dry_run: bool = False,
+        settle_financing: bool = False,
+    ) -> BankReconciliationResult:
+        """
+        Match bank statement lines to open invoices (and, with
+        `settle_financing`, funded financing requests), then mark them
+        PAID / REPAID (unless `dry_run`). Open items are loaded with one
+        query into in-memory indexes; the updates run in batches. Every
+        line not applied is reported.
+        """
+        parsed: list[StatementLine] = []
+        unmatched = []
+        total = 0
+        async for line_number, line in lines:
+            total += 1
+            if total > MAX_STATEMENT_LINES:
+                raise StatementTooLarge(f"A statement may have at most {MAX_STATEMENT_LINES} lines")
+            if isinstance(line, str):
+                unmatched.append(UnmatchedStatementLine(line=line_number, reason=UnmatchedReason.INVALID, detail=line))
+            else:
+                parsed.append(line)
+
+        index = await load_candidates(self.db, org.id, financing=settle_financing)
+        matches, no_match = match_lines(parsed, index)
+        unmatched += [
+            UnmatchedStatementLine(
+                line=line.line, amount=money(line.amount_cents), reference=line.reference, reason=reason
+            )
+            for line, reason in no_match
+        ]
+
+        invoices_paid = financing_repaid = 0
+        if not dry_run:
+            applied = await apply_matches(self.db, org.id, matches, actor_user_id)
+            invoices_paid, financing_repaid = applied.invoices_paid, applied.financing_repaid
+            conflicts = {id(match) for match in applied.conflicts}
+            unmatched += [
+                UnmatchedStatementLine(
+                    line=match.line.line,
+                    amount=money(match.line.amount_cents),
+                    reference=match.line.reference,
+                    reason=UnmatchedReason.CONFLICT,
+                    detail=f"{match.candidate.target.value} {match.candidate.id} was settled or changed meanwhile",
+                )
+                for match in applied.conflicts
+            ]
+            matches = [match for match in matches if id(match) not in conflicts]
+
+        unmatched.sort(key=lambda item: item.line)
+        return BankReconciliationResult(
+            total_lines=total,
+            matched=len(matches),
+            unmatched=len(unmatched),
+            invoices_paid=invoices_paid,
+            financing_repaid=financing_repaid,
+            dry_run=dry_run,
+            matches=[
+                StatementLineMatch(
+                    line=match.line.line,
+                    amount=money(match.line.amount_cents),
+                    reference=match.line.reference,
+                    target=match.candidate.target,
+                    target_id=match.candidate.id,
+                    method=match.method,
+                )
+                for match in sorted(matches, key=lambda match: match.line.line)
+            ],
+            unmatched_lines=unmatched,
+        )
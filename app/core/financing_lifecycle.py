@@ -0,0 +1,217 @@
+# /app/core/financing_lifecycle.py
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional, Sequence
+
+from sqlalchemy import Integer, case, column, insert, literal, select, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.exposure import ExposureChange, apply_exposure_changes
+from app.core.forecast import CashFlow, Flow, money_cents
+from app.core.ledger import financing_journal_lines, post_journal_lines
+from app.models.finance import (
+    FinancingEvent, FinancingRequest, FinancingStatus, Invoice, Payable, PaymentStatus,
+)
+from app.models.workflow import Booking
+from app.schemas.finance import FinancingTransition, FinancingTransitionOutcome
+
+
+@dataclass(frozen=True)
+class TransitionRule:
+    from_statuses: tuple[FinancingStatus, ...]
+    to_status: FinancingStatus
+    timestamp_column: str  # set to the transition time
+
+
+# The state machine: every transition not listed here is invalid
+TRANSITIONS = {
+    FinancingTransition.APPROVE: TransitionRule(
+        (FinancingStatus.PENDING,), FinancingStatus.APPROVED, "approved_at"
+    ),
+    FinancingTransition.FUND: TransitionRule(
+        (FinancingStatus.APPROVED,), FinancingStatus.FUNDED, "funded_at"
+    ),
+    FinancingTransition.REPAY: TransitionRule(
+        (FinancingStatus.FUNDED,), FinancingStatus.REPAID, "repaid_at"
+    ),
+    FinancingTransition.REJECT: TransitionRule(
+        (FinancingStatus.PENDING, FinancingStatus.APPROVED), FinancingStatus.REJECTED, "rejected_at"
+    ),
+}
+
+# Stands in for "any version" in the targets VALUES list (versions start at 1)
+_ANY_VERSION = 0
+
+
+@dataclass
+class TransitionResult:
+    """What a batch transition did, before commit."""
+    # id -> the updated financing_requests row (all columns)
+    moved: dict = field(default_factory=dict)
+    # id -> (outcome, current status, current version) for the rest
+    skipped: dict = field(default_factory=dict)
+    # Forecast deltas to record once committed
+    cash_flows: list[CashFlow] = field(default_factory=list)
+
+
+def _from_status(rule: TransitionRule, row):
+    """
+    The status a moved row came from. Only reject has two sources: a
+    request that was approved has approved_at set (reject leaves it).
+    """
+    if len(rule.from_statuses) == 1:
+        return rule.from_statuses[0]
+    return FinancingStatus.APPROVED if row.approved_at is not None else FinancingStatus.PENDING
+
+
+def _transition_statement(
+    organization_id: int,
+    rule: TransitionRule,
+    targets: Sequence[tuple[int, Optional[int]]],
+    now: datetime,
+    actor_user_id: Optional[int],
+):
+    """
+    One statement for the whole batch: a conditional UPDATE guarded by
+    (status, version) and the organization, with the event inserts (and
+    for funding, the payables' FINANCED status) as data-modifying CTEs.
+    Rows that don't match are simply not updated: nothing is locked
+    beyond the rows that do change.
+    """
+    fr = FinancingRequest.__table__
+    target_rows = values(
+        column("id", Integer), column("expected_version", Integer), name="targets"
+    ).data([(request_id, version or _ANY_VERSION) for request_id, version in targets])
+
+    invoice_due = (
+        select(Invoice.due_date).where(Invoice.booking_id == Payable.booking_id).scalar_subquery()
+    )
+    moved = (
+        update(fr)
+        .where(
+            fr.c.id == target_rows.c.id,
+            fr.c.payable_id == Payable.id,
+            Payable.booking_id == Booking.id,
+            Booking.organization_id == organization_id,
+            fr.c.status.in_(rule.from_statuses),
+            (target_rows.c.expected_version == _ANY_VERSION) | (fr.c.version == target_rows.c.expected_version),
+        )
+        .values({fr.c.status: rule.to_status, fr.c.version: fr.c.version + 1, fr.c[rule.timestamp_column]: now})
+        .returning(
+            *fr.c,
+            Booking.client_id,
+            Payable.amount.label("payable_amount"),
+            Payable.due_date.label("payable_due_date"),
+            Payable.status.label("payable_status"),
+            invoice_due.label("invoice_due_date"),
+        )
+        .cte("moved")
+    )
+
+    from_status = literal(rule.from_statuses[0], fr.c.status.type)
+    if len(rule.from_statuses) > 1:
+        from_status = case(
+            (moved.c.approved_at.isnot(None), literal(FinancingStatus.APPROVED, fr.c.status.type)),
+            else_=literal(FinancingStatus.PENDING, fr.c.status.type),
+        )
+    events = insert(FinancingEvent.__table__).from_select(
+        ["financing_request_id", "organization_id", "from_status", "to_status", "version", "actor_user_id", "created_at"],
+        select(
+            moved.c.id,
+            literal(organization_id),
+            from_status,
+            literal(rule.to_status, fr.c.status.type),
+            moved.c.version,
+            literal(actor_user_id, Integer),
+            literal(now),
+        ),
+    ).cte("events")
+
+    statement = select(moved).add_cte(events)
+    if rule.to_status == FinancingStatus.FUNDED:
+        # Leva pays the carrier: the payable is settled by financing
+        payables = Payable.__table__
+        statement = statement.add_cte(
+            update(payables)
+            .where(payables.c.id.in_(select(moved.c.payable_id)))
+            .values(status=PaymentStatus.FINANCED)
+            .cte("financed_payables")
+        )
+    return statement
+
+
+def _cash_flows(rule: TransitionRule, row) -> list[CashFlow]:
+    """Forecast changes for one moved request (see forecast._flows_query)."""
+    repayment_due = (row.invoice_due_date or row.payable_due_date).date()
+    if rule.to_status == FinancingStatus.FUNDED:
+        flows = [CashFlow(Flow.FINANCING_REPAYMENTS, repayment_due, money_cents(row.total_repayment))]
+        # RETURNING shows the payable as it was, before the FINANCED update
+        if row.payable_status in (PaymentStatus.PENDING, PaymentStatus.OVERDUE):
+            flows.append(CashFlow(
+                Flow.CARRIER_PAYMENTS, row.payable_due_date.date(), -money_cents(row.payable_amount)
+            ))
+        return flows
+    if rule.to_status == FinancingStatus.REPAID:
+        return [CashFlow(Flow.FINANCING_REPAYMENTS, repayment_due, -money_cents(row.total_repayment))]
+    return []
+
+
+async def transition_requests(
+    db: AsyncSession,
+    organization_id: int,
+    transition: FinancingTransition,
+    targets: Sequence[tuple[int, Optional[int]]],
+    actor_user_id: Optional[int] = None,
+) -> TransitionResult:
+    """
+    Move financing requests through `transition`, each guarded by its
+    expected version (None: any), inside the caller's transaction (no
+    commit). Updates the exposure ledger and posts the journal entries for
+    the moved requests, and classifies the rest with one extra query, only
+    if there are any.
+    """
+    rule = TRANSITIONS[transition]
+    targets = list(dict(targets).items())  # last expected version wins per id
+    now = datetime.utcnow()
+    result = TransitionResult()
+    rows = (await db.execute(
+        _transition_statement(organization_id, rule, targets, now, actor_user_id)
+    )).all()
+    result.moved = {row.id: row for row in rows}
+
+    if result.moved:
+        await apply_exposure_changes(db, [
+            ExposureChange(organization_id, row.client_id, row.amount_requested, _from_status(rule, row), rule.to_status)
+            for row in rows
+        ])
+        await post_journal_lines(db, organization_id, [
+            line
+            for row in rows
+            for line in financing_journal_lines(
+                rule.to_status, row.id, money_cents(row.amount_requested), money_cents(row.total_repayment)
+            )
+        ])
+        result.cash_flows = [flow for row in rows for flow in _cash_flows(rule, row)]
+
+    missing = {request_id: version for request_id, version in targets if request_id not in result.moved}
+    if missing:
+        current = await db.execute(
+            select(FinancingRequest.id, FinancingRequest.status, FinancingRequest.version)
+            .join(Payable, Payable.id == FinancingRequest.payable_id)
+            .join(Booking, Booking.id == Payable.booking_id)
+            .where(FinancingRequest.id.in_(missing), Booking.organization_id == organization_id)
+        )
+        found = {request_id: (status, version) for request_id, status, version in current.all()}
+        for request_id, expected in missing.items():
+            if request_id not in found:
+                result.skipped[request_id] = (FinancingTransitionOutcome.NOT_FOUND, None, None)
+                continue
+            status, version = found[request_id]
+            if status not in rule.from_statuses:
+                outcome = FinancingTransitionOutcome.INVALID_TRANSITION
+            else:
+                # Right status now, so the version must have moved (or the
+                # row changed between the two statements)
+                outcome = FinancingTransitionOutcome.VERSION_CONFLICT
+            result.skipped[request_id] = (outcome, status, version)
+    return result
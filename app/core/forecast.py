@@ -0,0 +1,238 @@
+# /app/core/forecast.py
+import enum
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Iterable
+
+import numpy as np
+from sqlalchemy import Date, and_, cast, func, literal, select, true, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache
+from app.core.exposure import to_money
+from app.core.metrics import register_metrics_source
+from app.core.pricing import cents, money
+from app.models.finance import FinancingRequest, FinancingStatus, Invoice, Payable, PaymentStatus
+from app.models.organization import Organization
+from app.models.workflow import Booking
+from app.schemas.finance import CashFlowForecast, ForecastGranularity, ForecastPoint
+
+# Invoices and payables that will still move cash
+OPEN_STATUSES = (PaymentStatus.PENDING, PaymentStatus.OVERDUE)
+
+MAX_HORIZON_DAYS = 365
+# Day slots: 0 is today and everything past due, 1..MAX_HORIZON_DAYS the
+# days after today, and the last slot everything later
+_SLOTS = MAX_HORIZON_DAYS + 2
+
+FORECAST_CACHE_TTL_SECONDS = 3600
+FORECAST_CACHE_MAX_SIZE = 1_000
+
+
+class Flow(enum.IntEnum):
+    # Row order of the per-organization flow matrix
+    RECEIPTS = 0              # open invoices, collected from clients
+    CARRIER_PAYMENTS = 1      # open payables Leva hasn't funded
+    FINANCING_REPAYMENTS = 2  # funded financing, repaid when the invoice is collected
+
+
+@dataclass(frozen=True)
+class CashFlow:
+    """A change to one organization's projected flows (negative cents remove one)."""
+    flow: Flow
+    due: date
+    cents: int
+
+
+def _day(due: date) -> date:
+    return due.date() if isinstance(due, datetime) else due
+
+
+def booking_cash_flows(
+    payable_amount: float, payable_due: date, invoice_amount: float, invoice_due: date
+) -> list[CashFlow]:
+    """The flows a new booking adds: its invoice and its carrier payable."""
+    return [
+        CashFlow(Flow.RECEIPTS, _day(invoice_due), money_cents(invoice_amount)),
+        CashFlow(Flow.CARRIER_PAYMENTS, _day(payable_due), money_cents(payable_amount)),
+    ]
+
+
+def money_cents(amount: float) -> int:
+    """A float amount as integer cents, rounded like the SQL side (pricing.cents)."""
+    return int(to_money(amount) * 100)
+
+
+@dataclass
+class ForecastState:
+    """
+    Cents due per (Flow, day slot) for one organization as of `as_of`,
+    valid at `version` (the organization's change version).
+    """
+    version: int
+    as_of: date
+    flows: np.ndarray  # int64, shape (len(Flow), _SLOTS)
+
+    def slots(self, dues: Iterable[date]) -> np.ndarray:
+        days = np.array([(due - self.as_of).days for due in dues], dtype=np.int64)
+        return np.clip(days, 0, _SLOTS - 1)
+
+
+forecast_cache: TTLCache[int, ForecastState] = TTLCache(
+    max_size=FORECAST_CACHE_MAX_SIZE, ttl_seconds=FORECAST_CACHE_TTL_SECONDS
+)
+register_metrics_source("forecast_cache", forecast_cache.stats)
+
+
+def record_cash_flows(organization_id: int, version: int, changes: Iterable[CashFlow] = ()) -> None:
+    """
+    Apply a committed write (which bumped the organization to `version`)
+    to this worker's cached forecast state, instead of rebuilding it. If
+    the state isn't exactly one version behind, for example because
+    another worker wrote in between, it is dropped and rebuilt on the
+    next read.
+    """
+    state = forecast_cache.get(organization_id)
+    if state is None:
+        return
+    if state.version != version - 1 or state.as_of != datetime.utcnow().date():
+        forecast_cache.invalidate(organization_id)
+        return
+    changes = list(changes)
+    if changes:
+        np.add.at(
+            state.flows,
+            (np.array([change.flow for change in changes]), state.slots(change.due for change in changes)),
+            np.array([change.cents for change in changes], dtype=np.int64),
+        )
+    state.version = version
+
+
+def _flows_query(organization_id: int):
+    """
+    Every open flow summed per (Flow, due day) in SQL, plus the
+    organization's change version read in the same statement (the same
+    snapshot), so the state is labelled with exactly the version it reflects.
+    """
+    funded = and_(
+        FinancingRequest.payable_id == Payable.id,
+        FinancingRequest.status == FinancingStatus.FUNDED,
+    )
+    flows = union_all(
+        select(
+            literal(int(Flow.RECEIPTS)).label("flow"),
+            Invoice.due_date.label("due_date"),
+            Invoice.amount.label("amount"),
+        )
+        .join(Booking, Booking.id == Invoice.booking_id)
+        .where(Booking.organization_id == organization_id, Invoice.status.in_(OPEN_STATUSES)),
+        # Once Leva has funded a payable, the carrier is paid
+        select(literal(int(Flow.CARRIER_PAYMENTS)), Payable.due_date, Payable.amount)
+        .join(Booking, Booking.id == Payable.booking_id)
+        .where(
+            Booking.organization_id == organization_id,
+            Payable.status.in_(OPEN_STATUSES),
+            ~select(FinancingRequest.id).where(funded).exists(),
+        ),
+        # ...and the forwarder repays Leva when the client pays the invoice
+        select(
+            literal(int(Flow.FINANCING_REPAYMENTS)),
+            func.coalesce(Invoice.due_date, Payable.due_date),
+            FinancingRequest.total_repayment,
+        )
+        .select_from(FinancingRequest)
+        .join(Payable, funded)
+        .join(Booking, Booking.id == Payable.booking_id)
+        .outerjoin(Invoice, Invoice.booking_id == Booking.id)
+        .where(Booking.organization_id == organization_id),
+    ).subquery("flows")
+    # Rounded to cents per item, like the quotes and the exposure ledger
+    due_day = cast(flows.c.due_date, Date)
+    grouped = (
+        select(flows.c.flow, due_day.label("due_day"), func.sum(cents(flows.c.amount)).label("cents"))
+        .group_by(flows.c.flow, due_day)
+        .subquery("grouped")
+    )
+    return (
+        select(Organization.change_version, grouped.c.flow, grouped.c.due_day, grouped.c.cents)
+        .select_from(Organization)
+        .outerjoin(grouped, true())
+        .where(Organization.id == organization_id)
+    )
+
+
+async def build_forecast_state(db: AsyncSession, organization_id: int, as_of: date) -> ForecastState:
+    """
+    Rebuild an organization's state from scratch: one statement returning
+    a row per (Flow, due day), folded into day slots with NumPy.
+    """
+    rows = (await db.execute(_flows_query(organization_id))).all()
+    state = ForecastState(
+        version=rows[0][0] if rows else 0,
+        as_of=as_of,
+        flows=np.zeros((len(Flow), _SLOTS), dtype=np.int64),
+    )
+    present = [row for row in rows if row[1] is not None]
+    if present:
+        np.add.at(
+            state.flows,
+            (np.array([row[1] for row in present]), state.slots(row[2] for row in present)),
+            np.array([row[3] for row in present], dtype=np.int64),
+        )
+    return state
+
+
+def project(
+    state: ForecastState, horizon_days: int, granularity: ForecastGranularity, opening_balance_cents: int = 0
+) -> CashFlowForecast:
+    """
+    The cash position series over the next `horizon_days` (vectorized:
+    per-period sums with np.add.reduceat, position with np.cumsum).
+    """
+    days = state.flows[:, : horizon_days + 1]
+    step = 7 if granularity == ForecastGranularity.WEEK else 1
+    starts = np.arange(0, days.shape[1], step)
+    periods = np.add.reduceat(days, starts, axis=1)
+    net = periods[Flow.RECEIPTS] - periods[Flow.CARRIER_PAYMENTS] - periods[Flow.FINANCING_REPAYMENTS]
+    position = opening_balance_cents + np.cumsum(net)
+    later = state.flows[:, horizon_days + 1:].sum(axis=1)
+
+    ends = np.minimum(starts + step - 1, horizon_days)
+    lowest = int(np.argmin(position))
+    points = [
+        ForecastPoint(
+            start=state.as_of + timedelta(days=start),
+            end=state.as_of + timedelta(days=end),
+            receipts=money(receipts),
+            carrier_payments=money(payments),
+            financing_repayments=money(repayments),
+            net=money(period_net),
+            position=money(period_position),
+        )
+        for start, end, receipts, payments, repayments, period_net, period_position in zip(
+            starts.tolist(), ends.tolist(),
+            periods[Flow.RECEIPTS].tolist(), periods[Flow.CARRIER_PAYMENTS].tolist(),
+            periods[Flow.FINANCING_REPAYMENTS].tolist(), net.tolist(), position.tolist(),
+        )
+    ]
+    return CashFlowForecast(
+        as_of=state.as_of,
+        granularity=granularity,
+        opening_balance=money(opening_balance_cents),
+        points=points,
+        lowest_position=points[lowest].position,
+        lowest_position_date=points[lowest].end,
+        net_after_horizon=money(
+            int(later[Flow.RECEIPTS] - later[Flow.CARRIER_PAYMENTS] - later[Flow.FINANCING_REPAYMENTS])
+        ),
+    )
+
+
+async def get_forecast_state(db: AsyncSession, organization_id: int, version: int) -> ForecastState:
+    """The cached state if it is at `version` and from today, else a rebuild."""
+    as_of = datetime.utcnow().date()
+    state = forecast_cache.get(organization_id)
+    if state is None or state.version != version or state.as_of != as_of:
+        state = await build_forecast_state(db, organization_id, as_of)
+        forecast_cache.set(organization_id, state)
+    return state
@@ -0,0 +1,69 @@
+# /app/core/hashing.py
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from app.core.metrics import LatencyHistogram, register_metrics_source
+
+T = TypeVar("T")
+
+# bcrypt is deliberately slow (tens to hundreds of ms per call) but releases
+# the GIL, so a small thread pool keeps it off the event loop without
+# letting a login burst eat every core on the box.
+HASH_POOL_SIZE = 4
+# How long a request may wait for a free hashing slot before we shed it.
+HASH_QUEUE_TIMEOUT_SECONDS = 5.0
+
+_executor = ThreadPoolExecutor(max_workers=HASH_POOL_SIZE, thread_name_prefix="bcrypt")
+_slots = asyncio.Semaphore(HASH_POOL_SIZE)
+
+hash_latency = LatencyHistogram()
+queue_wait_latency = LatencyHistogram()
+_rejected = 0
+
+
+class HashPoolBusy(Exception):
+    """Raised when no hashing slot frees up within HASH_QUEUE_TIMEOUT_SECONDS."""
+
+
+def _timed(fn: Callable[..., T], *args) -> T:
+    started = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        hash_latency.observe((time.perf_counter() - started) * 1000)
+
+
+async def run_hash_operation(fn: Callable[..., T], *args) -> T:
+    """
+    Run a CPU-bound hashing call on the bounded bcrypt pool.
+    Callers beyond the pool's capacity queue until a slot frees up or the
+    timeout expires.
+    """
+    global _rejected
+    queued_at = time.perf_counter()
+    try:
+        await asyncio.wait_for(_slots.acquire(), timeout=HASH_QUEUE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        _rejected += 1
+        raise HashPoolBusy("Password hashing pool is saturated")
+    queue_wait_latency.observe((time.perf_counter() - queued_at) * 1000)
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, _timed, fn, *args)
+    finally:
+        _slots.release()
+
+
+def _stats() -> dict:
+    return {
+        "pool_size": HASH_POOL_SIZE,
+        "queue_timeout_seconds": HASH_QUEUE_TIMEOUT_SECONDS,
+        "rejected": _rejected,
+        "hash_latency": hash_latency.snapshot(),
+        "queue_wait": queue_wait_latency.snapshot(),
+    }
+
+
+register_metrics_source("password_hashing", _stats)
@@ -0,0 +1,272 @@
+# /app/core/idempotency.py
+import asyncio
+import hashlib
+import json
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import HTTPException, Request, status
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy import delete, event, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.db.session import async_session
+from app.db.instrumentation import outside_query_budget
+from app.models.idempotency import IdempotencyKey
+from app.core.cache import TTLCache
+from app.core.metrics import register_metrics_source
+
+# How long a key (and its stored response) can be replayed
+IDEMPOTENCY_KEY_TTL_HOURS = 24
+# An IN_PROGRESS claim older than this is presumed dead (worker crashed)
+# and may be taken over by a retry
+IDEMPOTENCY_LOCK_TIMEOUT_SECONDS = 60
+# How long a duplicate waits for the in-flight original before giving up (409)
+IDEMPOTENCY_WAIT_SECONDS = 10.0
+IDEMPOTENCY_CACHE_MAX_SIZE = 10_000
+
+IN_PROGRESS = "IN_PROGRESS"
+# The write committed (in the same transaction as this status) but its
+# response isn't stored yet: never run again, only replayed once completed
+COMMITTED = "COMMITTED"
+COMPLETED = "COMPLETED"
+
+# Session.info key: the (organization_id, key) whose write this session commits
+_COMMITTING_KEY = "idempotency_committing_key"
+
+# Sent on responses that were replayed rather than executed
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    fingerprint: str
+    status_code: int
+    body: Any
+
+
+# Completed responses, so hot retries replay without touching the database
+response_cache: TTLCache[tuple[int, str], StoredResponse] = TTLCache(
+    max_size=IDEMPOTENCY_CACHE_MAX_SIZE, ttl_seconds=IDEMPOTENCY_KEY_TTL_HOURS * 3600
+)
+register_metrics_source("idempotency_cache", response_cache.stats)
+
+# Keys executing in this worker; duplicates wait on the event instead of polling
+_in_flight: dict[tuple[int, str], asyncio.Event] = {}
+
+
+def request_fingerprint(method: str, path: str, body: bytes) -> str:
+    digest = hashlib.sha256(f"{method} {path}\n".encode())
+    digest.update(body)
+    return digest.hexdigest()
+
+
+async def _claim(organization_id: int, key: str, fingerprint: str) -> tuple[bool, Optional[StoredResponse]]:
+    """
+    Try to take the key. Returns (True, None) when this request should run,
+    (False, response) when it already completed, or (False, None) while
+    another request holds it. Expired keys and stale claims are taken over;
+    a key whose write committed never is. One whose response was lost
+    (the worker died before storing it) is a 409.
+    """
+    table = IdempotencyKey.__table__
+    now = datetime.utcnow()
+    claim = {
+        "request_fingerprint": fingerprint,
+        "status": IN_PROGRESS,
+        "response_status": None,
+        "response_body": None,
+        "created_at": now,
+        "locked_at": now,
+        "expires_at": now + timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS),
+    }
+    stale_lock = now - timedelta(seconds=IDEMPOTENCY_LOCK_TIMEOUT_SECONDS)
+    async with async_session() as db:
+        result = await db.execute(
+            pg_insert(table)
+            .values(organization_id=organization_id, key=key, **claim)
+            .on_conflict_do_update(
+                index_elements=["organization_id", "key"],
+                set_=claim,
+                where=(table.c.expires_at < now)
+                | ((table.c.status == IN_PROGRESS) & (table.c.locked_at < stale_lock)),
+            )
+            .returning(table.c.key)
+        )
+        claimed = result.first() is not None
+        await db.commit()
+        if claimed:
+            return True, None
+
+        row = (await db.execute(
+            select(IdempotencyKey).where(
+                IdempotencyKey.organization_id == organization_id, IdempotencyKey.key == key
+            )
+        )).scalars().first()
+    if row is not None and row.status == COMMITTED and row.locked_at < stale_lock:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="The request with this Idempotency-Key was already carried out, "
+                   "but its response is no longer available",
+        )
+    if row is None or row.status != COMPLETED:
+        return False, None
+    stored = StoredResponse(row.request_fingerprint, row.response_status, json.loads(row.response_body))
+    response_cache.set((organization_id, key), stored)
+    return False, stored
+
+
+@event.listens_for(Session, "before_commit")
+def _mark_write_committed(session: Session) -> None:
+    """
+    Mark the key COMMITTED in the handler's own transaction, so the write
+    and the mark commit together: if storing the response fails or the
+    worker dies right after, a retry can't run the write a second time.
+    """
+    committing = session.info.get(_COMMITTING_KEY)
+    if committing is None:
+        return
+    organization_id, key = committing
+    session.execute(
+        update(IdempotencyKey)
+        .where(
+            IdempotencyKey.organization_id == organization_id,
+            IdempotencyKey.key == key,
+            IdempotencyKey.status == IN_PROGRESS,
+        )
+        .values(status=COMMITTED, locked_at=datetime.utcnow())
+    )
+
+
+@event.listens_for(Session, "after_commit")
+def _write_committed(session: Session) -> None:
+    session.info.pop(_COMMITTING_KEY, None)
+
+
+async def _complete(organization_id: int, key: str, stored: StoredResponse) -> None:
+    async with async_session() as db:
+        await db.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.organization_id == organization_id, IdempotencyKey.key == key)
+            .values(
+                status=COMPLETED,
+                response_status=stored.status_code,
+                response_body=json.dumps(stored.body),
+            )
+        )
+        await db.commit()
+    response_cache.set((organization_id, key), stored)
+
+
+async def _release(organization_id: int, key: str) -> None:
+    """
+    Drop a claim whose request failed, so a retry runs it again (unless
+    its write had already committed).
+    """
+    async with async_session() as db:
+        await db.execute(
+            delete(IdempotencyKey).where(
+                IdempotencyKey.organization_id == organization_id,
+                IdempotencyKey.key == key,
+                IdempotencyKey.status == IN_PROGRESS,
+            )
+        )
+        await db.commit()
+
+
+def _replay(stored: StoredResponse, fingerprint: str) -> JSONResponse:
+    if stored.fingerprint != fingerprint:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used for a different request",
+        )
+    return JSONResponse(
+        status_code=stored.status_code, content=stored.body, headers={REPLAYED_HEADER: "true"}
+    )
+
+
+async def run_idempotent(
+    request: Request,
+    organization_id: int,
+    key: Optional[str],
+    handler: Callable[[], Awaitable[Any]],
+    response_model: type[BaseModel],
+    db: AsyncSession,
+) -> Any:
+    """
+    Run a write endpoint's `handler` at most once per Idempotency-Key.
+    `db` is the session the handler commits its write with: the key is
+    marked COMMITTED in that same transaction.
+
+    Without a key the handler just runs. With one, a completed request's
+    stored response is replayed (from the LRU, else the table), and a
+    duplicate of a request still in flight waits for it to finish rather
+    than executing again. Responses below 500 are stored; server errors
+    release the key so the client's retry runs the request again.
+    """
+    if key is None:
+        return await handler()
+
+    fingerprint = request_fingerprint(request.method, request.url.path, await request.body())
+    cache_key = (organization_id, key)
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    poll_seconds = 0.05
+    attempt = 0
+    while True:
+        stored = response_cache.get(cache_key)
+        if stored is None and cache_key not in _in_flight:
+            # Only the first attempt counts towards the route's query budget
+            with outside_query_budget() if attempt else nullcontext():
+                claimed, stored = await _claim(organization_id, key, fingerprint)
+            if claimed:
+                break
+        attempt += 1
+        if stored is not None:
+            return _replay(stored, fingerprint)
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is still in progress",
+            )
+        in_flight = _in_flight.get(cache_key)
+        if in_flight is not None:
+            try:
+                await asyncio.wait_for(in_flight.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                pass
+        else:
+            # Held by another worker: poll the table with backoff
+            await asyncio.sleep(min(poll_seconds, remaining))
+            poll_seconds = min(poll_seconds * 2, 0.5)
+
+    done = _in_flight[cache_key] = asyncio.Event()
+    db.sync_session.info[_COMMITTING_KEY] = cache_key
+    try:
+        try:
+            result = await handler()
+        except HTTPException as exc:
+            if exc.status_code >= 500:
+                await _release(organization_id, key)
+            else:
+                await _complete(organization_id, key, StoredResponse(
+                    fingerprint, exc.status_code, {"detail": exc.detail}
+                ))
+            raise
+        except Exception:
+            await _release(organization_id, key)
+            raise
+        body = response_model.model_validate(result).model_dump(mode="json")
+        await _complete(organization_id, key, StoredResponse(fingerprint, status.HTTP_200_OK, body))
+        return body
+    finally:
+        db.sync_session.info.pop(_COMMITTING_KEY, None)
+        del _in_flight[cache_key]
+        done.set()
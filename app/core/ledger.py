@@ -0,0 +1,243 @@
+# /app/core/ledger.py
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional, Sequence
+
+from sqlalchemy import (
+    DateTime, Integer, and_, cast, column, func, insert, literal, select, table, true, tuple_, values,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import async_session
+from app.models.finance import FinancingStatus
+from app.models.ledger import (
+    JournalEntry, JournalEntryKind, LedgerAccount, LedgerAccountCode, LedgerBalanceSnapshot, LedgerPosting,
+)
+
+logger = logging.getLogger(__name__)
+
+# Ledger times come from the database clock, in UTC, never a worker's.
+# now() is the transaction's start, so a posting is never stamped later
+# than any transaction still open when it was written
+_DB_NOW = func.timezone("UTC", func.now())
+
+# pg_try_advisory_xact_lock key, so one worker snapshots at a time
+_SNAPSHOT_LOCK_ID = 0x4C455641_0002
+
+_NEGATIVE_INFINITY = cast(literal("-infinity"), DateTime)
+
+_pg_stat_activity = table("pg_stat_activity", column("pid"), column("datname"), column("xact_start"))
+
+
+@dataclass(frozen=True)
+class JournalLine:
+    """One posting to write: debits positive, credits negative."""
+    financing_request_id: int
+    kind: JournalEntryKind
+    account: LedgerAccountCode
+    amount_cents: int
+
+
+def financing_journal_lines(
+    to_status: FinancingStatus, financing_request_id: int, amount_cents: int, repayment_cents: int
+) -> list[JournalLine]:
+    """
+    The money a financing transition moves. Funding pays the carrier and
+    charges the fee (the forwarder then owes the total repayment);
+    repayment settles it. Other transitions move no money.
+    """
+    def entry(kind, debit, credit, cents):
+        return [
+            JournalLine(financing_request_id, kind, debit, cents),
+            JournalLine(financing_request_id, kind, credit, -cents),
+        ]
+
+    receivable = LedgerAccountCode.FINANCING_RECEIVABLE
+    if to_status == FinancingStatus.FUNDED:
+        return (
+            entry(JournalEntryKind.FUNDING, receivable, LedgerAccountCode.CASH, amount_cents)
+            + entry(JournalEntryKind.FEE, receivable, LedgerAccountCode.FEE_INCOME, repayment_cents - amount_cents)
+        )
+    if to_status == FinancingStatus.REPAID:
+        return entry(JournalEntryKind.REPAYMENT, LedgerAccountCode.CASH, receivable, repayment_cents)
+    return []
+
+
+async def post_journal_lines(db: AsyncSession, organization_id: int, lines: Sequence[JournalLine]) -> None:
+    """
+    Append the entries for `lines` (one per financing request and kind)
+    inside the caller's transaction: one statement creates any missing
+    accounts, one more writes the entries and their postings. They are
+    posted at the transaction's start by the database clock.
+    """
+    if not lines:
+        return
+    assert sum(line.amount_cents for line in lines) == 0, "unbalanced journal lines"
+    await db.execute(
+        pg_insert(LedgerAccount)
+        .values([
+            {"organization_id": organization_id, "code": code, "created_at": _DB_NOW}
+            for code in dict.fromkeys(line.account for line in lines)
+        ])
+        .on_conflict_do_nothing(index_elements=["organization_id", "code"])
+    )
+
+    entries_table = JournalEntry.__table__
+    kind_type = entries_table.c.kind.type
+    new_entries = values(
+        column("financing_request_id", Integer), column("kind", kind_type), name="new_entries"
+    ).data(list(dict.fromkeys((line.financing_request_id, line.kind) for line in lines)))
+    entries = (
+        insert(entries_table)
+        .from_select(
+            ["organization_id", "financing_request_id", "kind", "posted_at"],
+            select(literal(organization_id), new_entries.c.financing_request_id, new_entries.c.kind, _DB_NOW),
+        )
+        .returning(entries_table.c.id, entries_table.c.financing_request_id, entries_table.c.kind)
+        .cte("entries")
+    )
+    new_lines = values(
+        column("financing_request_id", Integer),
+        column("kind", kind_type),
+        column("account", LedgerAccount.__table__.c.code.type),
+        column("amount_cents", LedgerPosting.__table__.c.amount_cents.type),
+        name="new_lines",
+    ).data([(line.financing_request_id, line.kind, line.account, line.amount_cents) for line in lines])
+    await db.execute(
+        insert(LedgerPosting.__table__)
+        .from_select(
+            ["journal_entry_id", "account_id", "amount_cents", "posted_at"],
+            select(entries.c.id, LedgerAccount.id, new_lines.c.amount_cents, _DB_NOW)
+            .select_from(new_lines)
+            .join(entries, and_(
+                entries.c.financing_request_id == new_lines.c.financing_request_id,
+                entries.c.kind == new_lines.c.kind,
+            ))
+            .join(LedgerAccount, and_(
+                LedgerAccount.organization_id == organization_id,
+                LedgerAccount.code == new_lines.c.account,
+            )),
+        )
+        .add_cte(entries)
+    )
+
+
+def balances_query(organization_id: int, as_of: datetime):
+    """
+    Each of the organization's account balances as of `as_of`: its latest
+    snapshot at or before then, plus the postings from the snapshot's
+    cutoff to `as_of` (a range scan on (account_id, posted_at)).
+    """
+    snapshot = (
+        select(LedgerBalanceSnapshot.cutoff, LedgerBalanceSnapshot.balance_cents)
+        .where(LedgerBalanceSnapshot.account_id == LedgerAccount.id, LedgerBalanceSnapshot.cutoff <= as_of)
+        .order_by(LedgerBalanceSnapshot.cutoff.desc())
+        .limit(1)
+        .lateral("snapshot")
+    )
+    delta = (
+        select(func.coalesce(func.sum(LedgerPosting.amount_cents), 0))
+        .where(
+            # Row comparisons, so the whole range is one scan of the
+            # (account_id, posted_at) index rather than every account's
+            # recent postings filtered down
+            tuple_(LedgerPosting.account_id, LedgerPosting.posted_at)
+            >= tuple_(LedgerAccount.id, func.coalesce(snapshot.c.cutoff, _NEGATIVE_INFINITY)),
+            tuple_(LedgerPosting.account_id, LedgerPosting.posted_at) <= tuple_(LedgerAccount.id, literal(as_of)),
+        )
+        .scalar_subquery()
+    )
+    return (
+        select(LedgerAccount.code, func.coalesce(snapshot.c.balance_cents, 0) + delta)
+        .select_from(LedgerAccount)
+        .outerjoin(snapshot, true())
+        .where(LedgerAccount.organization_id == organization_id)
+    )
+
+
+async def get_balances(db: AsyncSession, organization_id: int, as_of: datetime) -> dict[LedgerAccountCode, int]:
+    """Balance in cents per account code (debit positive); accounts not yet used are 0."""
+    result = await db.execute(balances_query(organization_id, as_of))
+    balances = {code: 0 for code in LedgerAccountCode}
+    balances.update({code: int(balance) for code, balance in result.all()})
+    return balances
+
+
+def _committed_cutoff():
+    """
+    The latest time before which every posting has committed: the start
+    of the oldest transaction still open in this database (postings are
+    stamped with their transaction's start), or now if none is. Sessions
+    of other roles aren't visible here, so the application's writers must
+    share one role.
+    """
+    oldest_open = (
+        select(func.min(_pg_stat_activity.c.xact_start))
+        .where(
+            _pg_stat_activity.c.datname == func.current_database(),
+            _pg_stat_activity.c.pid != func.pg_backend_pid(),
+        )
+        .scalar_subquery()
+    )
+    # LEAST ignores the NULL when no other transaction is open
+    return func.timezone("UTC", func.least(func.clock_timestamp(), oldest_open))
+
+
+async def snapshot_balances(db: AsyncSession) -> Optional[dict]:
+    """
+    Snapshot every account with postings since the previous run, in one
+    set-based INSERT: previous balance + the window's postings. Accounts
+    without postings keep their last snapshot, which is still exact, so a
+    balance lookup never scans more than about one run interval of
+    postings. Returns None if another worker holds the lock.
+
+    Windows are contiguous and end at a committed watermark (see
+    _committed_cutoff), so a posting still in flight always lands after
+    the cutoff and is picked up by the next run, however long its
+    transaction takes.
+    """
+    acquired = (await db.execute(select(func.pg_try_advisory_xact_lock(_SNAPSHOT_LOCK_ID)))).scalar()
+    if not acquired:
+        await db.rollback()
+        return None
+
+    cutoff = (await db.execute(select(_committed_cutoff()))).scalar_one()
+    # Runs cover contiguous windows: the last cutoff any account got
+    previous = select(
+        func.coalesce(func.max(LedgerBalanceSnapshot.cutoff), _NEGATIVE_INFINITY)
+    ).scalar_subquery()
+    window = (
+        select(LedgerPosting.account_id, func.sum(LedgerPosting.amount_cents).label("delta"))
+        .where(LedgerPosting.posted_at >= previous, LedgerPosting.posted_at < cutoff)
+        .group_by(LedgerPosting.account_id)
+        .subquery("window")
+    )
+    last_balance = (
+        select(LedgerBalanceSnapshot.balance_cents)
+        .where(LedgerBalanceSnapshot.account_id == window.c.account_id)
+        .order_by(LedgerBalanceSnapshot.cutoff.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        insert(LedgerBalanceSnapshot)
+        .from_select(
+            ["account_id", "cutoff", "balance_cents"],
+            select(window.c.account_id, literal(cutoff), func.coalesce(last_balance, 0) + window.c.delta),
+        )
+        .returning(LedgerBalanceSnapshot.account_id)
+    )
+    accounts = len(result.all())
+    await db.commit()
+    return {"cutoff": cutoff.isoformat(), "accounts": accounts}
+
+
+async def run_ledger_snapshot() -> Optional[dict]:
+    """Scheduler entry point: snapshot in its own session on the primary."""
+    async with async_session() as db:
+        report = await snapshot_balances(db)
+    if report and report["accounts"]:
+        logger.info("Ledger balances snapshotted: %s", report)
+    return report
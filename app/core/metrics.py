@@ -0,0 +1,60 @@
+# /app/core/metrics.py
+import bisect
+import threading
+from typing import Any, Callable
+
+# Each subsystem registers a callable that returns a JSON-serializable dict.
+# GET /metrics calls them all and returns a single snapshot.
+_sources: dict[str, Callable[[], dict[str, Any]]] = {}
+
+
+def register_metrics_source(name: str, source: Callable[[], dict[str, Any]]) -> None:
+    """Register (or replace) a named metrics source."""
+    _sources[name] = source
+
+
+def metrics_snapshot() -> dict[str, Any]:
+    """Collect the current values from every registered source."""
+    return {name: source() for name, source in _sources.items()}
+
+
+class LatencyHistogram:
+    """
+    Cumulative latency histogram with fixed bucket bounds in milliseconds.
+    Thread-safe, so it can be fed from executor threads.
+    """
+
+    DEFAULT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+    def __init__(self, buckets_ms: tuple[float, ...] = DEFAULT_BUCKETS_MS):
+        self.buckets_ms = tuple(sorted(buckets_ms))
+        self._counts = [0] * (len(self.buckets_ms) + 1)  # last slot is +Inf
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, value_ms: float) -> None:
+        index = bisect.bisect_left(self.buckets_ms, value_ms)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.total_ms += value_ms
+            if value_ms > self.max_ms:
+                self.max_ms = value_ms
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            counts = list(self._counts)
+            count, total_ms, max_ms = self.count, self.total_ms, self.max_ms
+        cumulative, buckets = 0, {}
+        for bound, n in zip(self.buckets_ms, counts):
+            cumulative += n
+            buckets[f"le_{bound:g}ms"] = cumulative
+        buckets["le_inf"] = cumulative + counts[-1]
+        return {
+            "count": count,
+            "avg_ms": round(total_ms / count, 3) if count else None,
+            "max_ms": round(max_ms, 3),
+            "buckets": buckets,
+        }
@@ -0,0 +1,119 @@
+# /app/core/overdue.py
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, time
+from typing import Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.change_version import bump_change_versions
+from app.core.config import get_settings
+from app.core.forecast import record_cash_flows
+from app.core.metrics import register_metrics_source
+from app.db.session import async_session
+from app.models.finance import Invoice, Payable, PaymentStatus
+from app.models.workflow import Booking
+
+logger = logging.getLogger(__name__)
+
+# PENDING rows past their due date become OVERDUE. Both tables link to
+# bookings, which carry the organization whose change version is bumped.
+SWEPT_MODELS = {"payables": Payable, "invoices": Invoice}
+
+
+@dataclass
+class SweepStats:
+    """Totals since startup for this worker, reported under /metrics."""
+    runs: int = 0
+    batches: int = 0
+    marked: dict[str, int] = field(default_factory=lambda: {name: 0 for name in SWEPT_MODELS})
+    last_run: Optional[dict] = None
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "batches": self.batches,
+            "marked_overdue": dict(self.marked),
+            "last_run": self.last_run,
+        }
+
+
+sweep_stats = SweepStats()
+register_metrics_source("overdue_sweeper", sweep_stats.stats)
+
+
+def overdue_cutoff(now: datetime) -> datetime:
+    """
+    Rows due before this (the start of `now`'s UTC day) are overdue. Due
+    dates are stored at midnight, so one due today is still current, as
+    in aging and underwriting. A plain timestamp bound (`due_date <
+    cutoff`, i.e. `due_date::date < today`) keeps the due_date indexes usable.
+    """
+    return datetime.combine(now.date(), time.min)
+
+
+def _sweep_batch(model, cutoff: datetime, batch_size: int):
+    """
+    One bounded UPDATE: lock up to `batch_size` PENDING rows due before
+    `cutoff` (oldest first, via the partial due_date index), skipping rows
+    another transaction holds, and return each marked row's organization.
+    """
+    batch = (
+        select(model.id, Booking.organization_id)
+        .join(Booking, Booking.id == model.booking_id)
+        .where(model.status == PaymentStatus.PENDING, model.due_date < cutoff)
+        .order_by(model.due_date)
+        .limit(batch_size)
+        .with_for_update(of=model, skip_locked=True)
+        .cte("due_batch")
+    )
+    table = model.__table__
+    return (
+        update(table)
+        .where(table.c.id == batch.c.id)
+        .values(status=PaymentStatus.OVERDUE)
+        .returning(batch.c.organization_id)
+    )
+
+
+async def sweep_overdue(
+    db: AsyncSession, batch_size: int, now: Optional[datetime] = None
+) -> dict[str, int]:
+    """
+    Move PENDING payables and invoices due before today (UTC; see
+    overdue_cutoff) to OVERDUE, one committed batch at a time so no
+    transaction holds many row locks. Safe to run in every worker at
+    once: SKIP LOCKED splits the work. Returns the rows marked per table.
+    """
+    cutoff = overdue_cutoff(now or datetime.utcnow())
+    marked = {}
+    for name, model in SWEPT_MODELS.items():
+        marked[name] = 0
+        while True:
+            result = await db.execute(_sweep_batch(model, cutoff, batch_size))
+            organization_ids = result.scalars().all()
+            versions = await bump_change_versions(db, organization_ids)
+            await db.commit()
+            # PENDING -> OVERDUE moves no cash: forecasts just advance
+            for organization_id, version in versions.items():
+                record_cash_flows(organization_id, version)
+            sweep_stats.batches += 1
+            marked[name] += len(organization_ids)
+            sweep_stats.marked[name] += len(organization_ids)
+            # A short batch means nothing is left (or the rest is locked
+            # by another worker, which will finish it)
+            if len(organization_ids) < batch_size:
+                break
+    return marked
+
+
+async def run_overdue_sweep() -> dict:
+    """Scheduler entry point: sweep in its own session on the primary."""
+    async with async_session() as db:
+        marked = await sweep_overdue(db, get_settings().overdue_sweep_batch_size)
+    sweep_stats.runs += 1
+    sweep_stats.last_run = marked
+    if any(marked.values()):
+        logger.info("Marked overdue: %s", marked)
+    return marked
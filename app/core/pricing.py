@@ -0,0 +1,158 @@
+# /app/core/pricing.py
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Optional, Sequence
+
+import numpy as np
+from sqlalchemy import BigInteger, Numeric, cast, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.finance import Invoice, Payable
+from app.models.workflow import Booking
+
+# Fee: 2.5% per 30 days of tenor, pro-rated by the day, never less than
+# one full period
+FEE_BPS_PER_PERIOD = 250
+PERIOD_DAYS = 30
+MIN_TENOR_DAYS = 30
+
+_BPS = 10_000
+# Above this, amount * bps * tenor may not fit in int64 (see price())
+_INT64_SAFE = 2 ** 62
+
+
+def cents(column):
+    """
+    A float money column as integer cents, converted by Postgres: rounds
+    the same way as the exposure ledger's Numeric(18, 2) casts.
+    """
+    return cast(cast(column, Numeric(18, 2)) * 100, BigInteger)
+
+
+def money(amount_cents: int) -> Decimal:
+    """Integer cents as an exact Decimal amount."""
+    return Decimal(amount_cents).scaleb(-2)
+
+
+def tenor_days(
+    payable_due: np.ndarray, invoice_due: np.ndarray, as_of: date
+) -> np.ndarray:
+    """
+    Days Leva is out of pocket: from paying the carrier (the payable's due
+    date, or today if that has passed) until the client pays the invoice.
+    Missing invoice dates (NaT) and short gaps get MIN_TENOR_DAYS.
+    """
+    funded = np.maximum(payable_due.astype("datetime64[D]"), np.datetime64(as_of, "D"))
+    days = (invoice_due.astype("datetime64[D]") - funded).astype(np.int64)
+    days[np.isnat(invoice_due)] = MIN_TENOR_DAYS
+    return np.maximum(days, MIN_TENOR_DAYS)
+
+
+def price(amount_cents: np.ndarray, tenors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Fee and total repayment in integer cents for a batch:
+    fee = amount * FEE_BPS_PER_PERIOD * tenor / (10000 * PERIOD_DAYS),
+    rounded half up to the cent, with no floating point on the way.
+    Batches whose products could overflow int64 fall back to Python ints.
+    """
+    amount_cents = np.asarray(amount_cents, dtype=np.int64)
+    tenors = np.asarray(tenors, dtype=np.int64)
+    if amount_cents.size and (
+        int(np.abs(amount_cents).max()) * FEE_BPS_PER_PERIOD * int(tenors.max()) * 2 >= _INT64_SAFE
+    ):
+        amount_cents, tenors = amount_cents.astype(object), tenors.astype(object)
+    numerator = amount_cents * FEE_BPS_PER_PERIOD * tenors
+    denominator = _BPS * PERIOD_DAYS
+    fee = (2 * numerator + denominator) // (2 * denominator)
+    return fee, amount_cents + fee
+
+
+@dataclass(frozen=True)
+class Quote:
+    """The price of financing one payable, in integer cents."""
+    payable_id: int
+    amount_cents: int
+    invoice_cents: Optional[int]
+    tenor_days: int
+    fee_cents: int
+    repayment_cents: int
+
+    @property
+    def amount(self) -> Decimal:
+        return money(self.amount_cents)
+
+    @property
+    def invoice_amount(self) -> Optional[Decimal]:
+        return None if self.invoice_cents is None else money(self.invoice_cents)
+
+    @property
+    def fee_amount(self) -> Decimal:
+        return money(self.fee_cents)
+
+    @property
+    def total_repayment(self) -> Decimal:
+        return money(self.repayment_cents)
+
+    @property
+    def fee_percentage(self) -> Decimal:
+        """The rate charged for this tenor, e.g. 3.75 for 45 days."""
+        return (Decimal(FEE_BPS_PER_PERIOD * self.tenor_days) / (PERIOD_DAYS * 100)).quantize(Decimal("0.0001"))
+
+    @property
+    def net_amount(self) -> Optional[Decimal]:
+        """What the forwarder keeps once the invoice pays off the repayment."""
+        return None if self.invoice_cents is None else money(self.invoice_cents - self.repayment_cents)
+
+
+def build_quotes(
+    payable_ids: Sequence[int],
+    amount_cents: np.ndarray,
+    invoice_cents: Sequence[Optional[int]],
+    payable_due: np.ndarray,
+    invoice_due: np.ndarray,
+    as_of: date,
+) -> list[Quote]:
+    tenors = tenor_days(payable_due, invoice_due, as_of)
+    fees, repayments = price(amount_cents, tenors)
+    return [
+        Quote(payable_id, int(amount), invoice, int(tenor), int(fee), int(repayment))
+        for payable_id, amount, invoice, tenor, fee, repayment in zip(
+            payable_ids, amount_cents.tolist(), invoice_cents, tenors.tolist(), fees.tolist(), repayments.tolist()
+        )
+    ]
+
+
+async def quote_payables(
+    db: AsyncSession, organization_id: int, payable_ids: Sequence[int]
+) -> dict[int, Quote]:
+    """
+    Price financing for `payable_ids` from their linked invoices: one
+    read-only statement plus vectorized arithmetic. Keyed by payable ID;
+    payables not in the organization are left out.
+    """
+    if not payable_ids:
+        return {}
+    result = await db.execute(
+        select(
+            Payable.id,
+            cents(Payable.amount),
+            Payable.due_date,
+            cents(Invoice.amount),
+            Invoice.due_date,
+        )
+        .join(Booking, Booking.id == Payable.booking_id)
+        .outerjoin(Invoice, Invoice.booking_id == Booking.id)
+        .where(Payable.id.in_(payable_ids), Booking.organization_id == organization_id)
+    )
+    rows = {row[0]: row for row in result.all()}
+    ordered = [rows[payable_id] for payable_id in dict.fromkeys(payable_ids) if payable_id in rows]
+    quotes = build_quotes(
+        payable_ids=[row[0] for row in ordered],
+        amount_cents=np.array([row[1] for row in ordered], dtype=np.int64),
+        invoice_cents=[row[3] for row in ordered],
+        payable_due=np.array([row[2] for row in ordered], dtype="datetime64[D]"),
+        invoice_due=np.array([row[4] for row in ordered], dtype="datetime64[D]"),
+        as_of=datetime.utcnow().date(),
+    )
+    return {quote.payable_id: quote for quote in quotes}
@@ -0,0 +1,521 @@
+# /app/core/reconciliation.py
+import bisect
+import csv
+import re
+import xml.etree.ElementTree as ET
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from difflib import SequenceMatcher
+from typing import AsyncIterator, Optional, Sequence
+
+from sqlalchemy import Integer, literal, null, select, union_all, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.booking_import import iter_lines
+from app.core.change_version import bump_change_version
+from app.core.financing_lifecycle import transition_requests
+from app.core.forecast import CashFlow, Flow, record_cash_flows
+from app.core.pricing import cents
+from app.db.instrumentation import outside_query_budget
+from app.db.session import record_primary_write
+from app.models.finance import FinancingRequest, FinancingStatus, Invoice, Payable, PaymentStatus
+from app.models.workflow import Booking
+from app.schemas.finance import (
+    FinancingTransition, ReconciliationMethod, ReconciliationTarget, UnmatchedReason,
+)
+
+# Accepted request Content-Types for a bank statement
+CSV_CONTENT_TYPES = {"text/csv", "application/csv"}
+XML_CONTENT_TYPES = {"application/xml", "text/xml"}
+
+# Most lines one statement may have (all are held in memory to match)
+MAX_STATEMENT_LINES = 100_000
+
+# Invoices still waiting to be collected
+OPEN_STATUSES = (PaymentStatus.PENDING, PaymentStatus.OVERDUE)
+
+# An amount matches within max(AMOUNT_TOLERANCE_BPS of it,
+# AMOUNT_TOLERANCE_MIN_CENTS): bank charges and FX rounding shave a little
+# off incoming payments
+AMOUNT_TOLERANCE_BPS = 100
+AMOUNT_TOLERANCE_MIN_CENTS = 100
+# Fuzzy references: the similarity needed (0..1), and the most open items
+# (nearest in amount) compared per line
+FUZZY_MIN_SIMILARITY = 0.85
+FUZZY_MAX_CANDIDATES = 50
+# Shorter reference tokens ("1", "EU") would match too much
+MIN_REFERENCE_LENGTH = 3
+
+# Matches applied per transaction (bounds lock time, like the imports)
+APPLY_CHUNK_SIZE = 1000
+
+
+class UnsupportedStatementFormat(ValueError):
+    pass
+
+
+def statement_format(content_type: str | None) -> str:
+    """Map a request Content-Type to 'csv' or 'xml'."""
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in CSV_CONTENT_TYPES:
+        return "csv"
+    if media_type in XML_CONTENT_TYPES:
+        return "xml"
+    raise UnsupportedStatementFormat(
+        "Use Content-Type text/csv or application/xml for bank statements"
+    )
+
+
+@dataclass(frozen=True)
+class StatementLine:
+    """One bank statement line: credits positive, debits negative."""
+    line: int
+    amount_cents: int
+    reference: str
+    booked_on: Optional[date] = None
+
+
+def _amount_cents(value: str) -> int:
+    amount = Decimal(value.strip())
+    if not amount.is_finite():
+        raise InvalidOperation
+    return int((amount * 100).to_integral_value())
+
+
+def _parse_date(value: Optional[str]) -> Optional[date]:
+    if not value or not value.strip():
+        return None
+    return date.fromisoformat(value.strip()[:10])
+
+
+async def _iter_csv_lines(
+    chunks: AsyncIterator[bytes], encoding: str
+) -> AsyncIterator[tuple[int, StatementLine | str]]:
+    """CSV with a header row: amount and reference, optionally date (YYYY-MM-DD)."""
+    header = None
+    line_number = 0
+    async for text in iter_lines(chunks, encoding):
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip().lower() for name in values]
+            continue
+        line_number += 1
+        if len(values) != len(header):
+            yield line_number, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        row = dict(zip(header, values))
+        try:
+            amount_cents = _amount_cents(row.get("amount", ""))
+        except (InvalidOperation, ValueError):
+            yield line_number, f"Invalid amount: {row.get('amount')!r}"
+            continue
+        try:
+            booked_on = _parse_date(row.get("date"))
+        except ValueError:
+            yield line_number, f"Invalid date: {row.get('date')!r}"
+            continue
+        yield line_number, StatementLine(line_number, amount_cents, (row.get("reference") or "").strip(), booked_on)
+
+
+def _local(tag: str) -> str:
+    """An element's tag without its namespace."""
+    return tag.rsplit("}", 1)[-1]
+
+
+# Where CAMT entries carry the payer's reference
+_XML_REFERENCE_TAGS = {"Ustrd", "Ref", "EndToEndId"}
+
+
+def _xml_entry(entry: ET.Element, line_number: int) -> StatementLine | str:
+    amount = indicator = booked_on = None
+    references = []
+    for element in entry.iter():
+        tag, text = _local(element.tag), (element.text or "").strip()
+        if tag == "Amt" and amount is None:
+            amount = text
+        elif tag == "CdtDbtInd" and indicator is None:
+            indicator = text
+        elif tag == "Dt" and booked_on is None:
+            booked_on = text
+        elif tag in _XML_REFERENCE_TAGS and text and text != "NOTPROVIDED":
+            references.append(text)
+    try:
+        amount_cents = _amount_cents(amount or "")
+    except (InvalidOperation, ValueError):
+        return f"Invalid amount: {amount!r}"
+    try:
+        booked_on = _parse_date(booked_on)
+    except ValueError:
+        return f"Invalid date: {booked_on!r}"
+    if indicator == "DBIT":
+        amount_cents = -abs(amount_cents)
+    return StatementLine(line_number, amount_cents, " ".join(references), booked_on)
+
+
+async def _iter_xml_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, StatementLine | str]]:
+    """
+    A CAMT.053-style document: one line per <Ntry> with <Amt>,
+    <CdtDbtInd> (CRDT or DBIT), <BookgDt><Dt> and remittance information
+    (<Ustrd>, <Ref>, <EndToEndId>). Namespaces are ignored. Parsed
+    incrementally; each entry is dropped once read.
+    """
+    parser = ET.XMLPullParser(events=("end",))
+    line_number = 0
+    async for chunk in chunks:
+        parser.feed(chunk)
+        for _, element in parser.read_events():
+            if _local(element.tag) == "Ntry":
+                line_number += 1
+                yield line_number, _xml_entry(element, line_number)
+                element.clear()
+    parser.close()
+
+
+def iter_statement_lines(
+    chunks: AsyncIterator[bytes], fmt: str, encoding: str = "utf-8"
+) -> AsyncIterator[tuple[int, StatementLine | str]]:
+    """
+    Yield (line_number, line) for each statement line, numbered from 1; the
+    line is an error message if it couldn't be parsed. A CSV is read as
+    `encoding` (XML declares its own) and raises UnicodeDecodeError if it
+    isn't; malformed XML raises ET.ParseError.
+    """
+    return _iter_csv_lines(chunks, encoding) if fmt == "csv" else _iter_xml_lines(chunks)
+
+
+_NOT_ALPHANUMERIC = re.compile(r"[^0-9A-Z]")
+_NOT_DIGIT = re.compile(r"[^0-9]")
+_TOKEN_SEPARATORS = re.compile(r"[\s,;]+")
+
+
+def normalize_reference(value: str) -> str:
+    """Upper case letters and digits only: "bkg-2024/001" -> "BKG2024001"."""
+    return _NOT_ALPHANUMERIC.sub("", value.upper())
+
+
+def reference_keys(reference: str) -> list[str]:
+    """The whole normalized reference and each whitespace/comma separated token of it."""
+    keys = [normalize_reference(reference)]
+    keys += [normalize_reference(token) for token in _TOKEN_SEPARATORS.split(reference)]
+    return [key for key in dict.fromkeys(keys) if len(key) >= MIN_REFERENCE_LENGTH]
+
+
+# Letters commonly typed or scanned in place of digits
+_DIGIT_LOOKALIKES = str.maketrans("OIL", "011")
+
+
+def _digits(reference: str) -> str:
+    return _NOT_DIGIT.sub("", reference.translate(_DIGIT_LOOKALIKES))
+
+
+def _mentions(text: str, tokens: list[str], reference: str) -> bool:
+    """
+    Whether normalized `text` (with its `tokens`) mentions `reference`:
+    as a whole token, or inside the text with no digits running on past
+    it, so BKG001 isn't found in "BKG0012" or "Payment BKG0010".
+    """
+    if reference in tokens:
+        return True
+    start = text.find(reference)
+    while start >= 0:
+        end = start + len(reference)
+        # The digits found must be the reference's own, not a prefix or
+        # suffix of a longer number
+        digits_before = start > 0 and reference[0].isdigit() and text[start - 1].isdigit()
+        digits_after = end < len(text) and reference[-1].isdigit() and text[end].isdigit()
+        if not digits_before and not digits_after:
+            return True
+        start = text.find(reference, start + 1)
+    return False
+
+
+def tolerance_cents(amount_cents: int) -> int:
+    return max(abs(amount_cents) * AMOUNT_TOLERANCE_BPS // 10_000, AMOUNT_TOLERANCE_MIN_CENTS)
+
+
+@dataclass(frozen=True)
+class Candidate:
+    """An open item a payment can settle."""
+    target: ReconciliationTarget
+    id: int
+    reference: str  # normalized booking reference
+    amount_cents: int
+    version: Optional[int] = None  # financing requests only
+
+
+def candidates_query(organization_id: int, financing: bool = True):
+    """
+    Everything a statement can settle for the organization, in one
+    statement: open invoices (amount due) and, if `financing`, funded
+    financing requests (total repayment), each under its booking's
+    reference.
+    """
+    invoices = (
+        select(
+            literal(ReconciliationTarget.INVOICE.value).label("target"),
+            Invoice.id.label("id"),
+            Booking.reference_number.label("reference"),
+            cents(Invoice.amount).label("amount_cents"),
+            null().cast(Integer).label("version"),
+        )
+        .join(Booking, Booking.id == Invoice.booking_id)
+        .where(Booking.organization_id == organization_id, Invoice.status.in_(OPEN_STATUSES))
+    )
+    financing_requests = (
+        select(
+            literal(ReconciliationTarget.FINANCING_REQUEST.value),
+            FinancingRequest.id,
+            Booking.reference_number,
+            cents(FinancingRequest.total_repayment),
+            FinancingRequest.version,
+        )
+        .join(Payable, Payable.id == FinancingRequest.payable_id)
+        .join(Booking, Booking.id == Payable.booking_id)
+        .where(Booking.organization_id == organization_id, FinancingRequest.status == FinancingStatus.FUNDED)
+    )
+    return union_all(invoices, financing_requests) if financing else invoices
+
+
+class CandidateIndex:
+    """
+    In-memory indexes over the open items: hash maps by (reference,
+    amount), by reference and by the digits in the reference, and a
+    sorted amount list for nearest-amount lookups.
+    """
+
+    def __init__(self, candidates: Sequence[Candidate]):
+        self.exact: dict[tuple[str, int], list[Candidate]] = {}
+        self.by_reference: dict[str, list[Candidate]] = {}
+        self.by_digits: dict[str, list[Candidate]] = {}
+        for candidate in candidates:
+            self.exact.setdefault((candidate.reference, candidate.amount_cents), []).append(candidate)
+            self.by_reference.setdefault(candidate.reference, []).append(candidate)
+            digits = _digits(candidate.reference)
+            if digits:
+                self.by_digits.setdefault(digits, []).append(candidate)
+        self.by_amount = sorted(candidates, key=lambda candidate: candidate.amount_cents)
+        self.amounts = [candidate.amount_cents for candidate in self.by_amount]
+
+    def nearest(self, amount_cents: int, tolerance: int, limit: int) -> list[Candidate]:
+        """Up to `limit` items within `tolerance` of the amount, closest first."""
+        low = high = bisect.bisect_left(self.amounts, amount_cents)
+        found = []
+        while len(found) < limit:
+            below = amount_cents - self.amounts[low - 1] if low > 0 else None
+            above = self.amounts[high] - amount_cents if high < len(self.amounts) else None
+            if below is not None and below <= tolerance and (above is None or above > tolerance or below < above):
+                low -= 1
+                found.append(self.by_amount[low])
+            elif above is not None and above <= tolerance:
+                found.append(self.by_amount[high])
+                high += 1
+            else:
+                break
+        return found
+
+
+async def load_candidates(db: AsyncSession, organization_id: int, financing: bool = True) -> CandidateIndex:
+    result = await db.execute(candidates_query(organization_id, financing))
+    return CandidateIndex([
+        Candidate(ReconciliationTarget(target), item_id, normalize_reference(reference or ""), amount, version)
+        for target, item_id, reference, amount, version in result.all()
+    ])
+
+
+@dataclass(frozen=True)
+class Match:
+    line: StatementLine
+    candidate: Candidate
+    method: ReconciliationMethod
+
+
+# Returned by a pass when several items fit a line equally well
+_AMBIGUOUS = object()
+
+
+def _best(scored: list[tuple[tuple, Candidate]]):
+    """The highest-scoring candidate, _AMBIGUOUS on a tie, None if there are none."""
+    if not scored:
+        return None
+    scored.sort(key=lambda item: item[0], reverse=True)
+    if len(scored) > 1 and scored[0][0] == scored[1][0]:
+        return _AMBIGUOUS
+    return scored[0][1]
+
+
+def _exact(index: CandidateIndex, line: StatementLine, keys: list[str], open_items):
+    found = {
+        candidate
+        for key in keys
+        for candidate in index.exact.get((key, line.amount_cents), ())
+        if open_items(candidate)
+    }
+    return _best([((0,), candidate) for candidate in found])
+
+
+def _reference(index: CandidateIndex, line: StatementLine, keys: list[str], open_items):
+    tolerance = tolerance_cents(line.amount_cents)
+    found = {
+        candidate
+        for key in keys
+        for candidate in index.by_reference.get(key, ())
+        if open_items(candidate) and abs(candidate.amount_cents - line.amount_cents) <= tolerance
+    }
+    return _best([((-abs(candidate.amount_cents - line.amount_cents),), candidate) for candidate in found])
+
+
+def _fuzzy(index: CandidateIndex, line: StatementLine, keys: list[str], open_items):
+    if not keys:
+        return None
+    tolerance = tolerance_cents(line.amount_cents)
+    whole, tokens = keys[0], keys[1:]
+    similarity: dict[Candidate, float] = {}
+    # The reference inside longer text: "Payment for bkg 0001, thanks"
+    for candidate in index.nearest(line.amount_cents, tolerance, FUZZY_MAX_CANDIDATES):
+        if (
+            open_items(candidate)
+            and len(candidate.reference) >= MIN_REFERENCE_LENGTH
+            and _mentions(whole, tokens, candidate.reference)
+        ):
+            # The line also names another item whose reference extends
+            # this one ("BKG-001 / BKG-0012"): can't tell which was paid
+            if any(
+                key != candidate.reference and candidate.reference in key and key in index.by_reference
+                for key in keys
+            ):
+                return _AMBIGUOUS
+            similarity[candidate] = 1.0
+    if not similarity:
+        # A mistyped reference: similar text, but the numbers must agree
+        # (BKG-0001 is not BKG-0002), so only same-digit items are compared
+        for key in keys:
+            for candidate in index.by_digits.get(_digits(key), ()):
+                if not open_items(candidate) or abs(candidate.amount_cents - line.amount_cents) > tolerance:
+                    continue
+                ratio = SequenceMatcher(None, key, candidate.reference).ratio()
+                if ratio >= FUZZY_MIN_SIMILARITY and ratio > similarity.get(candidate, 0.0):
+                    similarity[candidate] = ratio
+    return _best([
+        ((round(ratio, 4), -abs(candidate.amount_cents - line.amount_cents)), candidate)
+        for candidate, ratio in similarity.items()
+    ])
+
+
+# Strictest first: a looser pass only sees lines and items the stricter
+# passes left over, so a fuzzy match can't take an exact match's item
+_PASSES = (
+    (ReconciliationMethod.EXACT, _exact),
+    (ReconciliationMethod.REFERENCE, _reference),
+    (ReconciliationMethod.FUZZY, _fuzzy),
+)
+
+
+def match_lines(
+    lines: Sequence[StatementLine], index: CandidateIndex
+) -> tuple[list[Match], list[tuple[StatementLine, UnmatchedReason]]]:
+    """
+    Match credit lines to open items, each item at most once. Returns the
+    matches and the lines left unmatched, with why.
+    """
+    claimed: set[tuple[ReconciliationTarget, int]] = set()
+
+    def open_items(candidate: Candidate) -> bool:
+        return (candidate.target, candidate.id) not in claimed
+
+    matches: list[Match] = []
+    unmatched: list[tuple[StatementLine, UnmatchedReason]] = []
+    pending = []
+    for line in lines:
+        if line.amount_cents <= 0:
+            unmatched.append((line, UnmatchedReason.DEBIT))
+        else:
+            pending.append((line, reference_keys(line.reference)))
+
+    ambiguous: set[int] = set()
+    for method, find in _PASSES:
+        remaining = []
+        for line, keys in pending:
+            found = find(index, line, keys, open_items)
+            if found is None or found is _AMBIGUOUS:
+                if found is _AMBIGUOUS:
+                    ambiguous.add(line.line)
+                remaining.append((line, keys))
+                continue
+            claimed.add((found.target, found.id))
+            matches.append(Match(line, found, method))
+        pending = remaining
+    unmatched += [
+        (line, UnmatchedReason.AMBIGUOUS if line.line in ambiguous else UnmatchedReason.NO_MATCH)
+        for line, _ in pending
+    ]
+    return matches, unmatched
+
+
+@dataclass
+class ApplyResult:
+    invoices_paid: int = 0
+    financing_repaid: int = 0
+    # Matches whose item was settled or changed since it was loaded
+    conflicts: list[Match] = field(default_factory=list)
+
+
+async def apply_matches(
+    db: AsyncSession, organization_id: int, matches: Sequence[Match], actor_user_id: Optional[int] = None
+) -> ApplyResult:
+    """
+    Mark matched invoices PAID and matched financing requests REPAID, one
+    transaction per APPLY_CHUNK_SIZE matches: one UPDATE for the invoices
+    (still open only) and one lifecycle transition for the requests
+    (guarded by the version they were matched at). Only the first chunk
+    counts towards the route's query budget.
+    """
+    result = ApplyResult()
+    for start in range(0, len(matches), APPLY_CHUNK_SIZE):
+        with outside_query_budget() if start else nullcontext():
+            await _apply_chunk(db, organization_id, matches[start:start + APPLY_CHUNK_SIZE], actor_user_id, result)
+    return result
+
+
+async def _apply_chunk(
+    db: AsyncSession, organization_id: int, chunk: Sequence[Match], actor_user_id: Optional[int], result: ApplyResult
+) -> None:
+    """One transaction's worth of matches, tallied into `result`."""
+    invoices = {m.candidate.id: m for m in chunk if m.candidate.target == ReconciliationTarget.INVOICE}
+    requests = {m.candidate.id: m for m in chunk if m.candidate.target == ReconciliationTarget.FINANCING_REQUEST}
+    cash_flows: list[CashFlow] = []
+    moved = 0
+
+    if invoices:
+        table = Invoice.__table__
+        paid = (await db.execute(
+            update(table)
+            .where(table.c.id.in_(invoices), table.c.status.in_(OPEN_STATUSES))
+            .values(status=PaymentStatus.PAID)
+            .returning(table.c.id, table.c.due_date, cents(table.c.amount))
+        )).all()
+        cash_flows += [CashFlow(Flow.RECEIPTS, due_date.date(), -amount) for _, due_date, amount in paid]
+        paid_ids = {invoice_id for invoice_id, _, _ in paid}
+        result.conflicts += [m for invoice_id, m in invoices.items() if invoice_id not in paid_ids]
+        result.invoices_paid += len(paid)
+        moved += len(paid)
+
+    if requests:
+        repaid = await transition_requests(
+            db, organization_id, FinancingTransition.REPAY,
+            [(request_id, m.candidate.version) for request_id, m in requests.items()],
+            actor_user_id,
+        )
+        cash_flows += repaid.cash_flows
+        result.conflicts += [m for request_id, m in requests.items() if request_id not in repaid.moved]
+        result.financing_repaid += len(repaid.moved)
+        moved += len(repaid.moved)
+
+    version = await bump_change_version(db, organization_id) if moved else None
+    await db.commit()
+    if moved:
+        record_primary_write(organization_id)
+        record_cash_flows(organization_id, version, cash_flows)
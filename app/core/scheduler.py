@@ -0,0 +1,96 @@
+# /app/core/scheduler.py
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Optional
+
+from app.core.metrics import register_metrics_source
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PeriodicJob:
+    """A coroutine function run every `interval_seconds`, plus its run stats."""
+    name: str
+    interval_seconds: float
+    run: Callable[[], Awaitable[Any]]
+    runs: int = 0
+    failures: int = 0
+    last_started_at: Optional[datetime] = None
+    last_duration_ms: Optional[float] = None
+    last_result: Any = None
+    last_error: Optional[str] = None
+    _task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    def stats(self) -> dict:
+        return {
+            "interval_seconds": self.interval_seconds,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_started_at": self.last_started_at.isoformat() if self.last_started_at else None,
+            "last_duration_ms": self.last_duration_ms,
+            "last_result": self.last_result,
+            "last_error": self.last_error,
+        }
+
+
+class Scheduler:
+    """
+    Runs background jobs inside the API process, started and stopped by
+    the FastAPI lifespan. Every worker runs every job, so jobs that must
+    not overlap across workers take a Postgres advisory lock themselves.
+    """
+
+    def __init__(self):
+        self.jobs: dict[str, PeriodicJob] = {}
+
+    def add_job(self, name: str, interval_seconds: float, run: Callable[[], Awaitable[Any]]) -> None:
+        if name in self.jobs:
+            raise ValueError(f"Job {name!r} is already scheduled")
+        self.jobs[name] = PeriodicJob(name, interval_seconds, run)
+
+    async def run_job(self, job: PeriodicJob) -> Any:
+        """Run a job once now, recording its outcome (errors are logged, not raised)."""
+        job.last_started_at = datetime.utcnow()
+        started = time.perf_counter()
+        try:
+            job.last_result = await job.run()
+            job.last_error = None
+        except Exception as exc:
+            job.failures += 1
+            job.last_error = repr(exc)
+            logger.exception("Scheduled job %s failed", job.name)
+        finally:
+            job.runs += 1
+            job.last_duration_ms = round((time.perf_counter() - started) * 1000, 2)
+        return job.last_result
+
+    async def _loop(self, job: PeriodicJob) -> None:
+        # Spread the first run so workers started together don't run in lockstep
+        await asyncio.sleep(random.uniform(0, job.interval_seconds))
+        while True:
+            await self.run_job(job)
+            await asyncio.sleep(job.interval_seconds)
+
+    def start(self) -> None:
+        for job in self.jobs.values():
+            if job._task is None:
+                job._task = asyncio.create_task(self._loop(job), name=f"job:{job.name}")
+
+    async def stop(self) -> None:
+        tasks = [job._task for job in self.jobs.values() if job._task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.jobs.clear()
+
+    def stats(self) -> dict:
+        return {name: job.stats() for name, job in self.jobs.items()}
+
+
+scheduler = Scheduler()
+register_metrics_source("scheduler", scheduler.stats)
@@ -0,0 +1,129 @@
+# /app/core/tenant.py
+from dataclasses import dataclass
+from typing import Optional
+from fastapi import Depends, HTTPException, status
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+
+from app.db.session import get_db
+from app.models.client import Client
+from app.models.organization import Organization
+from app.core.auth_service import get_current_organization
+from app.core.cache import TTLCache
+from app.core.metrics import register_metrics_source
+
+# Organizations and their client lists change rarely, so a short TTL keeps
+# write paths free of tenant lookups without serving stale data for long.
+ORG_CACHE_TTL_SECONDS = 30
+ORG_CACHE_MAX_SIZE = 5_000
+
+
+@dataclass(frozen=True)
+class TenantContext:
+    """
+    The current request's organization, resolved once per request.
+    Services only need `id`; `client_ids` lets routes check that a
+    client belongs to the tenant without a query.
+    """
+    id: int
+    name: str
+    client_ids: frozenset[int]
+
+
+org_cache: TTLCache[int, TenantContext] = TTLCache(
+    max_size=ORG_CACHE_MAX_SIZE, ttl_seconds=ORG_CACHE_TTL_SECONDS
+)
+register_metrics_source("org_cache", org_cache.stats)
+
+
+async def load_tenant_context(db: AsyncSession, organization_id: int) -> Optional[TenantContext]:
+    """Load an organization and its client IDs in a single query and cache it."""
+    result = await db.execute(
+        select(Organization.id, Organization.name, Client.id)
+        .outerjoin(Client, Client.organization_id == Organization.id)
+        .where(Organization.id == organization_id)
+    )
+    rows = result.all()
+    if not rows:
+        return None
+    tenant = TenantContext(
+        id=rows[0][0],
+        name=rows[0][1],
+        client_ids=frozenset(client_id for _, _, client_id in rows if client_id is not None),
+    )
+    org_cache.set(organization_id, tenant)
+    return tenant
+
+
+async def get_tenant_context(
+    organization_id: int = Depends(get_current_organization),
+    db: AsyncSession = Depends(get_db)
+) -> TenantContext:
+    """
+    FastAPI dependency resolving the request's organization from the
+    short-TTL org cache, falling back to the DB on a miss.
+    """
+    tenant = org_cache.get(organization_id)
+    if tenant is None:
+        tenant = await load_tenant_context(db, organization_id)
+        if tenant is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Organization not found")
+    return tenant
+
+
+async def client_belongs_to_tenant(db: AsyncSession, tenant: TenantContext, client_id: int) -> bool:
+    """
+    Check a client against the tenant's cached client IDs. On a miss the
+    cache may simply predate the client, so reload once before rejecting.
+    """
+    if client_id in tenant.client_ids:
+        return True
+    fresh = await load_tenant_context(db, tenant.id)
+    return fresh is not None and client_id in fresh.client_ids
+
+
+# --- Org cache invalidation ---
+# Client and Organization writes invalidate the affected tenant at flush
+# time and again after commit (same pattern as the principal cache).
+
+_PENDING_ORG_INVALIDATIONS = "pending_org_invalidations"
+
+
+def _queue_org_invalidation(target, organization_ids: set[int]) -> None:
+    organization_ids.discard(None)
+    for organization_id in organization_ids:
+        org_cache.invalidate(organization_id)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_PENDING_ORG_INVALIDATIONS, set()).update(organization_ids)
+
+
+@event.listens_for(Client, "after_insert")
+@event.listens_for(Client, "after_delete")
+def _client_added_or_removed(mapper, connection, target: Client) -> None:
+    _queue_org_invalidation(target, {target.organization_id})
+
+
+@event.listens_for(Client, "after_update")
+def _client_updated(mapper, connection, target: Client) -> None:
+    history = inspect(target).attrs.organization_id.history
+    if history.has_changes():
+        _queue_org_invalidation(target, {target.organization_id, *history.deleted})
+
+
+@event.listens_for(Organization, "after_update")
+@event.listens_for(Organization, "after_delete")
+def _organization_changed(mapper, connection, target: Organization) -> None:
+    _queue_org_invalidation(target, {target.id})
+
+
+@event.listens_for(Session, "after_commit")
+def _flush_org_invalidations(session: Session) -> None:
+    for organization_id in session.info.pop(_PENDING_ORG_INVALIDATIONS, ()):
+        org_cache.invalidate(organization_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_org_invalidations(session: Session) -> None:
+    session.info.pop(_PENDING_ORG_INVALIDATIONS, None)
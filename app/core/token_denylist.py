@@ -0,0 +1,109 @@
+# /app/core/token_denylist.py
+import asyncio
+import math
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.auth import RevokedToken
+from app.models.organization import User
+
+
+def to_epoch(value: datetime) -> float:
+    """Convert a naive UTC datetime (how we store them) to a Unix timestamp."""
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+class TokenDenylist:
+    """
+    Compact in-memory view of revoked access tokens.
+
+    Holds revoked token IDs (jti) until they expire, plus a per-user cutoff:
+    tokens issued at or before the cutoff are rejected. Deactivated users get
+    an infinite cutoff. The view is reloaded from the database every
+    `refresh_interval_seconds`; changes made by this worker are applied
+    locally straight away.
+    """
+
+    def __init__(self, refresh_interval_seconds: float, max_token_age: timedelta):
+        self.refresh_interval_seconds = refresh_interval_seconds
+        self.max_token_age = max_token_age
+        self._revoked_jtis: dict[str, float] = {}
+        self._user_cutoffs: dict[int, float] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self.refreshes = 0
+
+    def is_revoked(self, jti: Optional[str], user_id: Optional[int], issued_at: Optional[float]) -> bool:
+        if jti is not None and jti in self._revoked_jtis:
+            return True
+        if user_id is not None:
+            cutoff = self._user_cutoffs.get(user_id)
+            if cutoff is not None and (issued_at is None or issued_at <= cutoff):
+                return True
+        return False
+
+    def revoke_token(self, jti: str, expires_at: datetime) -> None:
+        self._revoked_jtis[jti] = to_epoch(expires_at)
+
+    def revoke_user_tokens(self, user_id: int, cutoff: float) -> None:
+        # The latest change wins: reactivating a user replaces the infinite
+        # cutoff with the reactivation time
+        self._user_cutoffs[user_id] = cutoff
+
+    def is_stale(self) -> bool:
+        return (
+            self._loaded_at is None
+            or time.monotonic() - self._loaded_at >= self.refresh_interval_seconds
+        )
+
+    async def ensure_fresh(self, db: AsyncSession) -> None:
+        """
+        Reload if the view is older than the refresh interval.
+        Only one request reloads; the others keep using the current view
+        unless nothing has been loaded yet.
+        """
+        if not self.is_stale():
+            return
+        if self._lock.locked() and self._loaded_at is not None:
+            return
+        async with self._lock:
+            if self.is_stale():
+                await self.refresh(db)
+
+    async def refresh(self, db: AsyncSession) -> None:
+        now = datetime.utcnow()
+        jti_rows = await db.execute(
+            select(RevokedToken.jti, RevokedToken.expires_at)
+            .where(RevokedToken.expires_at > now)
+        )
+        user_rows = await db.execute(
+            select(User.id, User.is_active, User.tokens_valid_after).where(
+                or_(
+                    User.is_active.is_(False),
+                    User.tokens_valid_after > now - self.max_token_age,
+                )
+            )
+        )
+        revoked_jtis = {jti: to_epoch(expires_at) for jti, expires_at in jti_rows}
+        user_cutoffs = {}
+        for user_id, is_active, valid_after in user_rows:
+            if not is_active:
+                user_cutoffs[user_id] = math.inf
+            elif valid_after is not None:
+                user_cutoffs[user_id] = to_epoch(valid_after)
+        self._revoked_jtis = revoked_jtis
+        self._user_cutoffs = user_cutoffs
+        self._loaded_at = time.monotonic()
+        self.refreshes += 1
+
+    def stats(self) -> dict:
+        return {
+            "revoked_tokens": len(self._revoked_jtis),
+            "revoked_users": len(self._user_cutoffs),
+            "refreshes": self.refreshes,
+            "refresh_interval_seconds": self.refresh_interval_seconds,
+        }
@@ -0,0 +1,319 @@
+# /app/core/underwriting.py
+import enum
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Sequence
+
+import numpy as np
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.overdue import overdue_cutoff
+from app.models.exposure import ClientExposure, OrganizationExposure
+from app.models.finance import Invoice, Payable, PaymentStatus
+from app.models.workflow import Booking
+
+# Limits used by the default rules
+MAX_SINGLE_PAYABLE = 1_000_000.0
+ORG_EXPOSURE_CAP = 5_000_000.0
+# Largest share of the organization's cap one client may use
+MAX_CLIENT_SHARE_OF_CAP = 0.25
+MAX_CLIENT_OVERDUE_INVOICES = 2
+
+
+class Decision(enum.IntEnum):
+    # Ordered by severity: a candidate gets the worst outcome of its failed rules
+    APPROVE = 0
+    REVIEW = 1
+    DECLINE = 2
+
+
+# Feature columns, in matrix order
+FEATURES = (
+    "amount",
+    "invoice_coverage",         # invoice amount / payable amount (0 without an invoice)
+    "days_to_due",
+    "client_overdue_invoices",
+    "client_share_of_cap",      # client exposure after this financing / ORG_EXPOSURE_CAP
+    "org_exposure_after",
+)
+_FEATURE_INDEX = {name: i for i, name in enumerate(FEATURES)}
+# Features that depend on which other candidates in the batch get created
+EXPOSURE_FEATURES = ("client_share_of_cap", "org_exposure_after")
+
+
+@dataclass(frozen=True)
+class Rule:
+    """A candidate passes when `feature <op> threshold` holds."""
+    name: str
+    feature: str
+    op: str  # one of _OPERATORS
+    threshold: float
+    on_fail: Decision
+    reason: str
+
+
+DEFAULT_RULES = (
+    Rule("max_amount", "amount", "<=", MAX_SINGLE_PAYABLE, Decision.DECLINE,
+         "Payable exceeds the single-payable limit"),
+    Rule("positive_amount", "amount", ">", 0.0, Decision.DECLINE,
+         "Payable amount must be positive"),
+    Rule("invoice_covers_payable", "invoice_coverage", ">=", 1.0, Decision.REVIEW,
+         "Client invoice does not cover the payable"),
+    Rule("not_past_due", "days_to_due", ">=", 0.0, Decision.REVIEW,
+         "Payable is already past due"),
+    Rule("client_overdue_history", "client_overdue_invoices", "<=", MAX_CLIENT_OVERDUE_INVOICES,
+         Decision.DECLINE, "Client has too many overdue invoices"),
+    Rule("client_concentration", "client_share_of_cap", "<=", MAX_CLIENT_SHARE_OF_CAP,
+         Decision.REVIEW, "Client would exceed its share of the exposure cap"),
+    Rule("org_exposure_cap", "org_exposure_after", "<=", ORG_EXPOSURE_CAP, Decision.DECLINE,
+         "Organization exposure cap reached"),
+)
+
+_OPERATORS = {
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "==": np.equal,
+}
+
+
+@dataclass(frozen=True)
+class UnderwritingDecision:
+    payable_id: int
+    decision: Decision
+    reasons: tuple[str, ...]
+
+
+class RuleEngine:
+    """
+    A rule set compiled once into arrays: rules sharing an operator are
+    checked together as one NumPy comparison over an (n, k) slice of the
+    feature matrix, so evaluating a batch costs a handful of array ops
+    whatever its size.
+    """
+
+    def __init__(self, rules: Sequence[Rule] = DEFAULT_RULES):
+        for rule in rules:
+            if rule.feature not in _FEATURE_INDEX:
+                raise ValueError(f"Rule {rule.name!r} uses unknown feature {rule.feature!r}")
+            if rule.op not in _OPERATORS:
+                raise ValueError(f"Rule {rule.name!r} uses unknown operator {rule.op!r}")
+        self.rules = tuple(rules)
+        self._reasons = np.array([rule.reason for rule in self.rules], dtype=object)
+        self._on_fail = np.array([rule.on_fail for rule in self.rules], dtype=np.int8)
+        self._on_fail_without_exposure = np.where(
+            [rule.feature in EXPOSURE_FEATURES for rule in self.rules], np.int8(Decision.APPROVE), self._on_fail
+        ).astype(np.int8)
+        # One bit per rule: rows failing the same rules share one reasons tuple
+        self._bits = np.left_shift(1, np.arange(len(self.rules), dtype=np.int64))
+        # op -> (rule positions, feature columns, thresholds)
+        self._groups = []
+        for op, ufunc in _OPERATORS.items():
+            positions = [i for i, rule in enumerate(self.rules) if rule.op == op]
+            if positions:
+                self._groups.append((
+                    ufunc,
+                    np.array(positions),
+                    np.array([_FEATURE_INDEX[self.rules[i].feature] for i in positions]),
+                    np.array([self.rules[i].threshold for i in positions], dtype=np.float64),
+                ))
+
+    def evaluate(self, features: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Evaluate an (n, len(FEATURES)) matrix. Returns each row's Decision
+        (int8) and an (n, rules) boolean matrix of failed rules.
+        """
+        failed = np.zeros((features.shape[0], len(self.rules)), dtype=bool)
+        for ufunc, positions, columns, thresholds in self._groups:
+            # NaN features fail every comparison, i.e. missing data fails the rule
+            failed[:, positions] = ~ufunc(features[:, columns], thresholds)
+        decisions = np.where(failed, self._on_fail, np.int8(Decision.APPROVE)).max(axis=1, initial=0)
+        return decisions.astype(np.int8), failed
+
+    def creatable(self, features: np.ndarray) -> np.ndarray:
+        """
+        Which rows no rule outside EXPOSURE_FEATURES declines, i.e. would be
+        created (APPROVED or PENDING) if the exposure limits allowed it.
+        Exposure columns are ignored and may hold anything.
+        """
+        _, failed = self.evaluate(features)
+        decisions = np.where(failed, self._on_fail_without_exposure, np.int8(Decision.APPROVE)).max(axis=1, initial=0)
+        return decisions < Decision.DECLINE
+
+    def decide(self, payable_ids: Sequence[int], features: np.ndarray) -> list[UnderwritingDecision]:
+        decisions, failed = self.evaluate(features)
+        masks = failed.astype(np.int64) @ self._bits
+        unique_masks, mask_index = np.unique(masks, return_inverse=True)
+        reason_sets = [tuple(self._reasons[(mask & self._bits) != 0]) for mask in unique_masks]
+        outcomes = tuple(Decision)
+        return [
+            UnderwritingDecision(payable_id, outcomes[decision], reason_sets[index])
+            for payable_id, decision, index in zip(payable_ids, decisions.tolist(), mask_index.tolist())
+        ]
+
+
+underwriter = RuleEngine(DEFAULT_RULES)
+
+
+def _sum_before(values: np.ndarray) -> np.ndarray:
+    """Each element's sum of the elements before it (exclusive cumulative sum)."""
+    before = np.zeros_like(values)
+    np.cumsum(values[:-1], out=before[1:])
+    return before
+
+
+def _created_within_cap(amounts: np.ndarray, creatable: np.ndarray, org_exposure: float) -> np.ndarray:
+    """
+    Which creatable candidates fit under ORG_EXPOSURE_CAP, in batch order:
+    one that doesn't fit is declined and adds nothing, so a smaller one
+    after it may still fit. Vectorized up to the first that doesn't fit;
+    past it only candidates small enough for the headroom left are walked.
+    """
+    before = _sum_before(np.where(creatable, amounts, 0.0))
+    over = creatable & (org_exposure + (before + amounts) > ORG_EXPOSURE_CAP)
+    if not over.any():
+        return creatable
+    first = int(np.argmax(over))
+    created = creatable.copy()
+    created[first:] = False
+    total = before[first]
+    # A cent of slack for float rounding: the loop makes the exact check
+    headroom = ORG_EXPOSURE_CAP - org_exposure - total + 0.01
+    tail = np.flatnonzero(creatable[first + 1:] & (amounts[first + 1:] <= headroom)) + first + 1
+    for i in tail.tolist():
+        if org_exposure + (total + amounts[i]) <= ORG_EXPOSURE_CAP:
+            created[i] = True
+            total += amounts[i]
+    return created
+
+
+def build_features(
+    amounts: np.ndarray,
+    invoice_amounts: np.ndarray,
+    days_to_due: np.ndarray,
+    client_ids: np.ndarray,
+    client_exposure: np.ndarray,
+    client_overdue: np.ndarray,
+    org_exposure: float,
+    engine: RuleEngine = underwriter,
+) -> np.ndarray:
+    """
+    Assemble the feature matrix for a batch, in the order given.
+    Earlier candidates in the batch count towards the exposure of later
+    ones, so a batch can't jointly blow through a limit, but only those
+    that will be created: `engine`'s other rules are evaluated first, and
+    a candidate declined by them or by the organization cap adds nothing.
+    """
+    n = len(amounts)
+    features = np.zeros((n, len(FEATURES)), dtype=np.float64)
+    features[:, 0] = amounts
+    with np.errstate(divide="ignore", invalid="ignore"):
+        features[:, 1] = np.where(amounts > 0, np.nan_to_num(invoice_amounts) / amounts, 0.0)
+    features[:, 2] = days_to_due
+    features[:, 3] = client_overdue
+
+    created = _created_within_cap(amounts, engine.creatable(features), org_exposure)
+    counted = np.where(created, amounts, 0.0)
+    features[:, 5] = org_exposure + (_sum_before(counted) + amounts)
+
+    # Running total per client, in batch order: a stable sort groups each
+    # client's candidates, and subtracting the cumulative sum reached
+    # before each group leaves a per-group cumulative sum
+    order = np.argsort(client_ids, kind="stable")
+    sorted_counted = counted[order]
+    running = np.cumsum(sorted_counted)
+    sorted_clients = client_ids[order]
+    starts = np.flatnonzero(np.r_[True, sorted_clients[1:] != sorted_clients[:-1]]) if n else np.array([], dtype=int)
+    lengths = np.diff(np.r_[starts, n])
+    before_group = np.repeat(running[starts] - sorted_counted[starts], lengths)
+    client_before = np.empty(n, dtype=np.float64)
+    client_before[order] = running - sorted_counted - before_group
+    features[:, 4] = (client_exposure + client_before + amounts) / ORG_EXPOSURE_CAP
+    return features
+
+
+async def load_features(
+    db: AsyncSession, organization_id: int, payable_ids: Sequence[int], engine: RuleEngine = underwriter
+) -> tuple[list[int], np.ndarray]:
+    """
+    Prefetch everything the rules need for `payable_ids` in one statement.
+    Returns the IDs found (in request order) and their feature matrix.
+    """
+    now = datetime.utcnow()
+    candidate_clients = (
+        select(Booking.client_id)
+        .join(Payable, Payable.booking_id == Booking.id)
+        .where(Payable.id.in_(payable_ids))
+    )
+    client_overdue = (
+        select(Invoice.client_id, func.count().label("overdue"))
+        .join(Booking, Booking.id == Invoice.booking_id)
+        .where(
+            Booking.organization_id == organization_id,
+            Invoice.client_id.in_(candidate_clients),
+            or_(
+                Invoice.status == PaymentStatus.OVERDUE,
+                # Not swept yet; due today is still current, as in the sweep
+                and_(Invoice.status == PaymentStatus.PENDING, Invoice.due_date < overdue_cutoff(now)),
+            ),
+        )
+        .group_by(Invoice.client_id)
+        .cte("client_overdue")
+    )
+    # Current exposure comes from the incrementally maintained ledger rows
+    client_exposure = ClientExposure.approved_amount + ClientExposure.funded_amount
+    org_exposure = (
+        select(OrganizationExposure.approved_amount + OrganizationExposure.funded_amount)
+        .where(OrganizationExposure.organization_id == organization_id)
+        .scalar_subquery()
+    )
+
+    result = await db.execute(
+        select(
+            Payable.id,
+            Payable.amount,
+            Payable.due_date,
+            Invoice.amount,
+            Booking.client_id,
+            func.coalesce(client_exposure, 0),
+            func.coalesce(client_overdue.c.overdue, 0),
+            func.coalesce(org_exposure, 0),
+        )
+        .join(Booking, Booking.id == Payable.booking_id)
+        .outerjoin(Invoice, Invoice.booking_id == Booking.id)
+        .outerjoin(ClientExposure, ClientExposure.client_id == Booking.client_id)
+        .outerjoin(client_overdue, client_overdue.c.client_id == Booking.client_id)
+        .where(Payable.id.in_(payable_ids), Booking.organization_id == organization_id)
+    )
+    rows = {row[0]: row for row in result.all()}
+    found = [payable_id for payable_id in dict.fromkeys(payable_ids) if payable_id in rows]
+    if not found:
+        return [], np.empty((0, len(FEATURES)))
+
+    ordered = [rows[payable_id] for payable_id in found]
+
+    def column(i: int, dtype=np.float64) -> np.ndarray:
+        return np.array([row[i] for row in ordered], dtype=dtype)
+
+    due_dates = np.array([row[2] for row in ordered], dtype="datetime64[D]")
+    features = build_features(
+        engine=engine,
+        amounts=column(1),
+        invoice_amounts=np.array([np.nan if row[3] is None else row[3] for row in ordered]),
+        days_to_due=(due_dates - np.datetime64(now.date(), "D")).astype(np.float64),
+        client_ids=column(4, np.int64),
+        client_exposure=column(5),
+        client_overdue=column(6),
+        org_exposure=float(ordered[0][7]),  # Numeric -> float is fine for limit checks
+    )
+    return found, features
+
+
+async def underwrite(
+    db: AsyncSession, organization_id: int, payable_ids: Sequence[int], engine: RuleEngine = underwriter
+) -> dict[int, UnderwritingDecision]:
+    """Underwrite payables (one query plus vectorized rules); keyed by payable ID."""
+    found, features = await load_features(db, organization_id, payable_ids, engine)
+    return {d.payable_id: d for d in engine.decide(found, features)}
@@ -0,0 +1,188 @@
+# /app/db/instrumentation.py
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger("app.sql")
+
+# Longest statement text kept for the "slowest statement" log field
+_STATEMENT_PREVIEW_CHARS = 200
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A route ran more SQL statements than its declared budget."""
+
+
+@dataclass
+class RequestQueryStats:
+    """SQL statements attributed to one HTTP request."""
+    count: int = 0
+    total_ms: float = 0.0
+    slowest_ms: float = 0.0
+    slowest_statement: Optional[str] = None
+    budget: Optional[int] = None
+
+    def record(self, statement: str, elapsed_ms: float) -> None:
+        self.count += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms >= self.slowest_ms:
+            self.slowest_ms = elapsed_ms
+            self.slowest_statement = statement
+
+    @property
+    def over_budget(self) -> bool:
+        return self.budget is not None and self.count > self.budget
+
+
+_request_stats: ContextVar[Optional[RequestQueryStats]] = ContextVar(
+    "request_query_stats", default=None
+)
+
+
+def current_query_stats() -> Optional[RequestQueryStats]:
+    return _request_stats.get()
+
+
+# Listening on the Engine class covers the primary, the replica and scripts.
+# SQLAlchemy runs these hooks inside the calling task's context, so the
+# contextvar set by the middleware is visible here.
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_started_at = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _request_stats.get()
+    started = getattr(context, "_query_started_at", None)
+    if stats is None or started is None:
+        return
+    stats.record(statement, (time.perf_counter() - started) * 1000)
+
+
+def query_budget(max_queries: int):
+    """
+    Route dependency declaring how many SQL statements a request may run,
+    e.g. `dependencies=[Depends(query_budget(3))]`. Over-budget requests
+    are logged, or fail outright when SQL_QUERY_BUDGET_ENFORCE is on
+    (use that in tests to catch N+1 regressions).
+    
+    Budgets include the worst case for cold caches: a token denylist
+    refresh (2 statements) and a tenant context load (1). An
+    Idempotency-Key adds 3 (claim, marking it committed in the write's
+    transaction, and storing the response).
+    """
+    async def _declare_budget() -> None:
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.budget = max_queries
+    return _declare_budget
+
+
+@contextmanager
+def outside_query_budget():
+    """
+    Statements run in this block are still counted and timed, but don't
+    count against the route's budget. For work whose statement count is
+    legitimately unbounded, like polling while another worker finishes.
+    """
+    stats = _request_stats.get()
+    before = stats.count if stats is not None else 0
+    try:
+        yield
+    finally:
+        if stats is not None and stats.budget is not None:
+            stats.budget += stats.count - before
+
+
+class QueryStatsMiddleware:
+    """
+    Attributes query count, total DB time and the slowest statement to
+    each request. Reported as X-DB-Query-Count / X-DB-Time-Ms response
+    headers and one structured log line per request.
+    """
+
+    def __init__(self, app: ASGIApp, enforce_budgets: bool = False):
+        self.app = app
+        self.enforce_budgets = enforce_budgets
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestQueryStats()
+        token = _request_stats.set(stats)
+        status_code = None
+
+        async def send_with_stats(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                self._check_budget(scope, stats)
+                headers = MutableHeaders(scope=message)
+                headers["X-DB-Query-Count"] = str(stats.count)
+                headers["X-DB-Time-Ms"] = f"{stats.total_ms:.1f}"
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            _request_stats.reset(token)
+            self._log(scope, stats, status_code)
+
+    def _check_budget(self, scope: Scope, stats: RequestQueryStats) -> None:
+        if not stats.over_budget:
+            return
+        message = (
+            f"{scope['method']} {_route_path(scope)} ran {stats.count} SQL statements "
+            f"(budget {stats.budget}); slowest: {_preview(stats.slowest_statement)}"
+        )
+        if self.enforce_budgets:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+    def _log(self, scope: Scope, stats: RequestQueryStats, status_code: Optional[int]) -> None:
+        if stats.count == 0:
+            return
+        fields = {
+            "route": _route_path(scope),
+            "method": scope["method"],
+            "status": status_code,
+            "query_count": stats.count,
+            "db_time_ms": round(stats.total_ms, 2),
+            "slowest_ms": round(stats.slowest_ms, 2),
+            "slowest_statement": _preview(stats.slowest_statement),
+            "query_budget": stats.budget,
+        }
+        logger.info(
+            "sql route=%(route)s method=%(method)s status=%(status)s "
+            "queries=%(query_count)d db_ms=%(db_time_ms).1f slowest_ms=%(slowest_ms).1f",
+            fields,
+            extra={"sql_stats": fields},
+        )
+
+
+def _route_path(scope: Scope) -> str:
+    # The router stores the matched route in the scope; fall back to the raw path
+    route = scope.get("route")
+    return getattr(route, "path", None) or scope.get("path", "")
+
+
+def _preview(statement: Optional[str]) -> Optional[str]:
+    if statement is None:
+        return None
+    statement = " ".join(statement.split())
+    if len(statement) > _STATEMENT_PREVIEW_CHARS:
+        statement = statement[:_STATEMENT_PREVIEW_CHARS] + "..."
+    return statement
@@ -1,12 +1,49 @@
 # /app/main.py
-from fastapi import FastAPI
+import hmac
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from app.api.v1 import bookings, finance, auth
+from app.core.metrics import metrics_snapshot
+from app.core.hashing import HashPoolBusy
+from app.core.config import get_settings
+from app.db.session import init_engine, get_read_engine, warm_pool, dispose_engine
+from app.db.instrumentation import QueryStatsMiddleware
+from app.core.scheduler import scheduler
+from app.core.exposure import run_exposure_reconciliation
+from app.core.overdue import run_overdue_sweep
+from app.core.ledger import run_ledger_snapshot
 
 # Import all models so SQLAlchemy knows about them
-from app.models import organization, client, workflow, finance as finance_models
+from app.models import organization, client, workflow, finance as finance_models, auth as auth_models, idempotency, exposure, ledger
 
-app = FastAPI(title="Leva API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = get_settings()
+    engine = init_engine(settings)
+    warm_connections = min(settings.db_pool_warm_connections, settings.db_pool_size)
+    await warm_pool(engine, warm_connections)
+    if get_read_engine() is not None:
+        await warm_pool(get_read_engine(), warm_connections)
+
+    if settings.exposure_reconcile_interval_seconds > 0:
+        scheduler.add_job(
+            "exposure_reconciliation",
+            settings.exposure_reconcile_interval_seconds,
+            run_exposure_reconciliation,
+        )
+    if settings.overdue_sweep_interval_seconds > 0:
+        scheduler.add_job("overdue_sweep", settings.overdue_sweep_interval_seconds, run_overdue_sweep)
+    if settings.ledger_snapshot_interval_seconds > 0:
+        scheduler.add_job("ledger_snapshot", settings.ledger_snapshot_interval_seconds, run_ledger_snapshot)
+    scheduler.start()
+    yield
+    await scheduler.stop()
+    await dispose_engine()
+
+app = FastAPI(title="Leva API", lifespan=lifespan)
 
 # CORS configuration for frontend
 app.add_middleware(
@@ -15,6 +52,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
+)
+
+@app.exception_handler(HashPoolBusy)
+async def hash_pool_busy_handler(request: Request, exc: HashPoolBusy):
+    # Shed load instead of letting login bursts queue forever
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Authentication is busy, please retry"},
+        headers={"Retry-After": "1"},
+    )
+
+# Per-request SQL count/time headers and logs
+app.add_middleware(
+    QueryStatsMiddleware,
+    enforce_budgets=get_settings().sql_query_budget_enforce,
 )
 
 # Include the routers
@@ -25,3 +78,27 @@ app.include_router(finance.router, prefix="/api/v1/finance", tags=["Finance"])
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
+
+
+def require_metrics_token(authorization: Optional[str] = Header(None)) -> None:
+    """
+    Per-tenant cache, pool and job statistics are internal: only a caller
+    holding METRICS_TOKEN may read them, and without one the endpoint
+    doesn't exist.
+    """
+    token = get_settings().metrics_token
+    if not token:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    scheme, _, credentials = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(credentials.encode(), token.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+@app.get("/metrics", dependencies=[Depends(require_metrics_token)], include_in_schema=False)
+def metrics():
+    """In-process counters (caches, pools, timings) for this worker."""
+    return metrics_snapshot()
@@ -0,0 +1,31 @@
+# /app/models/auth.py
+from sqlalchemy import Column, String, ForeignKey, Integer, DateTime
+from app.db.session import Base
+
+class RevokedToken(Base):
+    """
+    An access token revoked before its natural expiry (e.g. on logout).
+    Rows are only needed until expires_at; the denylist ignores older ones.
+    """
+    __tablename__ = "revoked_tokens"
+    jti = Column(String, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    revoked_at = Column(DateTime, nullable=False)
+
+class RefreshToken(Base):
+    """
+    A long-lived, single-use refresh token. Only a SHA-256 digest of the
+    token is stored. Each refresh rotates the token within its family; a
+    reused (already rotated) token revokes the whole family.
+    """
+    __tablename__ = "refresh_tokens"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    token_hash = Column(String(64), unique=True, index=True, nullable=False)
+    family_id = Column(String(32), index=True, nullable=False)
+
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime, nullable=True)
+    replaced_by_id = Column(Integer, ForeignKey("refresh_tokens.id"), nullable=True)
@@ -0,0 +1,26 @@
+# /app/models/exposure.py
+from sqlalchemy import Column, ForeignKey, Integer, DateTime, Numeric
+from app.db.session import Base
+
+# Exact money columns: these are running sums, so float error would accumulate
+
+class OrganizationExposure(Base):
+    """
+    Outstanding financed amounts for an organization, maintained
+    incrementally in the same transaction as every FinancingRequest status
+    change. Exposure = approved_amount + funded_amount.
+    """
+    __tablename__ = "organization_exposure"
+    organization_id = Column(Integer, ForeignKey("organizations.id"), primary_key=True)
+    approved_amount = Column(Numeric(18, 2), nullable=False, default=0, server_default="0")
+    funded_amount = Column(Numeric(18, 2), nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime, nullable=False)
+
+class ClientExposure(Base):
+    """The same running totals per client."""
+    __tablename__ = "client_exposure"
+    client_id = Column(Integer, ForeignKey("clients.id"), primary_key=True)
+    organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=False, index=True)
+    approved_amount = Column(Numeric(18, 2), nullable=False, default=0, server_default="0")
+    funded_amount = Column(Numeric(18, 2), nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime, nullable=False)
@@ -1,5 +1,5 @@
 # /app/models/finance.py
-from sqlalchemy import Column, String, ForeignKey, Integer, Float, DateTime, Enum, Boolean
+from sqlalchemy import Column, String, ForeignKey, Integer, BigInteger, Float, DateTime, Enum, Boolean, Index, text
 from sqlalchemy.orm import relationship
 from app.db.session import Base
 import enum
@@ -32,7 +32,13 @@ class Payable(Base):
     status = Column(Enum(PaymentStatus), default=PaymentStatus.PENDING)
     
     booking = relationship("Booking", back_populates="payable")
-    financing_request = relationship("FinancingRequest", back_populates="payable", uselist=False)
+    financing_request = relationship("FinancingRequest", back_populates="payable", uselist=False, lazy="raise")
+
+    __table_args__ = (
+        # Overdue sweep: only PENDING rows are indexed, so it stays small
+        # however many paid payables accumulate
+        Index("ix_payables_pending_due_date", "due_date", postgresql_where=text("status = 'PENDING'")),
+    )
 
 class Invoice(Base):
     """
@@ -51,6 +57,10 @@ class Invoice(Base):
     booking = relationship("Booking", back_populates="invoice")
     client = relationship("Client", back_populates="invoices")
 
+    __table_args__ = (
+        Index("ix_invoices_pending_due_date", "due_date", postgresql_where=text("status = 'PENDING'")),
+    )
+
 class FinancingRequest(Base):
     """
     The core "Loan" object.
@@ -61,13 +71,38 @@ class FinancingRequest(Base):
     payable_id = Column(Integer, ForeignKey("payables.id"), unique=True)
     
     amount_requested = Column(Float)
-    fee_percentage = Column(Float, default=2.5) # Our 2.5% fee
+    fee_percentage = Column(Float, default=2.5) # 2.5% per 30 days of tenor (see core.pricing)
     fee_amount = Column(Float)
-    total_repayment = Column(Float) # The invoice amount we collect
+    total_repayment = Column(Float) # Amount plus fee, collected from the invoice
     
     status = Column(Enum(FinancingStatus), default=FinancingStatus.PENDING)
+    # Bumped by every status transition; transitions are conditional UPDATEs
+    # on (status, version), so no row is ever locked for a read-then-write
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     requested_at = Column(DateTime)
     approved_at = Column(DateTime)
     funded_at = Column(DateTime)
+    repaid_at = Column(DateTime)
+    rejected_at = Column(DateTime)
     
     payable = relationship("Payable", back_populates="financing_request")
+
+class FinancingEvent(Base):
+    """
+    Append-only log of FinancingRequest status transitions, written in the
+    same statement as the transition itself.
+    """
+    __tablename__ = "financing_events"
+    id = Column(BigInteger, primary_key=True)
+    financing_request_id = Column(Integer, ForeignKey("financing_requests.id"), nullable=False)
+    organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=False)
+    from_status = Column(Enum(FinancingStatus), nullable=False)
+    to_status = Column(Enum(FinancingStatus), nullable=False)
+    version = Column(Integer, nullable=False)  # the request's version after the transition
+    actor_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_financing_events_request_id", "financing_request_id", "id"),
+        Index("ix_financing_events_org_id", "organization_id", "id"),
+    )
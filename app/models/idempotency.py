@@ -0,0 +1,24 @@
+# /app/models/idempotency.py
+from sqlalchemy import Column, String, ForeignKey, Integer, DateTime, Text
+from app.db.session import Base
+
+class IdempotencyKey(Base):
+    """
+    A client-supplied Idempotency-Key and the response it produced.
+    The row is claimed (IN_PROGRESS) before the write runs, marked
+    COMMITTED in the write's own transaction and completed with the
+    response afterwards; retries with the same key replay it.
+    """
+    __tablename__ = "idempotency_keys"
+    organization_id = Column(Integer, ForeignKey("organizations.id"), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    # SHA-256 of method, path and body: a key may not be reused for another request
+    request_fingerprint = Column(String(64), nullable=False)
+    status = Column(String(16), nullable=False)  # IN_PROGRESS / COMMITTED / COMPLETED
+
+    response_status = Column(Integer, nullable=True)
+    response_body = Column(Text, nullable=True)  # JSON
+
+    created_at = Column(DateTime, nullable=False)
+    locked_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
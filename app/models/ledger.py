@@ -0,0 +1,71 @@
+# /app/models/ledger.py
+from sqlalchemy import Column, ForeignKey, Integer, BigInteger, DateTime, Enum, Index, UniqueConstraint
+from app.db.session import Base
+import enum
+
+# Append-only: rows are inserted, never updated or deleted (the migration
+# installs triggers that reject both). Amounts are signed integer cents,
+# debits positive and credits negative, so every entry's postings sum to 0.
+
+class LedgerAccountCode(str, enum.Enum):
+    CASH = "CASH"                                    # Leva's cash paid out and collected
+    FINANCING_RECEIVABLE = "FINANCING_RECEIVABLE"    # owed to Leva by the forwarder
+    FEE_INCOME = "FEE_INCOME"                        # financing fees earned
+
+class JournalEntryKind(str, enum.Enum):
+    FUNDING = "FUNDING"        # Leva pays the carrier
+    FEE = "FEE"                # the fee is charged when funding
+    REPAYMENT = "REPAYMENT"    # the forwarder repays Leva
+
+class LedgerAccount(Base):
+    """One of an organization's accounts with Leva, created on first use."""
+    __tablename__ = "ledger_accounts"
+    id = Column(Integer, primary_key=True)
+    organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=False)
+    code = Column(Enum(LedgerAccountCode), nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("organization_id", "code", name="uq_ledger_accounts_organization_id_code"),
+    )
+
+class JournalEntry(Base):
+    """A balanced money movement, written from a financing lifecycle transition."""
+    __tablename__ = "journal_entries"
+    id = Column(BigInteger, primary_key=True)
+    organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=False)
+    financing_request_id = Column(Integer, ForeignKey("financing_requests.id"), nullable=True, index=True)
+    kind = Column(Enum(JournalEntryKind), nullable=False)
+    posted_at = Column(DateTime, nullable=False)
+
+class LedgerPosting(Base):
+    """One side of a journal entry against one account."""
+    __tablename__ = "ledger_postings"
+    id = Column(BigInteger, primary_key=True)
+    journal_entry_id = Column(BigInteger, ForeignKey("journal_entries.id"), nullable=False, index=True)
+    account_id = Column(Integer, ForeignKey("ledger_accounts.id"), nullable=False)
+    amount_cents = Column(BigInteger, nullable=False)
+    # Copied from the entry so balance scans stay on one index
+    posted_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        # Balance as of a time: the postings after the account's last snapshot
+        Index("ix_ledger_postings_account_id_posted_at", "account_id", "posted_at"),
+        # Snapshot runs: every posting in the window since the last run
+        Index("ix_ledger_postings_posted_at", "posted_at"),
+    )
+
+class LedgerBalanceSnapshot(Base):
+    """
+    An account's balance over all postings before `cutoff`, written by the
+    periodic snapshot job for accounts with postings since the previous run.
+    """
+    __tablename__ = "ledger_balance_snapshots"
+    account_id = Column(Integer, ForeignKey("ledger_accounts.id"), primary_key=True)
+    cutoff = Column(DateTime, primary_key=True)
+    balance_cents = Column(BigInteger, nullable=False)
+
+    __table_args__ = (
+        # Where the previous run stopped
+        Index("ix_ledger_balance_snapshots_cutoff", "cutoff"),
+    )
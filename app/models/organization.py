@@ -1,5 +1,5 @@
 # /app/models/organization.py
-from sqlalchemy import Column, String, Integer, ForeignKey, Boolean
+from sqlalchemy import Column, String, Integer, BigInteger, ForeignKey, Boolean, DateTime
 from sqlalchemy.orm import relationship
 from app.db.session import Base
 
@@ -7,6 +7,8 @@ class Organization(Base):
     __tablename__ = "organizations"
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True, nullable=False)
+    # Bumped by every booking/finance write; list ETags are derived from it
+    change_version = Column(BigInteger, nullable=False, default=0, server_default="0")
 
     # Relationships
     users = relationship("User", back_populates="organization")
@@ -20,6 +22,9 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
     full_name = Column(String, nullable=False)
     is_active = Column(Boolean, default=True, nullable=False)
+    # Access tokens issued before this instant are rejected (set when the
+    # user is deactivated or moves to another organization)
+    tokens_valid_after = Column(DateTime, nullable=True)
     
     organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=False)
     organization = relationship("Organization", back_populates="users")
@@ -1,5 +1,5 @@
 # /app/models/workflow.py
-from sqlalchemy import Column, String, ForeignKey, Integer, Float, DateTime, Enum
+from sqlalchemy import Column, String, ForeignKey, Integer, Float, DateTime, Enum, Index
 from sqlalchemy.orm import relationship
 from app.db.session import Base
 import enum
@@ -27,6 +27,27 @@ class Booking(Base):
     status = Column(Enum(BookingStatus), default=BookingStatus.PENDING)
     carrier_name = Column(String)
 
-    # Financial objects linked to this one booking
-    payable = relationship("Payable", back_populates="booking", uselist=False)
-    invoice = relationship("Invoice", back_populates="booking", uselist=False)
+    # Financial objects linked to this one booking.
+    # Never lazy-loaded: an implicit load fails under asyncio and is an N+1
+    # in a list, so queries must ask for them (see booking_service.BOOKING_DETAIL_LOAD).
+    payable = relationship("Payable", back_populates="booking", uselist=False, lazy="raise")
+    invoice = relationship("Invoice", back_populates="booking", uselist=False, lazy="raise")
+
+    __table_args__ = (
+        # Keyset pagination: (organization_id, id) plus one index per filter,
+        # so every page is an index range scan regardless of depth
+        Index("ix_bookings_org_id", "organization_id", "id"),
+        Index("ix_bookings_org_status_id", "organization_id", "status", "id"),
+        Index("ix_bookings_org_carrier_id", "organization_id", "carrier_name", "id"),
+        Index("ix_bookings_org_client_id", "organization_id", "client_id", "id"),
+        # Reference-number prefix search (LIKE 'abc%') under any collation.
+        # It finds the matching range but not in id order, so each page
+        # sorts every match: fine for the short prefixes people type, not
+        # constant-cost like the other filters
+        Index(
+            "ix_bookings_org_reference_prefix",
+            "organization_id",
+            "reference_number",
+            postgresql_ops={"reference_number": "varchar_pattern_ops"},
+        ),
+    )
@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic import BaseModel, EmailStr, ConfigDict
 
 
@@ -5,12 +6,28 @@ class Token(BaseModel):
     """JWT Token response."""
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+
+class RefreshRequest(BaseModel):
+    """Refresh token exchange request."""
+    refresh_token: str
+
+
+class LogoutRequest(BaseModel):
+    """Logout request: the session's refresh token, if the client has it."""
+    refresh_token: Optional[str] = None
 
 
 class TokenPayload(BaseModel):
     """JWT Token payload."""
     sub: str  # subject (user email)
     exp: int  # expiration timestamp
+    iat: Optional[float] = None  # issued-at timestamp (sub-second)
+    jti: Optional[str] = None  # unique token ID, used for revocation
+    # Signed tenant claims (absent on tokens issued before they existed)
+    user_id: Optional[int] = None
+    organization_id: Optional[int] = None
 
 
 class UserCreate(BaseModel):
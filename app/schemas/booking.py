@@ -1,7 +1,9 @@
 # /app/schemas/booking.py
 from pydantic import BaseModel
 from datetime import date
+from typing import Optional
 from app.models.workflow import BookingStatus
+from app.schemas.finance import FinancingRequestPublic, InvoicePublic, PayablePublic
 
 # Schema for creating a NEW booking.
 # This is the "God Object" that creates the booking AND its related financials.
@@ -28,3 +30,25 @@ class BookingPublic(BaseModel):
     
     class Config:
         from_attributes = True # Updated from orm_mode in Pydantic v2
+
+# A payable together with its financing request, if one was made
+class PayableDetail(PayablePublic):
+    financing_request: Optional[FinancingRequestPublic] = None
+
+# A booking with all of its financials, for the booking detail screens
+class BookingDetail(BookingPublic):
+    payable: Optional[PayableDetail] = None
+    invoice: Optional[InvoicePublic] = None
+
+# One rejected row from a bulk import
+class BookingImportError(BaseModel):
+    row: int
+    reference_number: Optional[str] = None
+    errors: list[str]
+
+# Summary returned by the bulk import endpoint
+class BookingImportResult(BaseModel):
+    total_rows: int
+    imported: int
+    failed: int
+    errors: list[BookingImportError]
@@ -1,7 +1,14 @@
 # /app/schemas/finance.py
-from pydantic import BaseModel
-from datetime import datetime
+from pydantic import BaseModel, Field, model_validator
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Optional
+import enum
 from app.models.finance import FinancingStatus, PaymentStatus
+from app.models.ledger import LedgerAccountCode
+
+# Most payables one batch financing call may cover
+MAX_BATCH_FINANCING = 1000
 
 class PayablePublic(BaseModel):
     id: int
@@ -26,6 +33,7 @@ class InvoicePublic(BaseModel):
 class FinancingRequestPublic(BaseModel):
     id: int
     status: FinancingStatus
+    version: int  # send back to transition only if nothing changed since
     amount_requested: float
     fee_amount: float
     total_repayment: float
@@ -33,3 +41,237 @@ class FinancingRequestPublic(BaseModel):
     
     class Config:
         from_attributes = True
+
+# Finance many payables at once: either explicit IDs or a filter
+class BatchFinancingCreate(BaseModel):
+    payable_ids: Optional[list[int]] = Field(None, min_length=1, max_length=MAX_BATCH_FINANCING)
+    
+    # Filter: every eligible payable due in [due_from, due_to], optionally one payee
+    due_from: Optional[date] = None
+    due_to: Optional[date] = None
+    payee_name: Optional[str] = None
+
+    @model_validator(mode="after")
+    def ids_or_filter(self):
+        has_filter = any(v is not None for v in (self.due_from, self.due_to, self.payee_name))
+        if (self.payable_ids is None) == (not has_filter):
+            raise ValueError("Give either payable_ids or a filter (due_from, due_to, payee_name), not both")
+        return self
+
+class BatchFinancingOutcome(str, enum.Enum):
+    CREATED = "CREATED"
+    ALREADY_REQUESTED = "ALREADY_REQUESTED"
+    NOT_ELIGIBLE = "NOT_ELIGIBLE"  # already paid or financed
+    DECLINED = "DECLINED"  # by underwriting; see reasons
+    NOT_FOUND = "NOT_FOUND"
+
+class BatchFinancingItem(BaseModel):
+    payable_id: int
+    outcome: BatchFinancingOutcome
+    financing_request: Optional[FinancingRequestPublic] = None
+    # Underwriting rules that failed (declined, or created for manual review)
+    reasons: list[str] = []
+
+class BatchFinancingResult(BaseModel):
+    created: int
+    skipped: int
+    results: list[BatchFinancingItem]
+
+# Outstanding financed amounts (exact decimals, serialized as strings)
+class ExposureAmounts(BaseModel):
+    approved_amount: Decimal
+    funded_amount: Decimal
+    outstanding: Decimal
+
+    class Config:
+        from_attributes = True
+
+class ClientExposurePublic(ExposureAmounts):
+    client_id: int
+
+class ExposurePublic(BaseModel):
+    organization: ExposureAmounts
+    clients: list[ClientExposurePublic]
+
+# Quotes select payables the same way as a batch financing call
+class FinancingQuoteCreate(BatchFinancingCreate):
+    pass
+
+# The price of financing one payable (exact decimals, serialized as strings)
+class FinancingQuote(BaseModel):
+    payable_id: int
+    amount: Decimal
+    invoice_amount: Optional[Decimal]
+    tenor_days: int
+    fee_percentage: Decimal
+    fee_amount: Decimal
+    total_repayment: Decimal
+    # Invoice amount left to the forwarder after the repayment
+    net_amount: Optional[Decimal]
+
+    class Config:
+        from_attributes = True
+
+class UnquotedPayable(BaseModel):
+    payable_id: int
+    outcome: BatchFinancingOutcome  # ALREADY_REQUESTED, NOT_ELIGIBLE or NOT_FOUND
+
+class FinancingQuoteResult(BaseModel):
+    quotes: list[FinancingQuote]
+    not_quoted: list[UnquotedPayable]
+    total_amount: Decimal
+    total_fees: Decimal
+    total_repayment: Decimal
+
+# Aging report: open amounts by days past due (exact decimals)
+class AgingGroupBy(str, enum.Enum):
+    CLIENT = "client"
+    CARRIER = "carrier"
+
+class AgingBuckets(BaseModel):
+    current: Decimal = Decimal("0.00")  # not yet due
+    days_1_30: Decimal = Decimal("0.00")
+    days_31_60: Decimal = Decimal("0.00")
+    days_61_90: Decimal = Decimal("0.00")
+    days_over_90: Decimal = Decimal("0.00")
+    total: Decimal = Decimal("0.00")
+    count: int = 0
+
+class AgingGroup(AgingBuckets):
+    client_id: Optional[int] = None
+    carrier_name: Optional[str] = None
+
+class AgingReport(BaseModel):
+    totals: AgingBuckets
+    # Only with group_by, largest total first
+    groups: list[AgingGroup] = []
+
+class AgingPublic(BaseModel):
+    as_of: date
+    group_by: Optional[AgingGroupBy] = None
+    receivables: AgingReport  # open invoices
+    payables: AgingReport  # open carrier bills
+
+# Cash-flow forecast: projected cash position per day or week (exact decimals)
+class ForecastGranularity(str, enum.Enum):
+    DAY = "day"
+    WEEK = "week"
+
+class ForecastPoint(BaseModel):
+    start: date
+    end: date  # inclusive
+    receipts: Decimal  # client invoices due
+    carrier_payments: Decimal  # unfinanced payables due
+    financing_repayments: Decimal  # funded financing repaid to Leva
+    net: Decimal
+    position: Decimal  # cash position at the end of the period
+
+class CashFlowForecast(BaseModel):
+    as_of: date
+    granularity: ForecastGranularity
+    opening_balance: Decimal
+    # The first point also includes everything already past due
+    points: list[ForecastPoint]
+    lowest_position: Decimal
+    lowest_position_date: date
+    # Net of flows due after the horizon
+    net_after_horizon: Decimal
+
+# Financing lifecycle transitions
+class FinancingTransition(str, enum.Enum):
+    APPROVE = "approve"
+    FUND = "fund"
+    REPAY = "repay"
+    REJECT = "reject"
+
+class FinancingTransitionCreate(BaseModel):
+    # Expected current version; omitted, only the status is checked
+    version: Optional[int] = Field(None, ge=1)
+
+class FinancingTransitionTarget(FinancingTransitionCreate):
+    id: int
+
+class BatchFinancingTransition(BaseModel):
+    transition: FinancingTransition
+    requests: list[FinancingTransitionTarget] = Field(..., min_length=1, max_length=MAX_BATCH_FINANCING)
+
+class FinancingTransitionOutcome(str, enum.Enum):
+    TRANSITIONED = "TRANSITIONED"
+    VERSION_CONFLICT = "VERSION_CONFLICT"  # changed since the version given
+    INVALID_TRANSITION = "INVALID_TRANSITION"  # not allowed from the current status
+    NOT_FOUND = "NOT_FOUND"
+
+class FinancingTransitionItem(BaseModel):
+    id: int
+    outcome: FinancingTransitionOutcome
+    # Current status and version (after the transition if it happened)
+    status: Optional[FinancingStatus] = None
+    version: Optional[int] = None
+
+class BatchFinancingTransitionResult(BaseModel):
+    transitioned: int
+    skipped: int
+    results: list[FinancingTransitionItem]
+
+class FinancingEventPublic(BaseModel):
+    id: int
+    financing_request_id: int
+    from_status: FinancingStatus
+    to_status: FinancingStatus
+    version: int
+    actor_user_id: Optional[int]
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+# Ledger balances: debits positive, credits negative, so they sum to zero
+class LedgerAccountBalance(BaseModel):
+    account: LedgerAccountCode
+    balance: Decimal
+
+class LedgerBalancesPublic(BaseModel):
+    as_of: datetime
+    balances: list[LedgerAccountBalance]
+
+# Bank statement reconciliation
+class ReconciliationTarget(str, enum.Enum):
+    INVOICE = "INVOICE"                      # marked PAID
+    FINANCING_REQUEST = "FINANCING_REQUEST"  # marked REPAID
+
+class ReconciliationMethod(str, enum.Enum):
+    EXACT = "EXACT"          # reference and amount
+    REFERENCE = "REFERENCE"  # reference, amount within tolerance
+    FUZZY = "FUZZY"          # similar reference, amount within tolerance
+
+class UnmatchedReason(str, enum.Enum):
+    INVALID = "INVALID"      # the line couldn't be parsed
+    DEBIT = "DEBIT"          # money out: nothing to collect
+    NO_MATCH = "NO_MATCH"
+    AMBIGUOUS = "AMBIGUOUS"  # several open items fit equally well
+    CONFLICT = "CONFLICT"    # the item was settled or changed meanwhile
+
+class StatementLineMatch(BaseModel):
+    line: int
+    amount: Decimal
+    reference: str
+    target: ReconciliationTarget
+    target_id: int
+    method: ReconciliationMethod
+
+class UnmatchedStatementLine(BaseModel):
+    line: int
+    amount: Optional[Decimal] = None
+    reference: Optional[str] = None
+    reason: UnmatchedReason
+    detail: Optional[str] = None
+
+class BankReconciliationResult(BaseModel):
+    total_lines: int
+    matched: int
+    unmatched: int
+    invoices_paid: int
+    financing_repaid: int
+    dry_run: bool
+    matches: list[StatementLineMatch]
+    unmatched_lines: list[UnmatchedStatementLine]
@@ -0,0 +1,65 @@
+"""
+Benchmark for the underwriting rules engine and financing pricing.
+Run this with: python bench_underwriting.py [portfolio_size]
+
+Builds a synthetic portfolio (no database needed) and reports how many
+payables per second the compiled rules evaluate and pricing quotes,
+per batch size.
+"""
+import sys
+import time
+
+import numpy as np
+
+from app.core.pricing import MIN_TENOR_DAYS, price
+from app.core.underwriting import DEFAULT_RULES, RuleEngine, build_features
+
+
+def synthetic_portfolio(size: int, clients: int = 500, seed: int = 7):
+    """Random but plausible candidates: amounts, invoices, due dates, clients."""
+    rng = np.random.default_rng(seed)
+    amounts = rng.lognormal(mean=8.5, sigma=1.2, size=size)
+    return {
+        "amounts": amounts,
+        "invoice_amounts": amounts * rng.uniform(0.9, 1.4, size=size),
+        "days_to_due": rng.integers(-10, 90, size=size).astype(np.float64),
+        "client_ids": rng.integers(1, clients + 1, size=size),
+        "client_exposure": rng.uniform(0, 500_000, size=size),
+        "client_overdue": rng.poisson(0.5, size=size).astype(np.float64),
+        "org_exposure": 1_000_000.0,
+    }
+
+
+def bench(label: str, fn, rows: int, repeat: int) -> None:
+    fn()  # warm up
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed = (time.perf_counter() - started) / repeat
+    print(f"  {label:<28} {elapsed * 1000:10.3f} ms  {rows / elapsed:14,.0f} payables/s")
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    engine = RuleEngine(DEFAULT_RULES)
+    portfolio = synthetic_portfolio(size)
+    print(f"Underwriting benchmark: {len(engine.rules)} rules, portfolio of {size:,} payables\n")
+
+    for batch in (1, 100, 10_000, size):
+        if batch > size:
+            continue
+        part = {k: (v[:batch] if isinstance(v, np.ndarray) else v) for k, v in portfolio.items()}
+        features = build_features(**part)
+        amount_cents = np.rint(part["amounts"] * 100).astype(np.int64)
+        tenors = np.maximum(part["days_to_due"].astype(np.int64) + 30, MIN_TENOR_DAYS)
+        ids = list(range(batch))
+        repeat = max(1, min(1000, 1_000_000 // batch))
+        print(f"batch of {batch:,}")
+        bench("features", lambda: build_features(**part), batch, repeat)
+        bench("evaluate (decisions only)", lambda: engine.evaluate(features), batch, repeat)
+        bench("decide (with reasons)", lambda: engine.decide(ids, features), batch, max(1, repeat // 10))
+        bench("price (integer cents)", lambda: price(amount_cents, tenors), batch, repeat)
+
+
+if __name__ == "__main__":
+    main()
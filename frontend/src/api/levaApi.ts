@@ -1,6 +1,7 @@
 // /frontend/src/api/levaApi.ts
 import axios from 'axios';
 import { useAuthStore } from '../store/authStore';
+import { TokenResponse } from '../types';
 
 const levaApi = axios.create({
   baseURL: 'http://127.0.0.1:8000/api/v1',
@@ -21,4 +22,46 @@ levaApi.interceptors.request.use(
   }
 );
 
+// On a 401, swap the refresh token for a new access token once and retry.
+// Concurrent failures share the same in-flight refresh.
+let refreshInFlight: Promise<string | null> | null = null;
+
+const refreshAccessToken = async (): Promise<string | null> => {
+  const { refreshToken, login, logout } = useAuthStore.getState();
+  if (!refreshToken) {
+    return null;
+  }
+  try {
+    const response = await axios.post<TokenResponse>(
+      `${levaApi.defaults.baseURL}/auth/refresh`,
+      { refresh_token: refreshToken }
+    );
+    login(response.data.access_token, response.data.refresh_token);
+    return response.data.access_token;
+  } catch {
+    logout();
+    return null;
+  }
+};
+
+levaApi.interceptors.response.use(
+  (response) => response,
+  async (error) => {
+    const original = error.config;
+    if (error.response?.status !== 401 || !original || original._retried) {
+      return Promise.reject(error);
+    }
+    original._retried = true;
+    refreshInFlight = refreshInFlight ?? refreshAccessToken().finally(() => {
+      refreshInFlight = null;
+    });
+    const token = await refreshInFlight;
+    if (!token) {
+      return Promise.reject(error);
+    }
+    original.headers['Authorization'] = `Bearer ${token}`;
+    return levaApi(original);
+  }
+);
+
 export default levaApi;
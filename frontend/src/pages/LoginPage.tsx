@@ -30,7 +30,7 @@ function LoginPage() {
       });
       
       // Use the store action to save the token and update state
-      login(response.data.access_token);
+      login(response.data.access_token, response.data.refresh_token);
       
       navigate('/');
     } catch (err: any) {
@@ -3,23 +3,31 @@ import { create } from 'zustand';
 
 interface AuthState {
   token: string | null;
+  refreshToken: string | null;
   isAuthenticated: boolean;
-  login: (token: string) => void;
+  login: (token: string, refreshToken?: string | null) => void;
   logout: () => void;
 }
 
 export const useAuthStore = create<AuthState>((set) => ({
   // Get initial token from localStorage (persistence)
   token: localStorage.getItem('leva_token'),
+  refreshToken: localStorage.getItem('leva_refresh_token'),
   isAuthenticated: !!localStorage.getItem('leva_token'),
   
-  login: (token) => {
+  login: (token, refreshToken = null) => {
     localStorage.setItem('leva_token', token);
-    set({ token, isAuthenticated: true });
+    if (refreshToken) {
+      localStorage.setItem('leva_refresh_token', refreshToken);
+    } else {
+      localStorage.removeItem('leva_refresh_token');
+    }
+    set({ token, refreshToken, isAuthenticated: true });
   },
   
   logout: () => {
     localStorage.removeItem('leva_token');
-    set({ token: null, isAuthenticated: false });
+    localStorage.removeItem('leva_refresh_token');
+    set({ token: null, refreshToken: null, isAuthenticated: false });
   },
 }));
@@ -22,6 +22,33 @@ export interface BookingPublic {
   carrier_name: string;
 }
 
+export interface FinancingRequestPublic {
+  id: number;
+  status: string;
+  amount_requested: number;
+  fee_amount: number;
+  total_repayment: number;
+  payable_id: number;
+}
+
+export interface BookingDetail extends BookingPublic {
+  payable: {
+    id: number;
+    amount: number;
+    due_date: string;
+    status: string;
+    payee_name: string;
+    financing_request: FinancingRequestPublic | null;
+  } | null;
+  invoice: {
+    id: number;
+    amount: number;
+    due_date: string;
+    status: string;
+    client_id: number;
+  } | null;
+}
+
 export interface LoginRequest {
   username: string;
   password: string;
@@ -30,6 +57,7 @@ export interface LoginRequest {
 export interface TokenResponse {
   access_token: string;
   token_type: string;
+  refresh_token?: string | null;
 }
 
 export interface RegisterRequest {
@@ -0,0 +1,67 @@
+"""
+Bank statement matching (app/core/reconciliation.py), no database needed:
+
+    python -m pytest test_reconciliation.py
+"""
+from app.core.reconciliation import Candidate, CandidateIndex, StatementLine, match_lines, normalize_reference
+from app.schemas.finance import ReconciliationMethod, ReconciliationTarget, UnmatchedReason
+
+
+def invoice(invoice_id: int, reference: str, amount_cents: int) -> Candidate:
+    return Candidate(ReconciliationTarget.INVOICE, invoice_id, normalize_reference(reference), amount_cents)
+
+
+def match_one(reference: str, amount_cents: int, candidates: list[Candidate]):
+    matches, unmatched = match_lines([StatementLine(1, amount_cents, reference)], CandidateIndex(candidates))
+    if matches:
+        return matches[0].method, matches[0].candidate.id
+    return unmatched[0][1], None
+
+
+OPEN = [invoice(1, "BKG-001", 100_000), invoice(2, "BKG-0012", 250_000)]
+
+
+def test_exact_reference_and_amount():
+    assert match_one("BKG-001", 100_000, OPEN) == (ReconciliationMethod.EXACT, 1)
+
+
+def test_reference_as_a_token_of_longer_text():
+    assert match_one("Invoice BKG-001 2024", 100_000, OPEN) == (ReconciliationMethod.EXACT, 1)
+
+
+def test_reference_inside_longer_text():
+    assert match_one("Payment for bkg 001, thanks", 100_000, OPEN) == (ReconciliationMethod.FUZZY, 1)
+
+
+def test_longer_reference_does_not_match_its_prefix():
+    assert match_one("BKG-0012", 100_000, OPEN) == (UnmatchedReason.NO_MATCH, None)
+    assert match_one("Payment BKG0010", 100_000, OPEN) == (UnmatchedReason.NO_MATCH, None)
+    assert match_one("Payment BKG0012", 100_000, OPEN) == (UnmatchedReason.NO_MATCH, None)
+
+
+def test_line_naming_a_longer_reference_too_is_ambiguous():
+    assert match_one("Paid bkg 001 and BKG-0012", 100_000, OPEN) == (UnmatchedReason.AMBIGUOUS, None)
+
+
+def test_mistyped_reference_needs_the_same_digits():
+    candidates = [invoice(3, "ACME-2024-017", 50_000)]
+    assert match_one("ACMF-2024-017", 50_000, candidates) == (ReconciliationMethod.FUZZY, 3)
+    assert match_one("ACME-2024-018", 50_000, candidates) == (UnmatchedReason.NO_MATCH, None)
+
+
+def test_only_operators_statements_load_financing(monkeypatch):
+    from app.core import auth_service
+    from app.core.config import Settings
+    from app.core.reconciliation import candidates_query
+
+    monkeypatch.setattr(auth_service, "get_settings", lambda: Settings(operator_token="otok"))
+    assert not auth_service.is_operator(None)
+    assert not auth_service.is_operator("guess")
+    assert auth_service.is_operator("otok")
+
+    # What a tenant's statement can settle: invoices only, so no line can repay financing
+    assert "financing_requests" not in str(candidates_query(1, financing=False))
+    assert "financing_requests" in str(candidates_query(1, financing=True))
+
+    monkeypatch.setattr(auth_service, "get_settings", lambda: Settings())
+    assert not auth_service.is_operator("otok")
@@ -0,0 +1,49 @@
+"""
+Batch underwriting against the organization exposure cap
+(app/core/underwriting.py), no database needed:
+
+    python -m pytest test_underwriting.py
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from app.core.finance_service import in_request_order
+from app.core.underwriting import ORG_EXPOSURE_CAP, Decision, build_features, underwriter
+
+Row = namedtuple("Row", "id amount")
+
+
+def decide(payable_ids: list[int], amounts: list[float], org_exposure: float) -> dict[int, Decision]:
+    """Underwrite clean candidates (covered, not due, one client each) in the given order."""
+    n = len(amounts)
+    amounts = np.array(amounts, dtype=np.float64)
+    features = build_features(
+        amounts=amounts,
+        invoice_amounts=amounts * 1.3,
+        days_to_due=np.full(n, 30.0),
+        client_ids=np.arange(1, n + 1),
+        client_exposure=np.zeros(n),
+        client_overdue=np.zeros(n),
+        org_exposure=org_exposure,
+    )
+    return {d.payable_id: d.decision for d in underwriter.decide(payable_ids, features)}
+
+
+def test_cap_hit_partway_through_a_batch():
+    # Room for 150k: the first two fit, the third would cross the cap
+    decisions = decide([1, 2, 3], [100_000, 50_000, 60_000], ORG_EXPOSURE_CAP - 150_000)
+    assert decisions == {1: Decision.APPROVE, 2: Decision.APPROVE, 3: Decision.DECLINE}
+
+
+def test_declined_candidate_leaves_room_for_later_ones():
+    decisions = decide([1, 2, 3], [100_000, 80_000, 50_000], ORG_EXPOSURE_CAP - 150_000)
+    assert decisions == {1: Decision.APPROVE, 2: Decision.DECLINE, 3: Decision.APPROVE}
+
+
+def test_request_order_decides_who_gets_the_room():
+    rows = [Row(3, 60_000), Row(1, 100_000), Row(2, 50_000)]  # as the database returned them
+    ordered = in_request_order(rows, [2, 3, 1, 2])
+    assert [row.id for row in ordered] == [2, 3, 1]
+    decisions = decide([row.id for row in ordered], [row.amount for row in ordered], ORG_EXPOSURE_CAP - 150_000)
+    assert decisions == {2: Decision.APPROVE, 3: Decision.APPROVE, 1: Decision.DECLINE}